@@ -1,17 +1,37 @@
+from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any
+import asyncio
+from app.core.cache import TTLCache
 from app.core.config import get_settings
 from app.api.v1.routes.auth import get_current_user
+from app.api.v1.routes.chat import get_provider_registry, get_stream_publisher
+from app.core.metrics import metrics
+from app.core.security import password_hasher_stats
+from app.core.sse import sse_writer
+from app.core.user_cache import CurrentUser, user_cache
+from app.db import models
+from app.db.session import get_async_db
+from app.llm.broker import StreamPublisher
+from app.llm.registry import ProviderRegistry
+from app.llm.prompt_cache import prompt_cache
+from app.llm.response_cache import response_cache
+from app.llm.singleflight import singleflight
+from app.llm.usage import usage_ledger
 
 router = APIRouter()
 settings = get_settings()
 
-# Admin username (replace with proper admin check in production)
-ADMIN_USERNAME = "admin"
+# Table counts scan the database, so metrics calls share a periodically refreshed copy
+_db_counts: TTLCache[Dict[str, int]] = TTLCache(maxsize=1, ttl=settings.ADMIN_DB_COUNTS_TTL_SECONDS)
+_db_counts_lock = asyncio.Lock()
 
-async def get_admin_user(current_user: str = Depends(get_current_user)):
+async def get_admin_user(current_user: CurrentUser = Depends(get_current_user)):
     """Check if the current user is an admin."""
-    if current_user != ADMIN_USERNAME:
+    if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to access admin endpoints"
@@ -20,7 +40,8 @@ async def get_admin_user(current_user: str = Depends(get_current_user)):
 
 @router.get("/admin/status")
 async def get_system_status(
-    current_user: str = Depends(get_admin_user)
+    current_user: CurrentUser = Depends(get_admin_user),
+    registry: ProviderRegistry = Depends(get_provider_registry)
 ):
     """Get system status and configuration."""
     return {
@@ -33,30 +54,77 @@ async def get_system_status(
                 "anthropic": bool(settings.ANTHROPIC_API_KEY),
                 "gemini": bool(settings.GOOGLE_API_KEY)
             }
-        }
+        },
+        "provider_health": registry.health.snapshot(),
+        "circuit_breakers": registry.breaker_snapshot()
     }
 
+async def get_db_counts(db: AsyncSession) -> Dict[str, int]:
+    """User, conversation and message counts, refreshed every ADMIN_DB_COUNTS_TTL_SECONDS."""
+    counts = _db_counts.get("counts")
+    if counts is not None:
+        return counts
+    async with _db_counts_lock:
+        # Another request may have refreshed the counts while this one waited
+        counts = _db_counts.get("counts")
+        if counts is None:
+            counts = {
+                # Users with conversation activity in the last 24 hours
+                "active_users": await db.scalar(
+                    select(func.count(func.distinct(models.Conversation.user_id)))
+                    .where(models.Conversation.updated_at >= datetime.now(timezone.utc) - timedelta(days=1))
+                ),
+                "total_conversations": await db.scalar(select(func.count()).select_from(models.Conversation)),
+                "total_messages": await db.scalar(select(func.count()).select_from(models.Message)),
+            }
+            _db_counts.set("counts", counts)
+    return counts
+
 @router.get("/admin/metrics")
 async def get_system_metrics(
-    current_user: str = Depends(get_admin_user)
+    format: str = "json",
+    current_user: CurrentUser = Depends(get_admin_user),
+    registry: ProviderRegistry = Depends(get_provider_registry),
+    publisher: StreamPublisher = Depends(get_stream_publisher),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get system metrics."""
-    # TODO: Implement actual metrics collection
+    """Get system metrics, aggregated across workers.
+
+    Database counts may be up to ADMIN_DB_COUNTS_TTL_SECONDS old. Pass
+    format=prometheus for the Prometheus text format.
+    """
+    collected = metrics.collect()
+    if format == "prometheus":
+        return PlainTextResponse(metrics.to_prometheus(collected), media_type="text/plain; version=0.0.4")
+
+    api_calls = {name: 0 for name in registry.names}
+    for (provider, _, _), count in collected.get("llm_requests_total", {}).get("series", {}).items():
+        api_calls[provider] = api_calls.get(provider, 0) + int(count)
+
     return {
-        "active_users": 0,
-        "total_conversations": 0,
-        "total_messages": 0,
-        "api_calls": {
-            "openai": 0,
-            "anthropic": 0,
-            "gemini": 0
-        }
+        **await get_db_counts(db),
+        "api_calls": api_calls,
+        "metrics": metrics.to_json(collected),
+        "caches": {
+            "users": user_cache.stats(),
+            "responses": response_cache.stats()
+        },
+        "password_hasher": password_hasher_stats(),
+        "llm_http_pool": registry.pool_stats(),
+        "request_coalescing": singleflight.stats(),
+        "routing": registry.router.stats(),
+        "admission": registry.admission.stats(),
+        "circuit_breakers": registry.breaker_snapshot(),
+        "streams": publisher.stats(),
+        "sse": sse_writer.stats(),
+        "usage_ledger": usage_ledger.stats(),
+        "prompt_cache": prompt_cache.stats()
     }
 
 @router.post("/admin/config")
 async def update_system_config(
     config: Dict[str, Any],
-    current_user: str = Depends(get_admin_user)
+    current_user: CurrentUser = Depends(get_admin_user)
 ):
     """Update system configuration."""
     # TODO: Implement configuration update logic
@@ -2,16 +2,22 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from datetime import timedelta
-from sqlalchemy.orm import Session
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import get_settings
+from app.core.metrics import CACHE_LOOKUPS
 from app.core.security import (
+    PasswordHasherBusy,
     create_access_token,
-    get_password_hash,
-    verify_password,
+    get_password_hash_async,
+    verify_password_async,
 )
-from app.db.session import get_db
+from app.core.user_cache import CurrentUser, user_cache
+from app.db.session import get_async_db
 from app.db import models, schemas
+from app.db.repositories import UserRepository
+from app.llm.usage import usage_ledger
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 settings = get_settings()
@@ -21,48 +27,101 @@ oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/auth/token",
     auto_error=True
 )
+# Same scheme for endpoints that also serve anonymous requests
+optional_oauth2_scheme = OAuth2PasswordBearer(
+    tokenUrl=f"{settings.API_V1_STR}/auth/token",
+    auto_error=False
+)
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-):
-    """Get current user from JWT token."""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+def get_token_payload(token: str = Depends(oauth2_scheme)) -> dict:
+    """Decode and verify the JWT bearer token."""
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if user is None:
+    if payload.get("sub") is None:
         raise credentials_exception
+    return payload
+
+async def load_user(email: str, db: AsyncSession) -> CurrentUser:
+    """Load a user through the user cache, falling back to the database."""
+    user = user_cache.get(email)
+    CACHE_LOOKUPS.inc("users", "miss" if user is None else "hit")
+    if user is None:
+        db_user = await UserRepository(db).get_by_email(email)
+        if db_user is None:
+            raise credentials_exception
+        user = CurrentUser.from_model(db_user)
+        user_cache.set(email, user)
     return user
 
+async def get_current_user(
+    payload: dict = Depends(get_token_payload),
+    db: AsyncSession = Depends(get_async_db),
+) -> CurrentUser:
+    """Get current user from JWT token.
+
+    Tokens carrying id/role claims are trusted without a database lookup.
+    """
+    if "uid" in payload and "role" in payload:
+        try:
+            return CurrentUser(id=payload["uid"], email=payload["sub"], role=models.UserRole(payload["role"]))
+        except ValueError:
+            raise credentials_exception
+    return await load_user(payload["sub"], db)
+
+async def get_optional_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> Optional[CurrentUser]:
+    """Get the current user if a bearer token was sent; invalid tokens are still rejected."""
+    if token is None:
+        return None
+    return await get_current_user(get_token_payload(token), db)
+
+async def get_current_user_profile(
+    payload: dict = Depends(get_token_payload),
+    db: AsyncSession = Depends(get_async_db),
+) -> CurrentUser:
+    """Get the full profile of the current user, ignoring token claims."""
+    return await load_user(payload["sub"], db)
+
+def hasher_busy_exception(e: PasswordHasherBusy) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server busy, please retry",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
 
 @router.post("/register", response_model=schemas.User)
-async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user."""
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+    users = UserRepository(db)
+    db_user = await users.get_by_email(user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = get_password_hash(user.password)
-    db_user = models.User(email=user.email, password_hash=hashed_password, name=user.name, photo=user.photo)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+    try:
+        hashed_password = await get_password_hash_async(user.password)
+    except PasswordHasherBusy as e:
+        raise hasher_busy_exception(e)
+    return await users.create(user.email, hashed_password, name=user.name, photo=user.photo)
 
 @router.post("/token")
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """Login endpoint to get access token."""
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password_hash):
+    user = await UserRepository(db).get_by_email(form_data.username)
+    try:
+        password_ok = bool(user) and await verify_password_async(form_data.password, user.password_hash)
+    except PasswordHasherBusy as e:
+        raise hasher_busy_exception(e)
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -72,7 +131,9 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.email},
-        expires_delta=access_token_expires
+        expires_delta=access_token_expires,
+        user_id=user.id if settings.JWT_EMBED_CLAIMS else None,
+        role=user.role.value if settings.JWT_EMBED_CLAIMS else None,
     )
     return {
         "access_token": access_token,
@@ -80,7 +141,11 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     }
 
 @router.get("/me", response_model=schemas.User)
-async def read_users_me(current_user: models.User = Depends(get_current_user)):
+async def read_users_me(current_user: CurrentUser = Depends(get_current_user_profile)):
     """Get current user information."""
     return current_user
 
+@router.get("/me/usage")
+async def read_my_usage(current_user: CurrentUser = Depends(get_current_user)):
+    """Get the tokens the current user has used today and this month."""
+    return await usage_ledger.summary(current_user.id)
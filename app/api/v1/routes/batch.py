@@ -0,0 +1,202 @@
+from functools import partial
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional, Union
+from pydantic import BaseModel
+from app.api.v1.routes.auth import get_optional_user
+from app.api.v1.routes.chat import (
+    ChatRequest,
+    admit,
+    charge_to,
+    get_provider,
+    get_provider_registry,
+    prepare_request,
+    provider_error_status,
+)
+from app.core.config import get_settings
+from app.core.jsonutil import dumps
+from app.core.user_cache import CurrentUser
+from app.db import models
+from app.llm.adapter import ProviderError
+from app.llm.admission import PRIORITIES
+from app.llm.batch import BatchJobManager, job_status, run_batch
+from app.llm.registry import ProviderRegistry
+from app.llm.response_cache import request_fingerprint, response_cache
+from app.llm.usage import QuotaExceeded, billed_user, usage_ledger
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+settings = get_settings()
+
+class BatchRequest(BaseModel):
+    requests: List[ChatRequest]
+    concurrency: Optional[int] = None
+
+def get_batch_priority(x_priority: str = Header("batch")) -> str:
+    """Scheduling priority of a batch; batches yield to interactive traffic by default."""
+    if x_priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown priority: {x_priority}")
+    return x_priority
+
+def get_batch_jobs(request: Request) -> BatchJobManager:
+    """Get the batch job manager created in the application lifespan."""
+    return request.app.state.batch_jobs
+
+def batch_concurrency(batch: BatchRequest) -> int:
+    """Validate the batch size and return the concurrency to run it with."""
+    if not batch.requests:
+        raise HTTPException(status_code=400, detail="Batch has no requests")
+    if len(batch.requests) > settings.BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch has more than {settings.BATCH_MAX_REQUESTS} requests"
+        )
+    concurrency = batch.concurrency or settings.BATCH_DEFAULT_CONCURRENCY
+    if not 1 <= concurrency <= settings.BATCH_MAX_CONCURRENCY:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Concurrency must be between 1 and {settings.BATCH_MAX_CONCURRENCY}"
+        )
+    return concurrency
+
+async def run_chat_item(
+    registry: ProviderRegistry,
+    provider: str,
+    request: Union[ChatRequest, Dict[str, Any]],
+    priority: str
+) -> Dict[str, Any]:
+    """Run one request of a batch; failures become error results instead of failing the batch."""
+    try:
+        if not isinstance(request, ChatRequest):
+            request = ChatRequest(**request)
+        user_id = billed_user()
+        if user_id is not None:
+            await usage_ledger.check_quota(user_id)
+        llm_provider = await get_provider(provider, registry)
+        messages, model_params = await prepare_request(request, llm_provider)
+
+        request_key = request_fingerprint(provider, messages, model_params)
+        cacheable = response_cache.is_cacheable(model_params)
+        if cacheable:
+            cached = await response_cache.get(request_key)
+            if cached is not None:
+                return {"status": 200, "message": cached}
+
+        lease = await admit(registry, provider, messages, model_params, priority)
+        try:
+            message = await registry.latency.track_call(
+                provider, partial(llm_provider.generate_response, messages, model_params)
+            )
+        finally:
+            lease.release()
+        if cacheable:
+            await response_cache.set(request_key, message)
+        return {"status": 200, "message": message}
+    except HTTPException as e:
+        return {"status": e.status_code, "error": e.detail}
+    except QuotaExceeded as e:
+        return {"status": 429, "error": str(e)}
+    except ProviderError as e:
+        return {"status": provider_error_status(e), "error": str(e)}
+
+async def get_owned_job(
+    job_id: str,
+    jobs: BatchJobManager = Depends(get_batch_jobs),
+    current_user: Optional[CurrentUser] = Depends(get_optional_user)
+) -> models.BatchJob:
+    """Load a batch job the caller may see; jobs submitted with a token belong to that user."""
+    job = await jobs.get(job_id)
+    if job is None or (
+        job.user_id is not None
+        and (current_user is None or (current_user.id != job.user_id and not current_user.is_admin))
+    ):
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job
+
+@router.post("/chat/{provider}/batch")
+async def chat_batch(
+    provider: str,
+    batch: BatchRequest,
+    registry: ProviderRegistry = Depends(get_provider_registry),
+    priority: str = Depends(get_batch_priority),
+    current_user: Optional[CurrentUser] = Depends(get_optional_user)
+):
+    """Run many chat requests and stream their results as NDJSON in completion order.
+
+    Each line carries the request's index and either a message or an
+    error with its HTTP status; one failed request does not fail the batch.
+    """
+    concurrency = batch_concurrency(batch)
+    await get_provider(provider, registry)
+    await charge_to(current_user)
+    logger.info("Running batch of %d requests on %s with concurrency %d", len(batch.requests), provider, concurrency)
+
+    async def lines():
+        run = partial(run_chat_item, registry, provider, priority=priority)
+        async for result in run_batch(enumerate(batch.requests), run, concurrency):
+            yield dumps(result) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.post("/chat/{provider}/batch/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_batch_job(
+    provider: str,
+    batch: BatchRequest,
+    registry: ProviderRegistry = Depends(get_provider_registry),
+    jobs: BatchJobManager = Depends(get_batch_jobs),
+    current_user: Optional[CurrentUser] = Depends(get_optional_user)
+):
+    """Run a batch in the background; poll the job for progress and fetch results as they finish."""
+    concurrency = batch_concurrency(batch)
+    await get_provider(provider, registry)
+    await charge_to(current_user)
+    job = await jobs.submit(
+        provider,
+        [request.model_dump() for request in batch.requests],
+        concurrency,
+        user_id=current_user.id if current_user else None
+    )
+    logger.info("Submitted batch job %s with %d requests on %s", job.id, job.total, provider)
+    return job_status(job)
+
+@router.get("/chat/batch/jobs/{job_id}")
+async def get_batch_job(job: models.BatchJob = Depends(get_owned_job)):
+    """Get the status and progress of a batch job."""
+    return job_status(job)
+
+@router.get("/chat/batch/jobs/{job_id}/results")
+async def get_batch_job_results(
+    after: int = 0,
+    limit: int = 1000,
+    job: models.BatchJob = Depends(get_owned_job),
+    jobs: BatchJobManager = Depends(get_batch_jobs)
+):
+    """Stored results as NDJSON in completion order.
+
+    Pass the cursor of the last line received as `after` to continue
+    where a previous read stopped.
+    """
+    results = await jobs.results(job.id, after, min(max(limit, 1), 10000))
+
+    def lines():
+        for result in results:
+            line = {"cursor": result.id, "index": result.index, "status": result.status}
+            if result.error is None:
+                line["message"] = result.message
+            else:
+                line["error"] = result.error
+            yield dumps(line) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.delete("/chat/batch/jobs/{job_id}")
+async def cancel_batch_job(
+    job: models.BatchJob = Depends(get_owned_job),
+    jobs: BatchJobManager = Depends(get_batch_jobs)
+):
+    """Cancel a running batch job; results stored so far remain available."""
+    if not await jobs.cancel(job.id):
+        raise HTTPException(status_code=409, detail=f"Batch job is already {job.status}")
+    return {"message": "Batch job cancelled"}
@@ -1,14 +1,34 @@
-import traceback
-from fastapi import APIRouter, Depends, HTTPException, Request
+from functools import partial
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
 from fastapi.responses import StreamingResponse
-from typing import List, Dict, Any, Optional
+from dataclasses import asdict
+from typing import List, Dict, Any, AsyncGenerator, AsyncIterator, Callable, Optional, Tuple
 from pydantic import BaseModel, Field
-from app.llm.adapter import LLMProvider
-from app.llm.openai_provider import OpenAIProvider
-from app.llm.anthropic_provider import AnthropicProvider
-from app.llm.gemini_provider import GeminiProvider
+from app.llm.adapter import (
+    AuthenticationError,
+    CircuitOpenError,
+    InvalidRequestError,
+    LLMProvider,
+    OverloadedError,
+    ProviderError,
+    ProviderTimeoutError,
+    RateLimitError,
+)
+from app.llm.admission import PRIORITIES, AdmissionRejected, Lease
+from app.llm.broker import StreamPublisher, format_event_id, parse_event_id
+from app.llm.context import context_manager
+from app.llm.messages import ChatMessage, to_chat_messages
+from app.llm.prompt_cache import PromptMessages, cache_prefix, prompt_cache
+from app.llm.registry import ProviderRegistry, ProviderUnavailable
+from app.llm.response_cache import CacheDirectives, iter_replay_chunks, request_fingerprint, response_cache
+from app.llm.routing import PrepareCall, model_for
+from app.llm.singleflight import singleflight
+from app.llm.usage import QuotaExceeded, Usage, bill_to, track_request_usage, usage_ledger
+from app.api.v1.routes.auth import get_optional_user
+from app.core.user_cache import CurrentUser
 from app.core.config import get_settings
-import json
+from app.core.logs import Truncated, sample_payload
+from app.core.sse import encode_event, sse_writer
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,9 +36,6 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 settings = get_settings()
 
-# Initialize LLM providers
-providers: Dict[str, LLMProvider] = {}
-
 class Message(BaseModel):
     role: str
     content: str
@@ -34,124 +51,384 @@ class ChatRequest(BaseModel):
         }
     )
 
-async def get_provider(provider_name: str) -> LLMProvider:
+# Status returned for provider errors that reach the client
+PROVIDER_ERROR_STATUS = [
+    (InvalidRequestError, 400),
+    (RateLimitError, 503),
+    (OverloadedError, 503),
+    (CircuitOpenError, 503),
+    (ProviderTimeoutError, 504),
+    (AuthenticationError, 502),
+]
+
+def provider_error_status(exc: ProviderError) -> int:
+    """HTTP status for a provider error; anything unmapped is a bad gateway."""
+    return next((code for error_class, code in PROVIDER_ERROR_STATUS if isinstance(exc, error_class)), 502)
+
+def get_provider_registry(request: Request) -> ProviderRegistry:
+    """Get the provider registry created in the application lifespan."""
+    return request.app.state.providers
+
+def get_priority(x_priority: str = Header("interactive")) -> str:
+    """Scheduling priority of the request: interactive (default) or batch."""
+    if x_priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown priority: {x_priority}")
+    return x_priority
+
+def saturated_exception(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+async def admit(
+    registry: ProviderRegistry,
+    provider: str,
+    messages: List[ChatMessage],
+    model_params: Dict[str, Any],
+    priority: str
+) -> Lease:
+    """Wait for an upstream slot, or fail with 503 when the provider is saturated."""
+    try:
+        return await registry.admission.acquire(provider, messages, model_params, priority)
+    except AdmissionRejected as e:
+        logger.warning("Rejected request: %s", e)
+        raise saturated_exception(e)
+
+async def coalesced_stream(
+    registry: ProviderRegistry,
+    provider: str,
+    request_key: str,
+    messages: List[ChatMessage],
+    model_params: Dict[str, Any],
+    priority: str,
+    upstream: Callable[[], AsyncGenerator[str, None]]
+) -> AsyncIterator[str]:
+    """Join an identical in-flight stream, or admit and start the upstream stream.
+
+    Only the stream that goes upstream holds an admission slot; followers
+    share its output.
+    """
+    if settings.COALESCE_REQUESTS:
+        joined = singleflight.join(request_key)
+        if joined is not None:
+            return joined
+    lease = await admit(registry, provider, messages, model_params, priority)
+    if not settings.COALESCE_REQUESTS:
+        return lease.hold(upstream())
+    # An identical request may have started while this one waited for admission
+    joined = singleflight.join(request_key)
+    if joined is not None:
+        lease.release()
+        return joined
+    return singleflight.lead(request_key, lease.hold(upstream()))
+
+async def charge_to(user: Optional[CurrentUser]) -> None:
+    """Bill upstream calls of this request to the user, or fail with 429 when their quota is used up."""
+    if user is None:
+        return
+    bill_to(user.id)
+    try:
+        await usage_ledger.check_quota(user.id)
+    except QuotaExceeded as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+async def get_provider(provider_name: str, registry: ProviderRegistry) -> LLMProvider:
     """Get LLM provider instance."""
     try:
-        if provider_name not in providers:
-            if provider_name == "openai":
-                if not settings.OPENAI_API_KEY:
-                    raise HTTPException(status_code=400, detail="OpenAI API key not configured")
-                providers[provider_name] = OpenAIProvider(
-                    api_key=settings.OPENAI_API_KEY,
-                    organization=settings.OPENAI_ORGANIZATION
-                )
-            elif provider_name == "anthropic":
-                if not settings.ANTHROPIC_API_KEY:
-                    raise HTTPException(status_code=400, detail="Anthropic API key not configured")
-                providers[provider_name] = AnthropicProvider(
-                    api_key=settings.ANTHROPIC_API_KEY
-                )
-            elif provider_name == "gemini":
-                if not settings.GOOGLE_API_KEY:
-                    raise HTTPException(status_code=400, detail="Google API key not configured")
-                providers[provider_name] = GeminiProvider(
-                    api_key=settings.GOOGLE_API_KEY
-                )
-            else:
-                raise HTTPException(status_code=400, detail=f"Unknown provider: {provider_name}")
-        
-        return providers[provider_name]
-    except Exception as e:
-        logger.error(f"Error getting provider {provider_name}: {str(e)}")
-        raise
+        return registry.get(provider_name)
+    except ProviderUnavailable as e:
+        logger.error("Error getting provider %s: %s", provider_name, e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def prepare_request(
+    request: ChatRequest,
+    llm_provider: LLMProvider,
+    model: Optional[str] = None,
+    mark_prefix: bool = True
+) -> Tuple[List[ChatMessage], Dict[str, Any]]:
+    """Normalize messages and parameters and fit the conversation to the model's context window.
+
+    The stable prefix of the messages is marked for provider prompt caching
+    unless mark_prefix is False.
+    """
+    # Ensure required parameters are present
+    model_params = {
+        "model": request.model_params.get("model", "gpt-4o"),
+        "temperature": request.model_params.get("temperature", 0.7),
+        "max_tokens": request.model_params.get("max_tokens", 1000),
+        **request.model_params
+    }
+    if model is not None:
+        model_params["model"] = model
+    context_strategy = model_params.pop("context_strategy", None)
+    try:
+        messages = await context_manager.fit(
+            to_chat_messages(request.messages), model_params, llm_provider, context_strategy
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if mark_prefix:
+        messages = prompt_cache.mark(messages)
+    return messages, model_params
+
+def with_usage(body: Dict[str, Any], usage: Usage) -> Dict[str, Any]:
+    """Add the token usage of the request's upstream calls, if it made any, to a response body."""
+    if usage.prompt_tokens:
+        body["usage"] = asdict(usage)
+    return body
+
+def get_stream_publisher(request: Request) -> StreamPublisher:
+    """Get the stream publisher created in the application lifespan."""
+    return request.app.state.streams
+
+def event_stream(frames) -> StreamingResponse:
+    """SSE response for already encoded frames."""
+    return StreamingResponse(
+        frames,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def stream_events(publisher: StreamPublisher, stream_id: str, after: int = 0) -> StreamingResponse:
+    """SSE response replaying a published stream from the event after `after`."""
+    async def events():
+        async for event in publisher.subscribe(stream_id, after):
+            yield format_event_id(stream_id, event.seq), event.payload
+    response = event_stream(sse_writer.stream(events()))
+    response.headers["X-Stream-Id"] = stream_id
+    return response
+
+async def resume_stream(publisher: StreamPublisher, last_event_id: str) -> StreamingResponse:
+    """Resume a published stream after the given SSE event id."""
+    parsed = parse_event_id(last_event_id)
+    if parsed is None:
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    stream_id, seq = parsed
+    if not await publisher.broker.exists(stream_id):
+        raise HTTPException(status_code=404, detail="Stream not found or expired")
+    logger.debug("Resuming stream %s after event %d", stream_id, seq)
+    return stream_events(publisher, stream_id, seq)
+
+def get_candidates(registry: ProviderRegistry, request: ChatRequest, policy: Optional[str]) -> List[str]:
+    """Providers to try for an auto-routed request, in policy order."""
+    try:
+        names = registry.router.candidates(request.model_params, policy)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not names:
+        raise HTTPException(status_code=503, detail="No LLM providers are available")
+    return names
+
+def routed_call(request: ChatRequest, registry: ProviderRegistry) -> PrepareCall:
+    """Prepare the request for whichever provider the router picks."""
+    marked: Optional[List[ChatMessage]] = None
+
+    async def prepare(name: str):
+        nonlocal marked
+        llm_provider = registry.get(name)
+        messages, model_params = await prepare_request(
+            request, llm_provider, model_for(name, request.model_params), mark_prefix=marked is None
+        )
+        if marked is None:
+            marked = messages
+        else:
+            # Marking again would find this request's own context; reuse the first provider's prefix
+            prefix = cache_prefix(marked)
+            messages = PromptMessages(messages, prefix if messages[:prefix] == marked[:prefix] else 0)
+        return llm_provider, messages, model_params
+    return prepare
+
+@router.post("/chat/auto")
+async def chat_auto(
+    request: ChatRequest,
+    response: Response,
+    policy: Optional[str] = None,
+    registry: ProviderRegistry = Depends(get_provider_registry),
+    priority: str = Depends(get_priority),
+    current_user: Optional[CurrentUser] = Depends(get_optional_user)
+):
+    """Generate a chat response from the provider chosen by the routing policy."""
+    names = get_candidates(registry, request, policy)
+    await charge_to(current_user)
+    usage = track_request_usage()
+    try:
+        provider, message = await registry.router.generate(names, routed_call(request, registry), priority)
+    except AdmissionRejected as e:
+        raise saturated_exception(e)
+    response.headers["X-Provider"] = provider
+    return with_usage({"message": message, "provider": provider}, usage)
+
+@router.post("/chat/auto/stream")
+async def chat_auto_stream(
+    request: ChatRequest,
+    policy: Optional[str] = None,
+    registry: ProviderRegistry = Depends(get_provider_registry),
+    publisher: StreamPublisher = Depends(get_stream_publisher),
+    priority: str = Depends(get_priority),
+    last_event_id: Optional[str] = Header(None),
+    current_user: Optional[CurrentUser] = Depends(get_optional_user)
+):
+    """Stream a chat response from the first routed provider to produce a token."""
+    if last_event_id:
+        return await resume_stream(publisher, last_event_id)
+    names = get_candidates(registry, request, policy)
+    await charge_to(current_user)
+    track_request_usage()
+    stream_id = publisher.start(registry.router.stream(names, routed_call(request, registry), priority))
+    return stream_events(publisher, stream_id)
 
 @router.post("/chat/{provider}")
 async def chat(
     provider: str,
-    request: ChatRequest
+    request: ChatRequest,
+    response: Response,
+    registry: ProviderRegistry = Depends(get_provider_registry),
+    priority: str = Depends(get_priority),
+    cache_control: Optional[str] = Header(None),
+    current_user: Optional[CurrentUser] = Depends(get_optional_user)
 ):
     """Generate a chat response."""
     try:
-        logger.debug(f"Received chat request for provider {provider}")
-        logger.debug(f"Request messages: {request.messages}")
-        logger.debug(f"Request model params: {request.model_params}")
+        logger.debug("Received chat request for provider %s", provider)
+        log_payload = sample_payload(logger)
+        if log_payload:
+            logger.debug("Request messages: %s", Truncated(request.messages))
+            logger.debug("Request model params: %s", Truncated(request.model_params))
 
-        llm_provider = await get_provider(provider)
+        llm_provider = await get_provider(provider, registry)
+        messages, model_params = await prepare_request(request, llm_provider)
         
-        # Convert messages to the format expected by the provider
-        messages = [
-            {
-                "role": msg.role,
-                "content": msg.content
-            }
-            for msg in request.messages
-        ]
+        request_key = request_fingerprint(provider, messages, model_params)
+        cacheable = response_cache.is_cacheable(model_params)
+        directives = CacheDirectives.parse(cache_control)
+        if cacheable:
+            cached = await response_cache.get(request_key) if directives.lookup else None
+            if cached is not None:
+                response.headers["X-Cache"] = "HIT"
+                return {"message": cached}
+            response.headers["X-Cache"] = "MISS"
         
-        # Ensure required parameters are present
-        model_params = {
-            "model": request.model_params.get("model", "gpt-4o"),
-            "temperature": request.model_params.get("temperature", 0.7),
-            "max_tokens": request.model_params.get("max_tokens", 1000),
-            **request.model_params
-        }
-        
-        response = await llm_provider.generate_response(messages, model_params)
+        await charge_to(current_user)
+        usage = track_request_usage()
+
+        async def generate() -> str:
+            # Admitted here so coalesced followers do not hold upstream slots
+            lease = await admit(registry, provider, messages, model_params, priority)
+            try:
+                return await registry.latency.track_call(
+                    provider, partial(llm_provider.generate_response, messages, model_params)
+                )
+            finally:
+                lease.release()
+
+        if settings.COALESCE_REQUESTS:
+            message = await singleflight.do(request_key, generate)
+        else:
+            message = await generate()
+        if cacheable and directives.store:
+            await response_cache.set(request_key, message, directives.ttl)
         
-        logger.debug(f"Generated response: {response}")
-        return {"message": response}
+        if log_payload:
+            logger.debug("Generated response: %s", Truncated(message))
+        return with_usage({"message": message}, usage)
     except Exception as e:
-        logger.error(f"Error in chat endpoint: {str(e)}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.error("Error in chat endpoint: %s", e, exc_info=True)
         raise
 
 @router.post("/chat/{provider}/stream")
 async def chat_stream(
     provider: str,
-    request: ChatRequest
+    request: ChatRequest,
+    registry: ProviderRegistry = Depends(get_provider_registry),
+    publisher: StreamPublisher = Depends(get_stream_publisher),
+    priority: str = Depends(get_priority),
+    cache_control: Optional[str] = Header(None),
+    last_event_id: Optional[str] = Header(None),
+    current_user: Optional[CurrentUser] = Depends(get_optional_user)
 ):
-    """Stream a chat response."""
+    """Stream a chat response.
+
+    Clients that lost the connection can resend the request with a
+    Last-Event-ID header to resume without a new upstream call.
+    """
     try:
-        logger.debug(f"Received stream request for provider {provider}")
-        logger.debug(f"Request messages: {request.messages}")
-        logger.debug(f"Request model params: {request.model_params}")
+        if last_event_id:
+            return await resume_stream(publisher, last_event_id)
 
-        llm_provider = await get_provider(provider)
+        logger.debug("Received stream request for provider %s", provider)
+        if sample_payload(logger):
+            logger.debug("Request messages: %s", Truncated(request.messages))
+            logger.debug("Request model params: %s", Truncated(request.model_params))
+
+        llm_provider = await get_provider(provider, registry)
+        messages, model_params = await prepare_request(request, llm_provider)
         
-        async def generate():
-            try:
-                async for chunk in llm_provider.stream_response(request.messages, request.model_params):
-                    yield f"data: {json.dumps({'chunk': chunk})}\n\n"
-            except Exception as e:
-                logger.error(f"Error in stream generation: {str(e)}")
-                logger.error(f"Traceback: {traceback.format_exc()}")
-                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        request_key = request_fingerprint(provider, messages, model_params)
+        cacheable = response_cache.is_cacheable(model_params)
+        directives = CacheDirectives.parse(cache_control)
+        if cacheable:
+            cached = await response_cache.get(request_key) if directives.lookup else None
+            if cached is not None:
+                async def replay():
+                    for chunk in iter_replay_chunks(cached, settings.RESPONSE_CACHE_REPLAY_CHUNK_CHARS):
+                        yield encode_event({"chunk": chunk})
+                response = event_stream(replay())
+                response.headers["X-Cache"] = "HIT"
+                return response
         
-        return StreamingResponse(
-            generate(),
-            media_type="text/event-stream"
+        await charge_to(current_user)
+        track_request_usage()
+        upstream = partial(
+            registry.latency.track_stream, provider, partial(llm_provider.stream_response, messages, model_params)
         )
+        source = await coalesced_stream(registry, provider, request_key, messages, model_params, priority, upstream)
+        on_complete = None
+        if cacheable and directives.store:
+            on_complete = partial(response_cache.set, request_key, ttl=directives.ttl)
+        stream_id = publisher.start(source, on_complete)
+        
+        response = stream_events(publisher, stream_id)
+        if cacheable:
+            response.headers["X-Cache"] = "MISS"
+        return response
     except Exception as e:
-        logger.error(f"Error in chat_stream endpoint: {str(e)}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.error("Error in chat_stream endpoint: %s", e, exc_info=True)
         raise
 
+@router.get("/chat/streams/{stream_id}")
+async def get_stream(
+    stream_id: str,
+    after: int = 0,
+    publisher: StreamPublisher = Depends(get_stream_publisher),
+    last_event_id: Optional[str] = Header(None)
+):
+    """Subscribe to a published stream, e.g. from an EventSource reconnect."""
+    if last_event_id:
+        return await resume_stream(publisher, last_event_id)
+    if not await publisher.broker.exists(stream_id):
+        raise HTTPException(status_code=404, detail="Stream not found or expired")
+    return stream_events(publisher, stream_id, after)
+
 @router.get("/providers")
-async def list_providers():
-    """List available LLM providers and their status."""
+async def list_providers(registry: ProviderRegistry = Depends(get_provider_registry)):
+    """List available LLM providers and their cached health status."""
     providers_status = {}
     
-    for provider_name in ["openai", "anthropic", "gemini"]:
-        try:
-            provider = await get_provider(provider_name)
-            is_valid = await provider.validate_credentials()
-            providers_status[provider_name] = {
-                "available": True,
-                "valid_credentials": is_valid
-            }
-        except Exception:
-            providers_status[provider_name] = {
-                "available": False,
-                "valid_credentials": False
-            }
+    for provider_name in registry.names:
+        health = registry.health.get(provider_name)
+        providers_status[provider_name] = {
+            "available": registry.is_configured(provider_name),
+            "valid_credentials": bool(health.healthy),
+            "checked_at": health.checked_at,
+            "latency_ms": health.latency_ms,
+            "first_token_p50_ms": registry.latency.p50(provider_name),
+            "circuit": registry.breakers[provider_name].state
+        }
     
-    return providers_status 
\ No newline at end of file
+    return providers_status
\ No newline at end of file
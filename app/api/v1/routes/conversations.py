@@ -1,111 +1,108 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import get_settings
 from app.api.v1.routes.auth import get_current_user
+from app.core.user_cache import CurrentUser
+from app.db import models, schemas
+from app.db.repositories import ConversationRepository, InvalidCursor
+from app.db.session import get_async_db
 
 router = APIRouter()
 settings = get_settings()
 
-# In-memory storage for conversations (replace with database in production)
-conversations: Dict[str, List[Dict[str, Any]]] = {}
+def get_conversation_repository(db: AsyncSession = Depends(get_async_db)) -> ConversationRepository:
+    """Get the conversation repository for the request's session."""
+    return ConversationRepository(db)
 
-@router.post("/conversations")
+async def get_owned_conversation(
+    repo: ConversationRepository,
+    conversation_id: str,
+    current_user: CurrentUser,
+    with_messages: bool = False,
+) -> models.Conversation:
+    """Load a conversation and check that it belongs to the current user."""
+    conversation = await repo.get(conversation_id, with_messages=with_messages)
+    if conversation is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
+        )
+    if conversation.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this conversation"
+        )
+    return conversation
+
+@router.post("/conversations", response_model=schemas.Conversation)
 async def create_conversation(
     title: str,
-    current_user: str = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user),
+    repo: ConversationRepository = Depends(get_conversation_repository)
 ):
     """Create a new conversation."""
-    conversation_id = f"{current_user}_{datetime.utcnow().timestamp()}"
-    conversations[conversation_id] = {
-        "id": conversation_id,
-        "title": title,
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow(),
-        "messages": []
-    }
-    return conversations[conversation_id]
+    conversation = await repo.create(current_user.id, title)
+    return schemas.Conversation(
+        id=conversation.id,
+        title=conversation.title,
+        created_at=conversation.created_at,
+        updated_at=conversation.updated_at,
+    )
 
-@router.get("/conversations")
+@router.get("/conversations", response_model=None)
 async def list_conversations(
-    current_user: str = Depends(get_current_user)
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    include_messages: bool = False,
+    current_user: CurrentUser = Depends(get_current_user),
+    repo: ConversationRepository = Depends(get_conversation_repository)
 ):
-    """List all conversations for the current user."""
-    user_conversations = [
-        conv for conv in conversations.values()
-        if conv["id"].startswith(f"{current_user}_")
-    ]
-    return user_conversations
+    """List conversations for the current user, most recently updated first.
+
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    Messages are only included with include_messages=true; fetch a single
+    conversation to get its messages.
+    """
+    try:
+        user_conversations, next_cursor = await repo.list_for_user(
+            current_user.id, limit, cursor, with_messages=include_messages
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    schema = schemas.Conversation if include_messages else schemas.ConversationSummary
+    return [schema.model_validate(conv) for conv in user_conversations]
 
-@router.get("/conversations/{conversation_id}")
+@router.get("/conversations/{conversation_id}", response_model=schemas.Conversation)
 async def get_conversation(
     conversation_id: str,
-    current_user: str = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user),
+    repo: ConversationRepository = Depends(get_conversation_repository)
 ):
     """Get a specific conversation."""
-    if conversation_id not in conversations:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversation not found"
-        )
-    
-    conversation = conversations[conversation_id]
-    if not conversation["id"].startswith(f"{current_user}_"):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to access this conversation"
-        )
-    
-    return conversation
+    return await get_owned_conversation(repo, conversation_id, current_user, with_messages=True)
 
-@router.post("/conversations/{conversation_id}/messages")
+@router.post("/conversations/{conversation_id}/messages", response_model=schemas.Message)
 async def add_message(
     conversation_id: str,
-    message: Dict,
-    current_user: str = Depends(get_current_user)
+    message: schemas.MessageCreate,
+    current_user: CurrentUser = Depends(get_current_user),
+    repo: ConversationRepository = Depends(get_conversation_repository)
 ):
     """Add a message to a conversation."""
-    if conversation_id not in conversations:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversation not found" 
-        )
-    
-    conversation = conversations[conversation_id]
-    if not conversation["id"].startswith(f"{current_user}_"):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to access this conversation"
-        )
-    
-    message_with_metadata = {
-        **message,
-        "timestamp": datetime.utcnow(),
-        "id": f"msg_{datetime.utcnow().timestamp()}"
-    }
-    conversation["messages"].append(message_with_metadata)
-    conversation["updated_at"] = datetime.utcnow()
-    
-    return message_with_metadata
+    conversation = await get_owned_conversation(repo, conversation_id, current_user)
+    return await repo.add_message(conversation, message.role, message.content)
 
 @router.delete("/conversations/{conversation_id}")
 async def delete_conversation(
     conversation_id: str,
-    current_user: str = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user),
+    repo: ConversationRepository = Depends(get_conversation_repository)
 ):
     """Delete a conversation."""
-    if conversation_id not in conversations:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversation not found"
-        )
-    
-    conversation = conversations[conversation_id]
-    if not conversation["id"].startswith(f"{current_user}_"):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to access this conversation"
-        )
-    
-    del conversations[conversation_id]
-    return {"status": "success"} 
\ No newline at end of file
+    conversation = await get_owned_conversation(repo, conversation_id, current_user)
+    await repo.delete(conversation)
+    return {"status": "success"}
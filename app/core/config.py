@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     # API settings
@@ -9,18 +9,39 @@ class Settings(BaseSettings):
     # Server settings
     HOST: str = "0.0.0.0"
     PORT: int = 8000
-    WORKERS: int = 1
+    SERVER_MODE: str = "development"  # development (single process with reload) or production
+    WORKERS: int = 0  # production worker processes; 0 starts one per available CPU
+    # On SIGTERM stop accepting connections and let in-flight requests and
+    # streams finish for up to this long before they are cancelled
+    GRACEFUL_SHUTDOWN_SECONDS: float = 30.0
     
     # Security
     SECRET_KEY: str = "your-secret-key-here"  # Change in production
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Embed user id/role claims in access tokens so requests that only need
+    # identity skip the database. Role changes apply when the token expires.
+    JWT_EMBED_CLAIMS: bool = True
+    USER_CACHE_TTL_SECONDS: float = 60.0
+    USER_CACHE_MAX_SIZE: int = 10000
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64  # queued hash/verify calls before returning 503
+    PASSWORD_HASH_RETRY_AFTER: int = 1
 
     # Database
     DATABASE_URL: str = "sqlite:///./test.db"
+    DATABASE_POOL_SIZE: int = 10
+    DATABASE_MAX_OVERFLOW: int = 20
+    DATABASE_POOL_TIMEOUT: float = 5.0
+    DATABASE_POOL_RECYCLE: int = 1800
+    DATABASE_CREATE_TABLES: bool = True  # create missing tables on startup; disable when migrations manage the schema
+    DATABASE_WARMUP_CONNECTIONS: int = 2  # pooled connections opened before a worker accepts traffic
     
     # Rate limiting
     RATE_LIMIT_PER_MINUTE: int = 60
+    RATE_LIMIT_WINDOW_SECONDS: int = 60
+    RATE_LIMIT_REDIS_RETRY_SECONDS: float = 5.0  # local fallback duration after a Redis failure
     REDIS_URL: str = "redis://localhost:6379"
+    REDIS_SOCKET_TIMEOUT: float = 0.25
     
     # LLM API Keys
     OPENAI_API_KEY: Optional[str] = None
@@ -28,6 +49,122 @@ class Settings(BaseSettings):
     ANTHROPIC_API_KEY: Optional[str] = None
     GOOGLE_API_KEY: Optional[str] = None
     PERPLEXITY_API_KEY: Optional[str] = None
+
+    # LLM provider HTTP connection pool
+    LLM_HTTP2: bool = True
+    LLM_HTTP_MAX_CONNECTIONS: int = 100
+    LLM_HTTP_MAX_KEEPALIVE: int = 20
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    LLM_HTTP_CONNECT_TIMEOUT: float = 5.0
+    LLM_HTTP_READ_TIMEOUT: float = 120.0
+    LLM_HTTP_POOL_TIMEOUT: float = 10.0
+    LLM_PREWARM: bool = True
+
+    # Local fake provider for benchmarks and development; keep disabled in production
+    LLM_FAKE_PROVIDER: bool = False
+    LLM_FAKE_LATENCY_SECONDS: float = 0.2
+    LLM_FAKE_TOKENS_PER_SECOND: float = 0.0  # 0 returns the whole reply after the latency
+
+    # Provider health probes
+    PROVIDER_HEALTH_INTERVAL_SECONDS: float = 300.0
+    PROVIDER_HEALTH_JITTER_SECONDS: float = 30.0
+    PROVIDER_HEALTH_TTL_SECONDS: float = 900.0
+    PROVIDER_HEALTH_TIMEOUT_SECONDS: float = 10.0
+
+    # Context window management
+    CONTEXT_STRATEGY: str = "drop_oldest"  # drop_oldest, keep_last or summarize
+    CONTEXT_KEEP_LAST_MESSAGES: int = 20
+    CONTEXT_RESERVE_TOKENS: int = 256
+    TOKEN_COUNT_CACHE_SIZE: int = 50000  # per-message token counts kept in memory
+    CONTEXT_SUMMARY_CHUNK_MESSAGES: int = 10  # summarize strategy: older turns are summarized this many at a time
+
+    # Response cache for deterministic (temperature 0) completions
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_REDIS: bool = False
+    RESPONSE_CACHE_TTL_SECONDS: float = 3600.0
+    RESPONSE_CACHE_MAX_ENTRIES: int = 5000
+    RESPONSE_CACHE_MAX_ENTRY_CHARS: int = 200000
+    RESPONSE_CACHE_REPLAY_CHUNK_CHARS: int = 256
+
+    # Provider prompt caching of conversation prefixes repeated across requests
+    PROMPT_CACHE_ENABLED: bool = True
+    PROMPT_CACHE_MIN_TOKENS: int = 1024  # shorter prefixes are not marked
+    PROMPT_CACHE_MAX_PREFIXES: int = 10000
+    PROMPT_CACHE_PREFIX_TTL_SECONDS: float = 3600.0
+
+    # Share one upstream call between identical concurrent requests
+    COALESCE_REQUESTS: bool = True
+
+    # Provider routing for /chat/auto
+    ROUTER_POLICY: str = "latency"  # latency, cost or weighted
+    ROUTER_WEIGHTS: str = ""  # e.g. "openai=3,anthropic=1"; unlisted providers weigh 1
+    ROUTER_HEDGE_MS: float = 2000.0  # 0 disables hedging
+    ROUTER_MAX_ATTEMPTS: int = 3
+    ROUTER_LATENCY_WINDOW: int = 200
+
+    # Retries and circuit breaking around provider calls
+    LLM_RETRY_MAX_ATTEMPTS: int = 3
+    LLM_RETRY_BASE_DELAY_SECONDS: float = 0.5
+    LLM_RETRY_MAX_DELAY_SECONDS: float = 8.0
+    LLM_RETRY_MAX_RETRY_AFTER_SECONDS: float = 30.0  # give up instead of waiting longer
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RECOVERY_SECONDS: float = 30.0
+
+    # Admission control per provider and model; limits of 0 disable a bucket
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_CONCURRENCY: int = 32
+    ADMISSION_REQUESTS_PER_MINUTE: int = 0
+    ADMISSION_TOKENS_PER_MINUTE: int = 0
+    # Overrides keyed by "provider" or "provider:model",
+    # e.g. {"openai:gpt-4o": {"concurrency": 16, "rpm": 500, "tpm": 300000}}
+    ADMISSION_LIMITS: Dict[str, Dict[str, int]] = {}
+    # Provider-wide caps across all of a provider's models, e.g. {"openai": {"concurrency": 64, "tpm": 2000000}}
+    ADMISSION_PROVIDER_MAX_CONCURRENCY: int = 64
+    ADMISSION_PROVIDER_LIMITS: Dict[str, Dict[str, int]] = {}
+    ADMISSION_MAX_QUEUE: int = 100
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    ADMISSION_BATCH_QUEUE_TIMEOUT_SECONDS: float = 120.0
+
+    # Logging; records are written to stderr by a background thread
+    LOG_LEVEL: str = "info"
+    LOG_FORMAT: str = "json"  # json or text
+    LOG_PAYLOAD_MAX_CHARS: int = 1000  # longer request and response payloads are truncated
+    LOG_PAYLOAD_SAMPLE_RATE: float = 0.01  # share of requests whose payloads are logged at debug level
+
+    # Metrics; set METRICS_DIR to a directory shared by all workers to aggregate them
+    METRICS_ENABLED: bool = True
+    METRICS_DIR: str = ""
+    METRICS_FLUSH_SECONDS: float = 5.0
+    METRICS_TOKEN: str = ""  # bearer token for scraping /metrics; empty disables the endpoint
+    ADMIN_DB_COUNTS_TTL_SECONDS: float = 60.0  # user/conversation/message counts in /admin/metrics are cached this long
+
+    # Batch chat requests and background batch jobs
+    BATCH_MAX_REQUESTS: int = 10000
+    BATCH_DEFAULT_CONCURRENCY: int = 8
+    BATCH_MAX_CONCURRENCY: int = 64
+    BATCH_JOB_FLUSH_SECONDS: float = 2.0  # how often job results and progress are written
+    BATCH_JOB_LEASE_SECONDS: float = 60.0  # jobs without progress writes for this long are resumed
+
+    # Token usage ledger; quotas of 0 are unlimited
+    USAGE_FLUSH_SECONDS: float = 5.0
+    USAGE_FLUSH_MAX_RECORDS: int = 500  # flush early once this many records are buffered
+    USAGE_BUFFER_MAX_RECORDS: int = 100000  # oldest records are dropped beyond this while the DB is down
+    USAGE_DAILY_TOKEN_LIMIT: int = 0
+    USAGE_MONTHLY_TOKEN_LIMIT: int = 0
+    USAGE_TOTALS_MAX_USERS: int = 100000  # users whose totals are kept in memory for quota checks
+    USAGE_TOTALS_TTL_SECONDS: float = 3600.0  # totals are reloaded from the database after this long
+
+    # Streamed generations are published to a broker so clients can resume them
+    STREAM_BROKER: str = "memory"  # memory or redis
+    STREAM_RETENTION_SECONDS: float = 300.0
+    # Cancel a generation once no client has watched it for the grace period
+    STREAM_CANCEL_ON_DISCONNECT: bool = True
+    STREAM_DISCONNECT_GRACE_SECONDS: float = 10.0
+
+    # SSE output: chunk deltas are batched within a time/size window
+    SSE_COALESCE_MS: float = 15.0  # 0 sends every delta as its own frame
+    SSE_COALESCE_BYTES: int = 512
+    SSE_HEARTBEAT_SECONDS: float = 15.0
     
     class Config:
         env_file = ".env"
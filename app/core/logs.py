@@ -0,0 +1,166 @@
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+import atexit
+import copy
+import logging
+import queue
+import random
+import re
+import sys
+import uuid
+
+from app.core.config import Settings, get_settings
+from app.core.jsonutil import dumps
+
+settings = get_settings()
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+# Id of the HTTP request being handled; tasks it starts, such as stream
+# generations and batch jobs, inherit it
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_listener: Optional[QueueListener] = None
+
+# Client ids end up in log lines, so only short tokens without separators are reused
+REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9-]{1,64}")
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", "-")
+        if request_id != "-":
+            entry["request_id"] = request_id
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return dumps(entry).decode("utf-8")
+
+
+class BackgroundHandler(QueueHandler):
+    """Hands records to the listener thread.
+
+    Only the message and traceback are rendered on the calling thread,
+    since arguments may change once the call returns. Formatting the
+    line and writing it happen on the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.request_id = request_id_var.get() or "-"
+        return record
+
+
+def setup_logging(settings: Settings) -> None:
+    """Route all logging, uvicorn's included, through a queue to a thread writing stderr."""
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, output)
+    _listener.start()
+    # Write what is still queued when the process exits
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.handlers = [BackgroundHandler(log_queue)]
+    root.setLevel(settings.LOG_LEVEL.upper())
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+
+class Truncated:
+    """Log argument rendering a payload up to LOG_PAYLOAD_MAX_CHARS.
+
+    Nothing is rendered unless the record is emitted, and list payloads
+    stop rendering items once the limit is reached.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __str__(self) -> str:
+        limit = settings.LOG_PAYLOAD_MAX_CHARS
+        if isinstance(self.value, (list, tuple)):
+            parts, size = [], 0
+            for item in self.value:
+                if size > limit:
+                    break
+                part = str(item)
+                parts.append(part)
+                size += len(part) + 2
+            text = "[" + ", ".join(parts) + "]"
+            if len(parts) < len(self.value):
+                return f"{text[:limit]}... ({len(self.value)} items)"
+        else:
+            text = str(self.value)
+        if len(text) > limit:
+            return f"{text[:limit]}... ({len(text)} chars)"
+        return text
+
+
+def sample_payload(logger: logging.Logger) -> bool:
+    """Whether to log the payloads of this request: debug logging is on and the request is sampled."""
+    return logger.isEnabledFor(logging.DEBUG) and random.random() < settings.LOG_PAYLOAD_SAMPLE_RATE
+
+
+class RequestIdMiddleware:
+    """ASGI middleware giving each request an id for log correlation.
+
+    A client-supplied X-Request-ID is reused when it is 1-64 letters,
+    digits or hyphens, otherwise one is generated; it is echoed in the
+    response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                value = value.decode("latin-1")
+                if REQUEST_ID_PATTERN.fullmatch(value):
+                    request_id = value
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))],
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
@@ -0,0 +1,365 @@
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Seconds; suits both HTTP handling and upstream LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Gaps between streamed chunks are much shorter
+INTER_TOKEN_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+LabelValues = Tuple[str, ...]
+
+
+class Counter:
+    """Monotonic counter with labels.
+
+    Metrics are updated from the event loop thread only, so plain
+    dictionary updates are enough; no locks on the hot path.
+    """
+
+    kind = "counter"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help: str, labels: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        if not self.registry.enabled:
+            return
+        self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def snapshot(self) -> List[List[Any]]:
+        return [[list(labels), value] for labels, value in self._values.items()]
+
+
+class Histogram:
+    """Fixed-bucket histogram with labels."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per label set: [non-cumulative bucket counts (+Inf last), sum, count]
+        self._series: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        if not self.registry.enabled:
+            return
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def snapshot(self) -> List[List[Any]]:
+        return [[list(labels), [list(counts), total, count]] for labels, (counts, total, count) in self._series.items()]
+
+
+class MetricsRegistry:
+    """Metrics of one worker process, merged with other workers on read.
+
+    When a shared directory is configured, each worker periodically writes
+    its snapshot there, and reads merge the live local snapshot with the
+    latest files of the other workers.
+    """
+
+    def __init__(self, directory: str = "", flush_interval: float = 5.0, enabled: bool = True):
+        """Initialize the registry.
+
+        Args:
+            directory: Directory shared by all workers (empty for single-worker mode)
+            flush_interval: Seconds between snapshot writes
+            enabled: Whether instrumentation records anything
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        self._metrics: Dict[str, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, help, labels))
+
+    def histogram(
+        self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(self, name, help, labels, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Serializable snapshot of this worker's metrics."""
+        return {
+            name: {
+                "type": metric.kind,
+                "help": metric.help,
+                "labels": list(metric.labels),
+                "buckets": list(getattr(metric, "buckets", [])),
+                "series": metric.snapshot(),
+            }
+            for name, metric in self._metrics.items()
+        }
+
+    @property
+    def _path(self) -> str:
+        return os.path.join(self.directory, f"worker-{os.getpid()}.json")
+
+    def start(self) -> None:
+        """Start writing snapshots to the shared directory, if one is configured."""
+        if self.directory and self._task is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop writing snapshots and remove this worker's file."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            os.remove(self._path)
+        except OSError:
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self.flush()
+            except OSError as e:
+                logger.warning("Failed to write metrics snapshot: %s", e)
+            await asyncio.sleep(self.flush_interval)
+
+    def flush(self) -> None:
+        """Atomically write this worker's snapshot."""
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f, separators=(",", ":"))
+        os.replace(tmp_path, self._path)
+
+    def _worker_snapshots(self) -> Iterable[Dict[str, Any]]:
+        yield self.snapshot()
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        stale_before = time.time() - 3 * self.flush_interval
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json") or entry.path == self._path:
+                continue
+            try:
+                if entry.stat().st_mtime < stale_before:
+                    # Worker has exited or hung
+                    continue
+                with open(entry.path) as f:
+                    yield json.load(f)
+            except (OSError, ValueError):
+                continue
+
+    def collect(self) -> Dict[str, Any]:
+        """Snapshot merged across all live workers."""
+        merged: Dict[str, Any] = {}
+        for snapshot in self._worker_snapshots():
+            for name, metric in snapshot.items():
+                target = merged.setdefault(name, {**metric, "series": {}})
+                for labels, value in metric["series"]:
+                    key = tuple(labels)
+                    current = target["series"].get(key)
+                    if current is None:
+                        target["series"][key] = value
+                    elif metric["type"] == "counter":
+                        target["series"][key] = current + value
+                    else:
+                        target["series"][key] = [
+                            [a + b for a, b in zip(current[0], value[0])],
+                            current[1] + value[1],
+                            current[2] + value[2],
+                        ]
+        return merged
+
+    def to_json(self, merged: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Readable summary; histograms report count, sum and estimated percentiles."""
+        merged = self.collect() if merged is None else merged
+        result: Dict[str, Any] = {}
+        for name, metric in merged.items():
+            series = {}
+            for labels, value in metric["series"].items():
+                key = ",".join(f"{k}={v}" for k, v in zip(metric["labels"], labels)) or "total"
+                if metric["type"] == "counter":
+                    series[key] = value
+                else:
+                    counts, total, count = value
+                    series[key] = {
+                        "count": count,
+                        "sum": round(total, 6),
+                        "p50": bucket_quantile(metric["buckets"], counts, 0.5),
+                        "p95": bucket_quantile(metric["buckets"], counts, 0.95),
+                        "p99": bucket_quantile(metric["buckets"], counts, 0.99),
+                    }
+            result[name] = series
+        return result
+
+    def to_prometheus(self, merged: Optional[Dict[str, Any]] = None) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        merged = self.collect() if merged is None else merged
+        lines: List[str] = []
+        for name, metric in merged.items():
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for labels, value in metric["series"].items():
+                pairs = list(zip(metric["labels"], labels))
+                if metric["type"] == "counter":
+                    lines.append(f"{name}{format_labels(pairs)} {format_value(value)}")
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(list(metric["buckets"]) + [math.inf], counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == math.inf else format_value(bound)
+                    lines.append(f"{name}_bucket{format_labels(pairs + [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(pairs)} {format_value(total)}")
+                lines.append(f"{name}_count{format_labels(pairs)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def bucket_quantile(buckets: Sequence[float], counts: Sequence[int], q: float) -> Optional[float]:
+    """Estimate a quantile by linear interpolation within histogram buckets."""
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for index, count in enumerate(counts):
+        if seen + count >= rank and count:
+            if index == len(buckets):
+                return buckets[-1]
+            lower = buckets[index - 1] if index else 0.0
+            return lower + (buckets[index] - lower) * (rank - seen) / count
+        seen += count
+    return buckets[-1]
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label_value(str(value))}"' for key, value in pairs) + "}"
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests and timing the response head.
+
+    Requests are labelled with the matched route template, not the raw
+    path, to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        responded = False
+
+        def record(status_code: int) -> None:
+            path = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_DURATION.observe(time.perf_counter() - started, scope["method"], path)
+            HTTP_REQUESTS.inc(scope["method"], path, str(status_code))
+
+        async def send_wrapper(message):
+            nonlocal responded
+            if message["type"] == "http.response.start":
+                responded = True
+                record(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if not responded:
+                record(500)
+            raise
+
+
+metrics = MetricsRegistry(
+    directory=settings.METRICS_DIR,
+    flush_interval=settings.METRICS_FLUSH_SECONDS,
+    enabled=settings.METRICS_ENABLED,
+)
+
+HTTP_REQUESTS = metrics.counter(
+    "http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+HTTP_DURATION = metrics.histogram(
+    "http_request_duration_seconds", "Time to produce the HTTP response head", ["method", "route"]
+)
+LLM_REQUESTS = metrics.counter(
+    "llm_requests_total", "Upstream LLM calls by outcome", ["provider", "model", "outcome"]
+)
+LLM_RETRIES = metrics.counter(
+    "llm_retries_total", "Upstream LLM call retries", ["provider"]
+)
+LLM_DURATION = metrics.histogram(
+    "llm_request_duration_seconds", "Upstream LLM call duration", ["provider", "model"]
+)
+LLM_FIRST_TOKEN = metrics.histogram(
+    "llm_time_to_first_token_seconds", "Time to the first streamed chunk", ["provider", "model"]
+)
+LLM_INTER_TOKEN = metrics.histogram(
+    "llm_inter_token_seconds", "Gap between streamed chunks", ["provider", "model"], INTER_TOKEN_BUCKETS
+)
+LLM_TOKENS = metrics.counter(
+    "llm_tokens_total", "Upstream tokens by direction (prompt, completion or cached_prompt)", ["provider", "model", "direction"]
+)
+CACHE_LOOKUPS = metrics.counter(
+    "cache_lookups_total", "Cache lookups by result", ["cache", "result"]
+)
+RATE_LIMIT_REJECTIONS = metrics.counter(
+    "rate_limit_rejections_total", "Requests rejected by the API rate limiter"
+)
+ADMISSION_REJECTIONS = metrics.counter(
+    "admission_rejections_total", "Requests rejected by provider admission control", ["lane", "reason"]
+)
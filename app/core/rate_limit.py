@@ -1,61 +1,155 @@
-from fastapi import Request, HTTPException, status
-from redis import Redis
-from app.core.config import get_settings
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Deque, Optional
+import logging
+import secrets
 import time
 
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from app.core.config import get_settings
+from app.core.metrics import RATE_LIMIT_REJECTIONS
+
+logger = logging.getLogger(__name__)
+
 settings = get_settings()
 
+# Sliding-window log executed atomically on the Redis server. Expired entries
+# are trimmed, the request is admitted if there is room, and the remaining
+# quota / retry delay is returned, all in a single round trip.
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+local count = redis.call('ZCARD', key)
+if count < limit then
+    redis.call('ZADD', key, now, ARGV[4])
+    redis.call('PEXPIRE', key, window)
+    return {1, limit - count - 1, 0}
+end
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+return {0, 0, window - (now - tonumber(oldest[2]))}
+"""
+
+
+@dataclass
+class RateLimitResult:
+    """Outcome of a single rate limit check."""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float = 0.0
+
+
+class LocalSlidingWindow:
+    """In-process sliding-window limiter used when Redis is unreachable."""
+
+    def __init__(self, limit: int, window: float, max_keys: int = 10000):
+        """Initialize the local limiter.
+
+        Args:
+            limit: Maximum number of requests per window
+            window: Window length in seconds
+            max_keys: Maximum number of tracked keys before the least recently used is evicted
+        """
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._hits: "OrderedDict[str, Deque[float]]" = OrderedDict()
+
+    def hit(self, key: str) -> RateLimitResult:
+        """Record a request for the key and return the limit decision."""
+        now = time.monotonic()
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = self._hits[key] = deque()
+            if len(self._hits) > self.max_keys:
+                self._hits.popitem(last=False)
+        else:
+            self._hits.move_to_end(key)
+
+        cutoff = now - self.window
+        while hits and hits[0] <= cutoff:
+            hits.popleft()
+
+        if len(hits) < self.limit:
+            hits.append(now)
+            return RateLimitResult(True, self.limit, self.limit - len(hits))
+        return RateLimitResult(False, self.limit, 0, hits[0] + self.window - now)
+
+
 class RateLimiter:
-    """Rate limiter using Redis."""
-    
-    def __init__(self):
-        """Initialize Redis connection."""
-        self.redis = Redis.from_url(settings.REDIS_URL)
-        self.rate_limit = settings.RATE_LIMIT_PER_MINUTE
-    
-    def is_rate_limited(self, key: str) -> bool:
-        """Check if the request is rate limited."""
-        current = int(time.time())
-        window = 60  # 1 minute window
-        
-        # Get the current count for the key
-        count = self.redis.get(key)
-        if count is None:
-            # First request in the window
-            self.redis.setex(key, window, 1)
-            return False
-        
-        count = int(count)
-        if count >= self.rate_limit:
-            return True
-        
-        # Increment the counter
-        self.redis.incr(key)
-        return False
-    
-    def get_remaining(self, key: str) -> int:
-        """Get remaining requests for the key."""
-        count = self.redis.get(key)
-        if count is None:
-            return self.rate_limit
-        return max(0, self.rate_limit - int(count))
+    """Sliding-window rate limiter backed by Redis with a local fallback."""
+
+    def __init__(
+        self,
+        redis: Optional[aioredis.Redis] = None,
+        limit: Optional[int] = None,
+        window: Optional[int] = None,
+    ):
+        """Initialize the rate limiter.
+
+        Args:
+            redis: Async Redis client (created lazily from REDIS_URL if omitted)
+            limit: Maximum number of requests per window
+            window: Window length in seconds
+        """
+        self.redis = redis or aioredis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        )
+        self.rate_limit = limit or settings.RATE_LIMIT_PER_MINUTE
+        self.window = window or settings.RATE_LIMIT_WINDOW_SECONDS
+        self.local = LocalSlidingWindow(self.rate_limit, self.window)
+        self._script = self.redis.register_script(SLIDING_WINDOW_SCRIPT)
+        self._redis_down_until = 0.0
+
+    async def hit(self, key: str) -> RateLimitResult:
+        """Record a request for the key and return the limit decision."""
+        if time.monotonic() < self._redis_down_until:
+            return self.local.hit(key)
+
+        now_ms = int(time.time() * 1000)
+        try:
+            allowed, remaining, retry_ms = await self._script(
+                keys=[key],
+                args=[now_ms, self.window * 1000, self.rate_limit, f"{now_ms}-{secrets.token_hex(4)}"],
+            )
+        except (RedisError, OSError) as e:
+            logger.warning("Redis unavailable for rate limiting, using local limiter: %s", e)
+            self._redis_down_until = time.monotonic() + settings.RATE_LIMIT_REDIS_RETRY_SECONDS
+            return self.local.hit(key)
+
+        return RateLimitResult(bool(allowed), self.rate_limit, int(remaining), int(retry_ms) / 1000)
 
 rate_limiter = RateLimiter()
 
 async def rate_limit_middleware(request: Request, call_next):
     """Rate limiting middleware."""
-    client_ip = request.client.host
+    client_ip = request.client.host if request.client else "unknown"
     key = f"rate_limit:{client_ip}"
-    
-    if rate_limiter.is_rate_limited(key):
-        remaining = rate_limiter.get_remaining(key)
-        raise HTTPException(
+
+    result = await rate_limiter.hit(key)
+    headers = {
+        "X-RateLimit-Limit": str(result.limit),
+        "X-RateLimit-Remaining": str(result.remaining),
+    }
+    if not result.allowed:
+        RATE_LIMIT_REJECTIONS.inc()
+        headers["Retry-After"] = str(max(1, int(result.retry_after + 0.999)))
+        return JSONResponse(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Too many requests",
-            headers={"X-RateLimit-Remaining": str(remaining)}
+            content={"detail": "Too many requests"},
+            headers=headers,
         )
-    
+
     response = await call_next(request)
-    remaining = rate_limiter.get_remaining(key)
-    response.headers["X-RateLimit-Remaining"] = str(remaining)
-    return response 
\ No newline at end of file
+    response.headers.update(headers)
+    return response
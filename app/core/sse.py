@@ -0,0 +1,141 @@
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+
+from app.core.config import get_settings
+from app.core.jsonutil import BACKEND, dumps
+
+settings = get_settings()
+
+HEARTBEAT = b": keep-alive\n\n"
+
+# An event to send: (SSE id or None, JSON payload)
+SSEEvent = Tuple[Optional[str], Dict[str, Any]]
+
+_END = object()
+
+
+def encode_event(payload: Dict[str, Any], event_id: Optional[str] = None) -> bytes:
+    """Encode a single SSE frame."""
+    if event_id is None:
+        return b"data: " + dumps(payload) + b"\n\n"
+    return b"id: " + event_id.encode("utf-8") + b"\ndata: " + dumps(payload) + b"\n\n"
+
+
+class SSEWriter:
+    """Turns an event stream into SSE frames.
+
+    Consecutive chunk deltas arriving within the coalescing window are
+    merged into one frame carrying the id of the last delta, so resuming
+    from a frame id never skips text. Heartbeat comments keep idle
+    connections open through proxies.
+    """
+
+    def __init__(self, coalesce_seconds: float, coalesce_bytes: int, heartbeat_seconds: float):
+        """Initialize the writer.
+
+        Args:
+            coalesce_seconds: How long to wait for more deltas after the first one (0 disables)
+            coalesce_bytes: Flush a batch once it reaches this many bytes
+            heartbeat_seconds: Idle time before a heartbeat comment is sent (0 disables)
+        """
+        self.coalesce_seconds = coalesce_seconds
+        self.coalesce_bytes = coalesce_bytes
+        self.heartbeat_seconds = heartbeat_seconds or None
+        self.events = 0
+        self.frames = 0
+        self.bytes = 0
+
+    async def stream(self, events: AsyncIterator[SSEEvent]) -> AsyncGenerator[bytes, None]:
+        """Yield encoded frames for events."""
+        if self.coalesce_seconds <= 0 and self.heartbeat_seconds is None:
+            async for event_id, payload in events:
+                self.events += 1
+                yield self._frame(encode_event(payload, event_id))
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+        pump = asyncio.create_task(self._pump(events, queue))
+        loop = asyncio.get_running_loop()
+        pending: List[str] = []
+        pending_bytes = 0
+        pending_id: Optional[str] = None
+        deadline: Optional[float] = None
+        try:
+            while True:
+                if not queue.empty():
+                    item = queue.get_nowait()
+                else:
+                    timeout = self.heartbeat_seconds if deadline is None else max(0.0, deadline - loop.time())
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        if pending:
+                            yield self._frame(encode_event({"chunk": "".join(pending)}, pending_id))
+                            pending, pending_bytes, deadline = [], 0, None
+                        else:
+                            yield self._frame(HEARTBEAT)
+                        continue
+
+                if item is _END:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+
+                event_id, payload = item
+                self.events += 1
+                chunk = payload.get("chunk") if len(payload) == 1 else None
+                if chunk is None or self.coalesce_seconds <= 0:
+                    if pending:
+                        yield self._frame(encode_event({"chunk": "".join(pending)}, pending_id))
+                        pending, pending_bytes, deadline = [], 0, None
+                    yield self._frame(encode_event(payload, event_id))
+                    continue
+
+                pending.append(chunk)
+                pending_bytes += len(chunk.encode("utf-8"))
+                pending_id = event_id
+                if deadline is None:
+                    deadline = loop.time() + self.coalesce_seconds
+                if pending_bytes >= self.coalesce_bytes:
+                    yield self._frame(encode_event({"chunk": "".join(pending)}, pending_id))
+                    pending, pending_bytes, deadline = [], 0, None
+
+            if pending:
+                yield self._frame(encode_event({"chunk": "".join(pending)}, pending_id))
+        finally:
+            pump.cancel()
+            await asyncio.gather(pump, return_exceptions=True)
+
+    @staticmethod
+    async def _pump(events: AsyncIterator[SSEEvent], queue: asyncio.Queue) -> None:
+        try:
+            async for event in events:
+                queue.put_nowait(event)
+        except Exception as e:
+            queue.put_nowait(e)
+        else:
+            queue.put_nowait(_END)
+        finally:
+            aclose = getattr(events, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    def _frame(self, frame: bytes) -> bytes:
+        self.frames += 1
+        self.bytes += len(frame)
+        return frame
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "events": self.events,
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "json": BACKEND,
+        }
+
+
+sse_writer = SSEWriter(
+    coalesce_seconds=settings.SSE_COALESCE_MS / 1000,
+    coalesce_bytes=settings.SSE_COALESCE_BYTES,
+    heartbeat_seconds=settings.SSE_HEARTBEAT_SECONDS,
+)
@@ -0,0 +1,50 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event, inspect
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.db import models
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """Identity of the authenticated user, detached from any DB session."""
+
+    id: int
+    email: str
+    role: models.UserRole
+    name: Optional[str] = None
+    photo: Optional[str] = None
+
+    @classmethod
+    def from_model(cls, user: models.User) -> "CurrentUser":
+        return cls(id=user.id, email=user.email, role=user.role, name=user.name, photo=user.photo)
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == models.UserRole.ADMIN
+
+
+# Users keyed by token subject (email)
+user_cache: TTLCache[CurrentUser] = TTLCache(
+    maxsize=settings.USER_CACHE_MAX_SIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
+
+
+def invalidate_user(email: str) -> None:
+    """Drop a cached user so the next request reloads it from the database."""
+    user_cache.pop(email)
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_on_change(mapper, connection, target: models.User) -> None:
+    invalidate_user(target.email)
+    # The email itself may have changed; drop the previous key as well
+    for previous_email in inspect(target).attrs.email.history.deleted or ():
+        invalidate_user(previous_email)
@@ -1,9 +1,15 @@
-from sqlalchemy import Column, Integer, String, Enum, DateTime
+from sqlalchemy import Column, Integer, String, Enum, DateTime, Float, ForeignKey, Index, Text, UniqueConstraint
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from datetime import datetime, timezone
 import enum
+import uuid
 
 from .session import Base
 
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
 class UserRole(enum.Enum):
     ADMIN = "admin"
     USER = "user"
@@ -20,3 +26,96 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+class Conversation(Base):
+    __tablename__ = "conversations"
+    __table_args__ = (
+        # Serves keyset-paginated listing of a single user's conversations
+        Index("ix_conversations_user_updated", "user_id", "updated_at", "id"),
+    )
+
+    id = Column(String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    title = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=_utcnow, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=_utcnow, nullable=False)
+
+    messages = relationship(
+        "Message",
+        back_populates="conversation",
+        order_by="Message.id",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+class Message(Base):
+    __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_conversation_id", "conversation_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    conversation_id = Column(String(32), ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False)
+    role = Column(String(16), nullable=False)
+    content = Column(Text, nullable=False)
+    timestamp = Column(DateTime(timezone=True), default=_utcnow, nullable=False)
+
+    conversation = relationship("Conversation", back_populates="messages")
+
+class UsageRecord(Base):
+    __tablename__ = "usage_records"
+    __table_args__ = (
+        # Serves per-user quota totals and billing periods
+        Index("ix_usage_records_user_created", "user_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # Null for anonymous requests
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    provider = Column(String(32), nullable=False)
+    model = Column(String, nullable=False)
+    prompt_tokens = Column(Integer, nullable=False)
+    completion_tokens = Column(Integer, nullable=False)
+    # Prompt tokens read from the provider's prompt cache; included in prompt_tokens
+    cached_tokens = Column(Integer, nullable=False, default=0)
+    # USD at catalog list prices when the call was made
+    cost = Column(Float, nullable=False, default=0.0)
+    created_at = Column(DateTime(timezone=True), default=_utcnow, nullable=False)
+
+class BatchJob(Base):
+    __tablename__ = "batch_jobs"
+    __table_args__ = (
+        # Serves the scan for jobs whose worker stopped writing progress
+        Index("ix_batch_jobs_status_updated", "status", "updated_at"),
+    )
+
+    id = Column(String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    provider = Column(String(32), nullable=False)
+    status = Column(String(16), nullable=False, default="running")  # running, completed or cancelled
+    # Worker currently running the job; progress writes from any other worker are ignored
+    worker_id = Column(String(32), nullable=False)
+    concurrency = Column(Integer, nullable=False)
+    # JSON list of chat requests
+    requests = Column(Text, nullable=False)
+    total = Column(Integer, nullable=False)
+    # Requests with a stored result, including failed ones
+    completed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), default=_utcnow, nullable=False)
+    # Refreshed on every progress write; doubles as the worker's lease
+    updated_at = Column(DateTime(timezone=True), default=_utcnow, nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+class BatchResult(Base):
+    __tablename__ = "batch_results"
+    __table_args__ = (
+        UniqueConstraint("job_id", "index", name="uq_batch_results_job_index"),
+    )
+
+    # Increases in completion order; used as the results cursor
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String(32), ForeignKey("batch_jobs.id", ondelete="CASCADE"), nullable=False)
+    index = Column(Integer, nullable=False)
+    status = Column(Integer, nullable=False)
+    message = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
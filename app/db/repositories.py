@@ -0,0 +1,139 @@
+from typing import List, Optional, Tuple
+from datetime import datetime, timezone
+import base64
+
+from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from . import models
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(conversation: models.Conversation) -> str:
+    """Encode the keyset position of a conversation as an opaque cursor."""
+    raw = f"{conversation.updated_at.isoformat()}|{conversation.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Decode a cursor produced by encode_cursor."""
+    try:
+        updated_at, conversation_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(updated_at), conversation_id
+    except ValueError as e:
+        raise InvalidCursor(str(e)) from e
+
+
+class UserRepository:
+    """Data access for users."""
+
+    def __init__(self, db: AsyncSession):
+        """Initialize the repository.
+
+        Args:
+            db: Database session
+        """
+        self.db = db
+
+    async def get_by_email(self, email: str) -> Optional[models.User]:
+        """Get a user by email address."""
+        result = await self.db.execute(select(models.User).where(models.User.email == email))
+        return result.scalar_one_or_none()
+
+    async def create(self, email: str, password_hash: str, name: Optional[str] = None, photo: Optional[str] = None) -> models.User:
+        """Create a new user."""
+        user = models.User(email=email, password_hash=password_hash, name=name, photo=photo)
+        self.db.add(user)
+        await self.db.commit()
+        await self.db.refresh(user)
+        return user
+
+
+class ConversationRepository:
+    """Data access for conversations and their messages."""
+
+    def __init__(self, db: AsyncSession):
+        """Initialize the repository.
+
+        Args:
+            db: Database session
+        """
+        self.db = db
+
+    async def create(self, user_id: int, title: str) -> models.Conversation:
+        """Create a new, empty conversation for a user."""
+        conversation = models.Conversation(user_id=user_id, title=title)
+        self.db.add(conversation)
+        await self.db.commit()
+        await self.db.refresh(conversation)
+        return conversation
+
+    async def get(self, conversation_id: str, with_messages: bool = False) -> Optional[models.Conversation]:
+        """Get a conversation by id."""
+        query = select(models.Conversation).where(models.Conversation.id == conversation_id)
+        if with_messages:
+            query = query.options(selectinload(models.Conversation.messages))
+        return (await self.db.execute(query)).scalar_one_or_none()
+
+    async def list_for_user(
+        self,
+        user_id: int,
+        limit: int,
+        cursor: Optional[str] = None,
+        with_messages: bool = False,
+    ) -> Tuple[List[models.Conversation], Optional[str]]:
+        """List a user's conversations, most recently updated first.
+
+        Uses keyset pagination on (user_id, updated_at, id) so the cost of a
+        page does not depend on the total number of conversations stored.
+
+        Args:
+            user_id: Owner of the conversations
+            limit: Maximum number of conversations to return
+            cursor: Cursor returned with the previous page
+            with_messages: Whether to eagerly load messages for the page
+
+        Returns:
+            The page of conversations and the cursor for the next page, if any
+        """
+        Conversation = models.Conversation
+        query = (
+            select(Conversation)
+            .where(Conversation.user_id == user_id)
+            .order_by(Conversation.updated_at.desc(), Conversation.id.desc())
+            .limit(limit + 1)
+        )
+        if cursor:
+            updated_at, conversation_id = decode_cursor(cursor)
+            query = query.where(or_(
+                Conversation.updated_at < updated_at,
+                and_(Conversation.updated_at == updated_at, Conversation.id < conversation_id),
+            ))
+        if with_messages:
+            query = query.options(selectinload(Conversation.messages))
+
+        conversations = list((await self.db.execute(query)).scalars())
+        next_cursor = None
+        if len(conversations) > limit:
+            conversations = conversations[:limit]
+            next_cursor = encode_cursor(conversations[-1])
+        return conversations, next_cursor
+
+    async def add_message(self, conversation: models.Conversation, role: str, content: str) -> models.Message:
+        """Append a message to a conversation and bump its update time."""
+        message = models.Message(conversation_id=conversation.id, role=role, content=content)
+        conversation.updated_at = datetime.now(timezone.utc)
+        self.db.add(message)
+        await self.db.commit()
+        await self.db.refresh(message)
+        return message
+
+    async def delete(self, conversation: models.Conversation) -> None:
+        """Delete a conversation and its messages."""
+        await self.db.execute(delete(models.Message).where(models.Message.conversation_id == conversation.id))
+        await self.db.delete(conversation)
+        await self.db.commit()
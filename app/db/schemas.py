@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
+from datetime import datetime
 from enum import Enum
 
 class UserRole(str, Enum):
@@ -21,3 +22,26 @@ class User(UserBase):
     class Config:
         orm_mode = True
 
+
+class MessageCreate(BaseModel):
+    role: str
+    content: str
+
+class Message(MessageCreate):
+    id: int
+    timestamp: datetime
+
+    class Config:
+        from_attributes = True
+
+class ConversationSummary(BaseModel):
+    id: str
+    title: str
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class Conversation(ConversationSummary):
+    messages: List[Message] = []
@@ -1,5 +1,105 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional, AsyncGenerator
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Any, Mapping, Optional, AsyncGenerator
+import time
+from .messages import ChatMessage
+
+class ProviderError(Exception):
+    """Error returned by an LLM provider.
+
+    Attributes:
+        provider: Provider label, e.g. "OpenAI"
+        status_code: HTTP status of the failed call, if any
+        retry_after: Seconds the provider asked us to wait, if it said so
+    """
+
+    retryable = False
+
+    def __init__(
+        self,
+        provider: str,
+        message: str,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None
+    ):
+        super().__init__(f"{provider} API error: {message}")
+        self.provider = provider
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class InvalidRequestError(ProviderError):
+    """The request was rejected as malformed (400, 404, 422)."""
+
+class AuthenticationError(ProviderError):
+    """The API key was rejected (401, 403)."""
+
+class RateLimitError(ProviderError):
+    """The provider's rate limit or quota was hit (429)."""
+
+    retryable = True
+
+class OverloadedError(ProviderError):
+    """The provider is temporarily overloaded (503, 529)."""
+
+    retryable = True
+
+class ServerError(ProviderError):
+    """The provider failed internally (other 5xx)."""
+
+    retryable = True
+
+class ProviderTimeoutError(ProviderError):
+    """The call timed out or the connection failed."""
+
+    retryable = True
+
+class CircuitOpenError(ProviderError):
+    """Calls are short-circuited because the provider keeps failing."""
+
+def error_from_status(
+    provider: str,
+    status_code: Optional[int],
+    message: str,
+    retry_after: Optional[float] = None
+) -> ProviderError:
+    """Build the typed error for an HTTP status code."""
+    if status_code == 429:
+        error_class = RateLimitError
+    elif status_code in (503, 529):
+        error_class = OverloadedError
+    elif status_code in (401, 403):
+        error_class = AuthenticationError
+    elif status_code in (408, 504):
+        error_class = ProviderTimeoutError
+    elif status_code is not None and status_code >= 500:
+        error_class = ServerError
+    elif status_code is not None and status_code >= 400:
+        error_class = InvalidRequestError
+    else:
+        error_class = ProviderError
+    return error_class(provider, message, status_code, retry_after)
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Seconds to wait from retry-after-ms or retry-after (seconds or HTTP date) headers."""
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
 
 class LLMProvider(ABC):
     """Abstract base class for LLM providers."""
@@ -7,13 +107,13 @@ class LLMProvider(ABC):
     @abstractmethod
     async def generate_response(
         self, 
-        messages: List[Dict[str, str]], 
+        messages: List[ChatMessage], 
         model_params: Dict[str, Any]
     ) -> str:
         """Generate a single response from the LLM.
         
         Args:
-            messages: List of message dictionaries with 'role' and 'content' keys
+            messages: Conversation messages (ChatMessages or dicts with 'role' and 'content' keys)
             model_params: Dictionary of model-specific parameters
             
         Returns:
@@ -24,13 +124,13 @@ class LLMProvider(ABC):
     @abstractmethod
     async def stream_response(
         self, 
-        messages: List[Dict[str, str]], 
+        messages: List[ChatMessage], 
         model_params: Dict[str, Any]
     ) -> AsyncGenerator[str, None]:
         """Stream responses from the LLM.
         
         Args:
-            messages: List of message dictionaries with 'role' and 'content' keys
+            messages: Conversation messages (ChatMessages or dicts with 'role' and 'content' keys)
             model_params: Dictionary of model-specific parameters
             
         Yields:
@@ -45,4 +145,12 @@ class LLMProvider(ABC):
         Returns:
             True if credentials are valid, False otherwise
         """
-        pass 
\ No newline at end of file
+        pass
+
+    async def warmup(self) -> None:
+        """Open connections to the provider ahead of the first request."""
+        pass
+
+    async def aclose(self) -> None:
+        """Release resources owned by the provider."""
+        pass
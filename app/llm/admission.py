@@ -0,0 +1,340 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Deque, Dict, List, Optional
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+
+from app.core.config import Settings
+from app.core.metrics import ADMISSION_REJECTIONS
+from .catalog import get_model_info
+from .context import context_manager
+from .messages import ChatMessage
+from .routing import percentile
+
+logger = logging.getLogger(__name__)
+
+# Lower values are admitted first
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+
+class AdmissionRejected(Exception):
+    """Raised when a provider lane is saturated and the request cannot wait."""
+
+    def __init__(self, lane: str, retry_after: int, reason: str):
+        super().__init__(f"{lane} is saturated ({reason}), retry in {retry_after}s")
+        self.lane = lane
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+def estimate_tokens(messages: List[ChatMessage], model_params: Dict[str, Any]) -> int:
+    """Tokens a call may consume: the prompt estimate plus the output limit."""
+    return context_manager.counter.count(messages) + int(model_params.get("max_tokens") or 0)
+
+
+class TokenBucket:
+    """Refills continuously up to a per-minute allowance."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount can be taken; 0 if it can be taken now."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        """Return tokens taken for a call that never started."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + min(amount, self.capacity))
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    tokens: int = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class AdmissionLane:
+    """Admission state for one provider/model pair, or for a whole provider."""
+
+    def __init__(self, name: str, concurrency: int, rpm: int, tpm: int, max_queue: int):
+        """Initialize the lane.
+
+        Args:
+            name: Lane name, e.g. "openai:gpt-4o" or "openai"
+            concurrency: Maximum concurrent upstream calls
+            rpm: Requests per minute (0 for no limit)
+            tpm: Estimated tokens per minute (0 for no limit)
+            max_queue: Maximum number of waiting requests
+        """
+        self.name = name
+        self.concurrency = concurrency
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.waits: Deque[float] = deque(maxlen=500)
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _bucket_wait(self, tokens: int) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens))
+        return wait
+
+    def _admit(self, tokens: int) -> None:
+        self.in_flight += 1
+        self.admitted += 1
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(tokens)
+
+    def retry_after(self, tokens: int) -> int:
+        return math.ceil(max(1.0, self._bucket_wait(tokens)))
+
+    async def acquire(self, tokens: int, priority: int, timeout: float) -> None:
+        """Wait for a slot in priority order.
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait times out
+        """
+        if not self._queue and self.in_flight < self.concurrency and self._bucket_wait(tokens) == 0:
+            self._admit(tokens)
+            self.waits.append(0.0)
+            return
+        if len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            ADMISSION_REJECTIONS.inc(self.name, "queue_full")
+            raise AdmissionRejected(self.name, self.retry_after(tokens), "queue full")
+
+        waiter = _Waiter(priority, next(self._seq), tokens, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, waiter)
+        self._dispatch()
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done():
+                # Admitted just as the wait ended
+                if isinstance(e, asyncio.CancelledError):
+                    self.release()
+                    raise
+            else:
+                waiter.future.cancel()
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+                # The removed waiter may have been the head holding the others back
+                self._dispatch()
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                self.timed_out += 1
+                ADMISSION_REJECTIONS.inc(self.name, "timeout")
+                raise AdmissionRejected(self.name, self.retry_after(tokens), "queue wait timed out")
+        self.waits.append((time.monotonic() - started) * 1000)
+
+    def release(self) -> None:
+        """Return a slot and admit waiting requests."""
+        self.in_flight -= 1
+        self._dispatch()
+
+    def cancel(self, tokens: int) -> None:
+        """Undo an admission whose call never started, returning its slot and bucket tokens."""
+        self.admitted -= 1
+        if self.requests is not None:
+            self.requests.give_back(1)
+        if self.tokens is not None:
+            self.tokens.give_back(tokens)
+        self.release()
+
+    def _dispatch(self) -> None:
+        while self._queue:
+            head = self._queue[0]
+            if self.in_flight >= self.concurrency:
+                return
+            wait = self._bucket_wait(head.tokens)
+            if wait > 0:
+                # The head may have changed since the timer was set, so wait for the current one
+                if self._timer is not None:
+                    self._timer.cancel()
+                self._timer = asyncio.get_running_loop().call_later(wait, self._on_timer)
+                return
+            heapq.heappop(self._queue)
+            self._admit(head.tokens)
+            head.future.set_result(None)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "concurrency": self.concurrency,
+            "queue_depth": len(self._queue),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_p50_ms": percentile(self.waits, 0.5),
+            "wait_p95_ms": percentile(self.waits, 0.95),
+            "wait_max_ms": max(self.waits, default=None),
+        }
+
+
+class Lease:
+    """Granted admission slots; release them when the upstream call ends."""
+
+    def __init__(self, *lanes: AdmissionLane):
+        self.lanes = lanes
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            for lane in self.lanes:
+                lane.release()
+
+    async def hold(self, source: AsyncGenerator[str, None]) -> AsyncGenerator[str, None]:
+        """Iterate source, releasing the lease when the stream ends."""
+        try:
+            async for chunk in source:
+                yield chunk
+        finally:
+            self.release()
+            await source.aclose()
+
+
+class AdmissionController:
+    """Bounds upstream calls per provider and model.
+
+    Each lane combines a concurrency limit with request and token buckets
+    sized to the vendor quota. Requests that cannot start immediately wait
+    in a priority queue (interactive before batch) up to a timeout. A call
+    holds a slot in its model's lane and in its provider's lane, which caps
+    the provider as a whole.
+
+    Models are mapped to catalog names, so dated variants share a lane.
+    Models missing from the catalog share one lane per provider unless
+    ADMISSION_LIMITS names them, which keeps the number of lanes bounded
+    whatever clients send.
+    """
+
+    def __init__(self, settings: Settings):
+        """Initialize the controller.
+
+        Args:
+            settings: Application settings
+        """
+        self.enabled = settings.ADMISSION_ENABLED
+        self.defaults = {
+            "concurrency": settings.ADMISSION_MAX_CONCURRENCY,
+            "rpm": settings.ADMISSION_REQUESTS_PER_MINUTE,
+            "tpm": settings.ADMISSION_TOKENS_PER_MINUTE,
+        }
+        self.overrides = settings.ADMISSION_LIMITS
+        self.provider_defaults = {"concurrency": settings.ADMISSION_PROVIDER_MAX_CONCURRENCY, "rpm": 0, "tpm": 0}
+        self.provider_overrides = settings.ADMISSION_PROVIDER_LIMITS
+        self.max_queue = settings.ADMISSION_MAX_QUEUE
+        self.timeouts = {
+            PRIORITIES["interactive"]: settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+            PRIORITIES["batch"]: settings.ADMISSION_BATCH_QUEUE_TIMEOUT_SECONDS,
+        }
+        self._lanes: Dict[str, AdmissionLane] = {}
+        self._provider_lanes: Dict[str, AdmissionLane] = {}
+
+    def lane_name(self, provider: str, model: Optional[str]) -> str:
+        """Lane of a model: its catalog name, a configured override, or the provider's shared lane."""
+        info = get_model_info(model)
+        if info.provider == provider:
+            return f"{provider}:{info.name}"
+        if model and f"{provider}:{model}" in self.overrides:
+            return f"{provider}:{model}"
+        return f"{provider}:other"
+
+    def lane(self, provider: str, model: Optional[str]) -> AdmissionLane:
+        """Lane for a provider/model; limits come from the most specific override."""
+        name = self.lane_name(provider, model)
+        lane = self._lanes.get(name)
+        if lane is None:
+            limits = {**self.defaults, **self.overrides.get(provider, {}), **self.overrides.get(name, {})}
+            lane = self._lanes[name] = AdmissionLane(
+                name, limits["concurrency"], limits["rpm"], limits["tpm"], self.max_queue
+            )
+        return lane
+
+    def provider_lane(self, provider: str) -> AdmissionLane:
+        """Lane shared by every model of a provider."""
+        lane = self._provider_lanes.get(provider)
+        if lane is None:
+            limits = {**self.provider_defaults, **self.provider_overrides.get(provider, {})}
+            lane = self._provider_lanes[provider] = AdmissionLane(
+                provider, limits["concurrency"], limits["rpm"], limits["tpm"], self.max_queue
+            )
+        return lane
+
+    async def acquire(
+        self,
+        provider: str,
+        messages: List[ChatMessage],
+        model_params: Dict[str, Any],
+        priority: str = "interactive",
+    ) -> Lease:
+        """Wait for a slot to call the provider.
+
+        Raises:
+            AdmissionRejected: If the lane is saturated
+            ValueError: If the priority is unknown
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        lane = self.lane(provider, model_params.get("model"))
+        provider_lane = self.provider_lane(provider)
+        if not self.enabled:
+            lane.in_flight += 1
+            provider_lane.in_flight += 1
+            return Lease(lane, provider_lane)
+        rank = PRIORITIES[priority]
+        tokens = estimate_tokens(messages, model_params)
+        deadline = time.monotonic() + self.timeouts[rank]
+        await lane.acquire(tokens, rank, self.timeouts[rank])
+        # The model slot is taken first, so waiting on the provider never blocks other models' queues
+        try:
+            await provider_lane.acquire(tokens, rank, max(deadline - time.monotonic(), 0.0))
+        except BaseException:
+            lane.cancel(tokens)
+            raise
+        return Lease(lane, provider_lane)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **{name: lane.stats() for name, lane in self._provider_lanes.items()},
+            **{name: lane.stats() for name, lane in self._lanes.items()},
+        }
@@ -1,94 +1,150 @@
-from typing import List, Dict, Any, AsyncGenerator
+from typing import List, Dict, Any, AsyncGenerator, Optional, Tuple
+import httpx
 import anthropic
-from .adapter import LLMProvider
+from .adapter import LLMProvider, OverloadedError, ProviderError, ProviderTimeoutError, error_from_status, parse_retry_after
+from .messages import ChatMessage, anthropic_encoder
+from .prompt_cache import cache_prefix
+from .usage import report_usage
+
+def to_provider_error(e: Exception) -> ProviderError:
+    """Translate an Anthropic SDK exception into a typed provider error."""
+    if isinstance(e, ProviderError):
+        return e
+    if isinstance(e, anthropic.APIStatusError):
+        return error_from_status("Anthropic", e.status_code, str(e), parse_retry_after(e.response.headers))
+    if isinstance(e, anthropic.APIConnectionError):
+        return ProviderTimeoutError("Anthropic", str(e))
+    if isinstance(e, anthropic.APIError) and "overloaded" in str(e).lower():
+        # Raised from an error event in the middle of a stream
+        return OverloadedError("Anthropic", str(e))
+    return ProviderError("Anthropic", str(e))
+
+def cached_text(text: str) -> List[Dict[str, Any]]:
+    """Text content block ending a prompt-cache breakpoint."""
+    return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+
+def encode_with_cache_control(messages: List[ChatMessage]) -> Tuple[Any, List[Dict[str, Any]]]:
+    """Encode messages and put cache breakpoints at the end of their stable prefix.
+
+    The system prompt and the last turn of the prefix become content blocks
+    with ``cache_control``, so Anthropic caches everything up to them.
+
+    Args:
+        messages: Conversation messages, optionally marked by the prefix tracker
+
+    Returns:
+        The system parameter (None, text or blocks) and the message turns
+    """
+    system, turns = anthropic_encoder.encode(messages)
+    prefix = cache_prefix(messages)
+    if not prefix:
+        return system, turns
+    prefix_system, prefix_turns = anthropic_encoder.encode(messages[:prefix])
+    if prefix_system != system:
+        # A later system message changes the system prompt, which comes first in the cache
+        return system, turns
+    if system is not None:
+        system = cached_text(system)
+    index = len(prefix_turns) - 1
+    if index >= 0 and turns[index] != prefix_turns[index]:
+        # The last prefix turn was merged with the next message; the turn before it is unchanged
+        index -= 1
+    if index >= 0:
+        # Encoded turns are memoized by the encoder, so replace instead of mutating
+        turns = list(turns)
+        turns[index] = {"role": turns[index]["role"], "content": cached_text(turns[index]["content"])}
+    return system, turns
+
+def report_anthropic_usage(usage: Any, completion: bool = True) -> None:
+    """Report Anthropic usage; input_tokens excludes prompt tokens read from or written to the cache."""
+    cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+    cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+    report_usage(
+        prompt_tokens=usage.input_tokens + cache_read + cache_write,
+        completion_tokens=usage.output_tokens if completion else None,
+        cached_tokens=cache_read
+    )
 
 class AnthropicProvider(LLMProvider):
     """Anthropic Claude provider implementation."""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, http_client: Optional[httpx.AsyncClient] = None):
         """Initialize Anthropic provider.
         
         Args:
             api_key: Anthropic API key
+            http_client: Shared HTTP connection pool (optional)
         """
-        self.client = anthropic.AsyncAnthropic(api_key=api_key)
+        self.http_client = http_client
+        # Retries are handled by ResilientProvider
+        self.client = anthropic.AsyncAnthropic(api_key=api_key, http_client=http_client, max_retries=0)
     
     async def generate_response(
         self, 
-        messages: List[Dict[str, str]], 
+        messages: List[ChatMessage], 
         model_params: Dict[str, Any]
     ) -> str:
         """Generate a single response from Claude.
         
         Args:
-            messages: List of message dictionaries with 'role' and 'content' keys
+            messages: Conversation messages (ChatMessages or dicts with 'role' and 'content' keys)
             model_params: Dictionary of model-specific parameters
             
         Returns:
             Generated response as a string
         """
         try:
-            # Convert messages to Anthropic format
-            anthropic_messages = []
-            for msg in messages:
-                if msg["role"] == "user":
-                    anthropic_messages.append({"role": "user", "content": msg["content"]})
-                elif msg["role"] == "assistant":
-                    anthropic_messages.append({"role": "assistant", "content": msg["content"]})
-                elif msg["role"] == "system":
-                    # Handle system messages by prepending to the first user message
-                    if anthropic_messages and anthropic_messages[0]["role"] == "user":
-                        anthropic_messages[0]["content"] = f"{msg['content']}\n\n{anthropic_messages[0]['content']}"
-                    else:
-                        anthropic_messages.append({"role": "user", "content": msg["content"]})
-            
+            system, anthropic_messages = encode_with_cache_control(messages)
+            if system is not None:
+                model_params = {**model_params, "system": system}
+
             response = await self.client.messages.create(
                 messages=anthropic_messages,
                 **model_params
             )
+            report_anthropic_usage(response.usage)
             return response.content[0].text
         except Exception as e:
-            raise Exception(f"Anthropic API error: {str(e)}")
+            raise to_provider_error(e) from e
     
     async def stream_response(
         self, 
-        messages: List[Dict[str, str]], 
+        messages: List[ChatMessage], 
         model_params: Dict[str, Any]
     ) -> AsyncGenerator[str, None]:
         """Stream responses from Claude.
         
         Args:
-            messages: List of message dictionaries with 'role' and 'content' keys
+            messages: Conversation messages (ChatMessages or dicts with 'role' and 'content' keys)
             model_params: Dictionary of model-specific parameters
             
         Yields:
             Generated response chunks as strings
         """
         try:
-            # Convert messages to Anthropic format
-            anthropic_messages = []
-            for msg in messages:
-                if msg["role"] == "user":
-                    anthropic_messages.append({"role": "user", "content": msg["content"]})
-                elif msg["role"] == "assistant":
-                    anthropic_messages.append({"role": "assistant", "content": msg["content"]})
-                elif msg["role"] == "system":
-                    # Handle system messages by prepending to the first user message
-                    if anthropic_messages and anthropic_messages[0]["role"] == "user":
-                        anthropic_messages[0]["content"] = f"{msg['content']}\n\n{anthropic_messages[0]['content']}"
-                    else:
-                        anthropic_messages.append({"role": "user", "content": msg["content"]})
-            
+            system, anthropic_messages = encode_with_cache_control(messages)
+            if system is not None:
+                model_params = {**model_params, "system": system}
+
             stream = await self.client.messages.create(
                 messages=anthropic_messages,
                 stream=True,
                 **model_params
             )
-            async for chunk in stream:
-                if chunk.type == "content_block_delta":
-                    yield chunk.delta.text
+            try:
+                async for chunk in stream:
+                    if chunk.type == "content_block_delta":
+                        yield chunk.delta.text
+                    elif chunk.type == "message_start":
+                        report_anthropic_usage(chunk.message.usage, completion=False)
+                    elif chunk.type == "message_delta":
+                        # Cumulative output tokens of the message so far
+                        report_usage(completion_tokens=chunk.usage.output_tokens)
+            finally:
+                # Release the upstream connection when the consumer stops early
+                await stream.close()
         except Exception as e:
-            raise Exception(f"Anthropic API error: {str(e)}")
+            raise to_provider_error(e) from e
     
     async def validate_credentials(self) -> bool:
         """Validate Anthropic credentials.
@@ -99,9 +155,14 @@ class AnthropicProvider(LLMProvider):
         try:
             await self.client.messages.create(
                 messages=[{"role": "user", "content": "Hello"}],
-                model="claude-3-opus-20240229",
+                model="claude-3-haiku-20240307",
                 max_tokens=1
             )
             return True
         except Exception:
-            return False 
\ No newline at end of file
+            return False
+
+    async def warmup(self) -> None:
+        """Open a connection to the API host ahead of the first request."""
+        if self.http_client is not None:
+            await self.http_client.head(str(self.client.base_url))
@@ -0,0 +1,320 @@
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+from datetime import datetime, timedelta, timezone
+import asyncio
+import json
+import logging
+import uuid
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.config import Settings
+from app.db import models
+from app.db.session import AsyncSessionLocal
+from .usage import bill_to
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Runs one request of a batch: (provider, request payload, priority) -> result.
+# Results carry an HTTP-like "status" and either "message" or "error".
+ItemRunner = Callable[[str, Dict[str, Any], str], Awaitable[Dict[str, Any]]]
+
+_DONE = object()
+
+
+async def run_batch(
+    items: Iterable[Tuple[int, T]],
+    run: Callable[[T], Awaitable[Dict[str, Any]]],
+    concurrency: int,
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Run items with bounded concurrency and yield their results in completion order.
+
+    Items are pulled lazily, so at most `concurrency` calls exist at a
+    time however large the batch is. A failing item yields an error
+    result instead of stopping the batch.
+
+    Args:
+        items: (index, item) pairs
+        run: Produces the result of one item
+        concurrency: Maximum number of items in flight
+
+    Yields:
+        Results with the item index added
+    """
+    pending = iter(items)
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def worker() -> None:
+        try:
+            for index, item in pending:
+                try:
+                    result = await run(item)
+                except Exception as e:
+                    logger.exception("Batch item %d failed", index)
+                    result = {"status": 500, "error": str(e)}
+                results.put_nowait({"index": index, **result})
+        finally:
+            results.put_nowait(_DONE)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+    running = len(workers)
+    try:
+        while running:
+            result = await results.get()
+            if result is _DONE:
+                running -= 1
+            else:
+                yield result
+    finally:
+        # Stop outstanding calls if the consumer went away
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+def job_status(job: models.BatchJob) -> Dict[str, Any]:
+    """Public view of a batch job."""
+    return {
+        "id": job.id,
+        "provider": job.provider,
+        "status": job.status,
+        "total": job.total,
+        "completed": job.completed,
+        "failed": job.failed,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "finished_at": job.finished_at,
+    }
+
+
+class BatchJobManager:
+    """Runs batch jobs in the background and persists their progress.
+
+    Results and counters are written every flush interval. Each write also
+    refreshes the job's updated_at, which acts as the lease of the worker
+    running it: a job left running without a write for the lease period,
+    e.g. after a restart, is claimed by any worker and resumed with the
+    requests that have no stored result yet.
+    """
+
+    def __init__(self, settings: Settings, runner: ItemRunner):
+        """Initialize the manager.
+
+        Args:
+            settings: Application settings
+            runner: Runs a single request of a job
+        """
+        self.runner = runner
+        self.flush_interval = settings.BATCH_JOB_FLUSH_SECONDS
+        self.lease = timedelta(seconds=settings.BATCH_JOB_LEASE_SECONDS)
+        self.worker_id = uuid.uuid4().hex
+        self._jobs: Dict[str, asyncio.Task] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+    async def submit(
+        self,
+        provider: str,
+        requests: List[Dict[str, Any]],
+        concurrency: int,
+        user_id: Optional[int] = None,
+    ) -> models.BatchJob:
+        """Store a job and start running it."""
+        job = models.BatchJob(
+            user_id=user_id,
+            provider=provider,
+            worker_id=self.worker_id,
+            concurrency=concurrency,
+            requests=json.dumps(requests),
+            total=len(requests),
+        )
+        async with AsyncSessionLocal() as db:
+            db.add(job)
+            await db.commit()
+        self._launch(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[models.BatchJob]:
+        async with AsyncSessionLocal() as db:
+            return await db.get(models.BatchJob, job_id)
+
+    async def results(self, job_id: str, after: int = 0, limit: int = 1000) -> List[models.BatchResult]:
+        """Stored results in completion order, starting after the given cursor."""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(models.BatchResult)
+                .where(models.BatchResult.job_id == job_id, models.BatchResult.id > after)
+                .order_by(models.BatchResult.id)
+                .limit(limit)
+            )
+            return list(result.scalars())
+
+    async def cancel(self, job_id: str) -> bool:
+        """Cancel a running job; results written so far are kept.
+
+        Returns:
+            False if the job was not running
+        """
+        now = datetime.now(timezone.utc)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(models.BatchJob)
+                .where(models.BatchJob.id == job_id, models.BatchJob.status == "running")
+                .values(status="cancelled", updated_at=now, finished_at=now)
+            )
+            await db.commit()
+        task = self._jobs.get(job_id)
+        if task is not None:
+            task.cancel()
+        return result.rowcount > 0
+
+    def _launch(self, job: models.BatchJob) -> None:
+        task = asyncio.create_task(self._run(job))
+        self._jobs[job.id] = task
+        task.add_done_callback(lambda _: self._jobs.pop(job.id, None))
+
+    async def _run(self, job: models.BatchJob) -> None:
+        # Runs in its own task, so billing does not leak into the submitting request
+        bill_to(job.user_id)
+        async with AsyncSessionLocal() as db:
+            done = set((await db.execute(
+                select(models.BatchResult.index).where(models.BatchResult.job_id == job.id)
+            )).scalars())
+        requests = json.loads(job.requests)
+        items = [(index, request) for index, request in enumerate(requests) if index not in done]
+        if done:
+            logger.info("Resuming batch job %s with %d of %d requests left", job.id, len(items), job.total)
+
+        pending: List[Dict[str, Any]] = []
+
+        async def run(request: Dict[str, Any]) -> Dict[str, Any]:
+            return await self.runner(job.provider, request, "batch")
+
+        async def consume() -> None:
+            async for result in run_batch(items, run, job.concurrency):
+                pending.append(result)
+
+        consumer = asyncio.create_task(consume())
+        try:
+            while True:
+                if not consumer.done():
+                    await asyncio.wait({consumer}, timeout=self.flush_interval)
+                # Taken before draining: results the consumer adds during the write go to the next round
+                consumer_done = consumer.done()
+                finished = consumer_done and consumer.exception() is None
+                results, pending[:] = list(pending), []
+                try:
+                    if not await self._write(job.id, results, finished):
+                        logger.info("Batch job %s was cancelled or taken over; stopping", job.id)
+                        return
+                except SQLAlchemyError as e:
+                    logger.warning("Failed to write progress of batch job %s: %s", job.id, e)
+                    pending[:0] = results
+                    if consumer_done:
+                        await asyncio.sleep(self.flush_interval)
+                    continue
+                if consumer_done and not pending:
+                    break
+            if consumer.exception() is not None:
+                # Left running; another worker resumes it once the lease expires
+                logger.error("Batch job %s failed: %s", job.id, consumer.exception())
+        except asyncio.CancelledError:
+            # Shutting down: keep what has finished so a resume does not redo it
+            try:
+                await self._write(job.id, pending, finished=False)
+            except SQLAlchemyError as e:
+                logger.warning("Failed to write progress of batch job %s: %s", job.id, e)
+            raise
+        finally:
+            consumer.cancel()
+            await asyncio.gather(consumer, return_exceptions=True)
+
+    async def _write(self, job_id: str, results: List[Dict[str, Any]], finished: bool) -> bool:
+        """Store results and progress if this worker still owns the running job.
+
+        Returns:
+            False if the job was cancelled or claimed by another worker
+
+        Raises:
+            SQLAlchemyError: If the write failed; nothing was stored
+        """
+        now = datetime.now(timezone.utc)
+        failed = sum(1 for result in results if result["status"] != 200)
+        values: Dict[str, Any] = {
+            "updated_at": now,
+            "completed": models.BatchJob.completed + len(results),
+            "failed": models.BatchJob.failed + failed,
+        }
+        if finished:
+            values.update(status="completed", finished_at=now)
+        async with AsyncSessionLocal() as db:
+            claimed = await db.execute(
+                update(models.BatchJob)
+                .where(
+                    models.BatchJob.id == job_id,
+                    models.BatchJob.status == "running",
+                    models.BatchJob.worker_id == self.worker_id,
+                )
+                .values(**values)
+            )
+            if claimed.rowcount == 0:
+                return False
+            if results:
+                await db.execute(insert(models.BatchResult), [
+                    {
+                        "job_id": job_id,
+                        "index": result["index"],
+                        "status": result["status"],
+                        "message": result.get("message"),
+                        "error": result.get("error"),
+                    }
+                    for result in results
+                ])
+            await db.commit()
+        return True
+
+    def start(self) -> None:
+        """Start resuming abandoned jobs."""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def stop(self) -> None:
+        """Stop running jobs after saving their finished results."""
+        tasks = [self._sweeper, *self._jobs.values()] if self._sweeper else list(self._jobs.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._sweeper = None
+
+    async def _sweep(self) -> None:
+        while True:
+            try:
+                await self._claim_abandoned()
+            except SQLAlchemyError as e:
+                logger.warning("Failed to look for abandoned batch jobs: %s", e)
+            await asyncio.sleep(self.lease.total_seconds() / 2)
+
+    async def _claim_abandoned(self) -> None:
+        now = datetime.now(timezone.utc)
+        async with AsyncSessionLocal() as db:
+            stale = (await db.execute(
+                select(models.BatchJob).where(
+                    models.BatchJob.status == "running",
+                    models.BatchJob.updated_at < now - self.lease,
+                )
+            )).scalars().all()
+            for job in stale:
+                # Compare-and-set so only one worker wins the claim
+                claimed = await db.execute(
+                    update(models.BatchJob)
+                    .where(models.BatchJob.id == job.id, models.BatchJob.worker_id == job.worker_id)
+                    .values(worker_id=self.worker_id, updated_at=now)
+                )
+                await db.commit()
+                if claimed.rowcount:
+                    job.worker_id = self.worker_id
+                    self._launch(job)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"running": len(self._jobs), "worker_id": self.worker_id}
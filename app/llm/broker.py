@@ -0,0 +1,399 @@
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+from redis import asyncio as aioredis
+
+from app.core.config import get_settings
+from .context import context_manager
+from .usage import request_usage
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+@dataclass
+class StreamEvent:
+    """A published event; seq starts at 1 and increases by one per event."""
+
+    seq: int
+    payload: Dict[str, Any]
+
+
+def new_stream_id() -> str:
+    return uuid.uuid4().hex
+
+
+def format_event_id(stream_id: str, seq: int) -> str:
+    """SSE event id; carries the stream id so any worker can resume from it."""
+    return f"{stream_id}:{seq}"
+
+
+def parse_event_id(event_id: str) -> Optional[Tuple[str, int]]:
+    """Parse an SSE event id produced by format_event_id."""
+    stream_id, _, seq = event_id.strip().rpartition(":")
+    if not stream_id or not seq.isdigit():
+        return None
+    return stream_id, int(seq)
+
+
+class StreamBroker(ABC):
+    """Buffers streamed generations so clients can (re)subscribe from any event."""
+
+    # Final event for subscribers of a stream that is gone and will never complete
+    EXPIRED = "Stream expired before it completed"
+
+    async def open(self, stream_id: str) -> None:
+        """Register a stream before its first event is published; calling it again is harmless."""
+        pass
+
+    @abstractmethod
+    async def publish(self, stream_id: str, payload: Dict[str, Any]) -> int:
+        """Append an event to a stream and return its sequence number."""
+
+    @abstractmethod
+    async def close(self, stream_id: str) -> None:
+        """Mark a stream as complete."""
+
+    @abstractmethod
+    async def exists(self, stream_id: str) -> bool:
+        """Whether the stream is still retained."""
+
+    @abstractmethod
+    def subscribe(self, stream_id: str, after: int = 0) -> AsyncIterator[StreamEvent]:
+        """Yield events with seq greater than after until the stream completes."""
+
+    @abstractmethod
+    async def watched(self, stream_id: str) -> bool:
+        """Whether a subscriber on any worker is reading the stream."""
+
+    async def aclose(self) -> None:
+        """Release broker resources."""
+        pass
+
+
+@dataclass
+class _BufferedStream:
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    done: bool = False
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def notify(self) -> None:
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class InProcessBroker(StreamBroker):
+    """Broker for a single worker; streams live in memory until retention expires."""
+
+    def __init__(self, retention: float):
+        """Initialize the broker.
+
+        Args:
+            retention: Seconds a completed stream stays available for resuming
+        """
+        self.retention = retention
+        self._streams: Dict[str, _BufferedStream] = {}
+        self._watchers: Dict[str, int] = {}
+
+    def _get(self, stream_id: str) -> _BufferedStream:
+        stream = self._streams.get(stream_id)
+        if stream is None:
+            stream = self._streams[stream_id] = _BufferedStream()
+        return stream
+
+    async def open(self, stream_id):
+        self._get(stream_id)
+
+    async def publish(self, stream_id, payload):
+        stream = self._get(stream_id)
+        stream.events.append(payload)
+        stream.notify()
+        return len(stream.events)
+
+    async def close(self, stream_id):
+        stream = self._get(stream_id)
+        stream.done = True
+        stream.notify()
+        asyncio.get_running_loop().call_later(self.retention, self._streams.pop, stream_id, None)
+
+    async def exists(self, stream_id):
+        return stream_id in self._streams
+
+    async def subscribe(self, stream_id, after=0):
+        # Only producers create streams; an unknown id has expired or never existed
+        stream = self._streams.get(stream_id)
+        if stream is None:
+            yield StreamEvent(after + 1, {"error": self.EXPIRED})
+            return
+        index = after
+        self._watchers[stream_id] = self._watchers.get(stream_id, 0) + 1
+        try:
+            while True:
+                changed = stream.changed
+                if index < len(stream.events):
+                    index += 1
+                    yield StreamEvent(index, stream.events[index - 1])
+                elif stream.done:
+                    return
+                else:
+                    await changed.wait()
+        finally:
+            remaining = self._watchers.pop(stream_id) - 1
+            if remaining:
+                self._watchers[stream_id] = remaining
+
+    async def watched(self, stream_id):
+        return stream_id in self._watchers
+
+
+class RedisStreamBroker(StreamBroker):
+    """Broker backed by Redis Streams, shared by all workers.
+
+    Besides the stream itself the producer keeps a key that expires with
+    it, so subscribers can tell a stream that has not published yet from
+    one whose producer died or whose retention ran out. Subscribers on any
+    worker refresh a short-lived watch key while they read, which tells the
+    producing worker that a client is still attached.
+    """
+
+    # Entries use explicit ids "0-<seq>" so SSE sequence numbers map directly to stream ids
+    DONE = "done"
+
+    def __init__(self, redis: aioredis.Redis, retention: float, block_ms: int = 5000):
+        """Initialize the broker.
+
+        Args:
+            redis: Async Redis client
+            retention: Seconds a stream key is kept after its last event
+            block_ms: Maximum time a subscriber blocks in a single XREAD
+        """
+        self.redis = redis
+        self.retention = max(1, int(retention))
+        self.block_ms = block_ms
+        # Outlives one blocking read, so a waiting subscriber never looks absent
+        self.watch_ttl_ms = 2 * block_ms
+        self._seq: Dict[str, int] = {}
+
+    @staticmethod
+    def _key(stream_id: str) -> str:
+        return f"chat_stream:{stream_id}"
+
+    @staticmethod
+    def _producer_key(stream_id: str) -> str:
+        return f"chat_stream:{stream_id}:producer"
+
+    @staticmethod
+    def _watch_key(stream_id: str) -> str:
+        return f"chat_stream:{stream_id}:watched"
+
+    async def open(self, stream_id):
+        await self.redis.set(self._producer_key(stream_id), "1", ex=self.retention)
+
+    async def _append(self, stream_id: str, fields: Dict[str, str]) -> int:
+        # Only the producing worker publishes to a stream, so a local counter is enough
+        seq = self._seq.get(stream_id, 0) + 1
+        self._seq[stream_id] = seq
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.xadd(self._key(stream_id), fields, id=f"0-{seq}")
+            pipe.expire(self._key(stream_id), self.retention)
+            pipe.expire(self._producer_key(stream_id), self.retention)
+            await pipe.execute()
+        return seq
+
+    async def publish(self, stream_id, payload):
+        return await self._append(stream_id, {"payload": json.dumps(payload)})
+
+    async def close(self, stream_id):
+        await self._append(stream_id, {self.DONE: "1"})
+        self._seq.pop(stream_id, None)
+
+    async def exists(self, stream_id):
+        return bool(await self.redis.exists(self._key(stream_id)))
+
+    async def subscribe(self, stream_id, after=0):
+        last_id = f"0-{after}"
+        block: Optional[int] = self.block_ms
+        refreshed = 0.0
+        while True:
+            now = time.monotonic()
+            if now - refreshed >= self.block_ms / 2000:
+                await self.redis.set(self._watch_key(stream_id), "1", px=self.watch_ttl_ms)
+                refreshed = now
+            result = await self.redis.xread({self._key(stream_id): last_id}, block=block)
+            if not result:
+                if block is None:
+                    # Nothing arrived after both keys were gone, so no completion will follow
+                    yield StreamEvent(int(last_id.split("-")[1]) + 1, {"error": self.EXPIRED})
+                    return
+                if not await self.redis.exists(self._key(stream_id), self._producer_key(stream_id)):
+                    # Read once more without blocking, in case the last entries raced the check
+                    block = None
+                continue
+            for _, entries in result:
+                for entry_id, fields in entries:
+                    last_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+                    fields = {
+                        (k.decode() if isinstance(k, bytes) else k): v for k, v in fields.items()
+                    }
+                    if self.DONE in fields:
+                        return
+                    yield StreamEvent(int(last_id.split("-")[1]), json.loads(fields["payload"]))
+
+    async def watched(self, stream_id):
+        return bool(await self.redis.exists(self._watch_key(stream_id)))
+
+    async def aclose(self):
+        await self.redis.aclose()
+
+
+def create_broker() -> StreamBroker:
+    """Build the broker selected by STREAM_BROKER."""
+    if settings.STREAM_BROKER == "redis":
+        return RedisStreamBroker(
+            aioredis.Redis.from_url(settings.REDIS_URL),
+            retention=settings.STREAM_RETENTION_SECONDS,
+        )
+    return InProcessBroker(retention=settings.STREAM_RETENTION_SECONDS)
+
+
+class StreamPublisher:
+    """Runs upstream generations in the background and publishes them to a broker.
+
+    Generation continues briefly when a client disconnects, so the client
+    can resume from its last event id without a second upstream call. If
+    no subscriber returns within the grace period, the generation is
+    cancelled to stop spending upstream tokens. A client may resume on
+    another worker, so the broker is asked whether the stream is watched
+    anywhere before cancelling.
+    """
+
+    def __init__(self, broker: StreamBroker, disconnect_grace: Optional[float] = None):
+        """Initialize the publisher.
+
+        Args:
+            broker: Broker the generations are published to
+            disconnect_grace: Seconds an unwatched generation keeps running (None never cancels)
+        """
+        self.broker = broker
+        self.disconnect_grace = disconnect_grace
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._subscribers: Dict[str, int] = {}
+        self._idle: Dict[str, asyncio.Task] = {}
+        self.cancelled = 0
+        self.cancelled_tokens = 0
+
+    def start(self, source: AsyncIterator[str], on_complete=None) -> str:
+        """Start publishing a chunk source and return its stream id.
+
+        Args:
+            source: Async iterator of response chunks
+            on_complete: Optional coroutine function called with the full text on success
+        """
+        stream_id = new_stream_id()
+        task = self._tasks[stream_id] = asyncio.create_task(self._run(stream_id, source, on_complete))
+        task.add_done_callback(lambda _: self._finished(stream_id))
+        # The generation task inherits the request id, so its records correlate with this one
+        logger.debug("Started stream %s", stream_id)
+        return stream_id
+
+    async def subscribe(self, stream_id: str, after: int = 0) -> AsyncIterator[StreamEvent]:
+        """Subscribe to a stream, tracking local watchers of generations run by this worker."""
+        self._subscribers[stream_id] = self._subscribers.get(stream_id, 0) + 1
+        idle = self._idle.pop(stream_id, None)
+        if idle is not None:
+            idle.cancel()
+        try:
+            if stream_id in self._tasks:
+                # The generation task may not have opened its stream yet
+                await self.broker.open(stream_id)
+            async for event in self.broker.subscribe(stream_id, after):
+                yield event
+        finally:
+            self._unsubscribe(stream_id)
+
+    def _unsubscribe(self, stream_id: str) -> None:
+        remaining = self._subscribers.pop(stream_id) - 1
+        if remaining:
+            self._subscribers[stream_id] = remaining
+        elif self.disconnect_grace is not None and stream_id in self._tasks:
+            self._idle[stream_id] = asyncio.create_task(self._cancel_unwatched(stream_id))
+
+    async def _cancel_unwatched(self, stream_id: str) -> None:
+        """Cancel the generation once no worker has had a subscriber for a grace period."""
+        while True:
+            await asyncio.sleep(self.disconnect_grace)
+            task = self._tasks.get(stream_id)
+            if task is None or stream_id in self._subscribers:
+                return
+            try:
+                if await self.broker.watched(stream_id):
+                    continue
+            except Exception as e:
+                logger.warning("Failed to check subscribers of stream %s: %s", stream_id, e)
+                continue
+            self._idle.pop(stream_id, None)
+            logger.info("Cancelling stream %s: no subscribers after client disconnect", stream_id)
+            task.cancel()
+            return
+
+    def _finished(self, stream_id: str) -> None:
+        self._tasks.pop(stream_id, None)
+        idle = self._idle.pop(stream_id, None)
+        if idle is not None:
+            idle.cancel()
+
+    async def _run(self, stream_id: str, source: AsyncIterator[str], on_complete) -> None:
+        chunks = []
+        started = time.monotonic()
+        try:
+            await self.broker.open(stream_id)
+            async for chunk in source:
+                chunks.append(chunk)
+                await self.broker.publish(stream_id, {"chunk": chunk})
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            self.cancelled_tokens += context_manager.counter.estimate("".join(chunks))
+            await self.broker.publish(stream_id, {"error": "Generation cancelled"})
+            raise
+        except Exception as e:
+            logger.error("Error in stream generation: %s", e, exc_info=True)
+            await self.broker.publish(stream_id, {"error": str(e)})
+        else:
+            usage = request_usage()
+            if usage is not None and usage.prompt_tokens:
+                await self.broker.publish(stream_id, {"usage": asdict(usage)})
+            if on_complete is not None:
+                await on_complete("".join(chunks))
+        finally:
+            # Close the provider stream (and its SDK response) if iteration stopped early
+            aclose = getattr(source, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            await self.broker.close(stream_id)
+            logger.debug("Stream %s finished in %.2fs", stream_id, time.monotonic() - started)
+
+    @property
+    def active(self) -> int:
+        return len(self._tasks)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": self.active,
+            "subscribers": sum(self._subscribers.values()),
+            "cancelled": self.cancelled,
+            "cancelled_tokens": self.cancelled_tokens,
+        }
+
+    async def aclose(self) -> None:
+        """Cancel running generations and close the broker."""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        await self.broker.aclose()
@@ -0,0 +1,81 @@
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+@dataclass(frozen=True)
+class ModelInfo:
+    """Static facts about a model used for budgeting and routing."""
+
+    name: str
+    provider: str
+    context_window: int
+    max_output_tokens: int
+    # List prices in USD per million tokens
+    input_cost_per_mtok: float = 0.0
+    output_cost_per_mtok: float = 0.0
+
+
+MODEL_CATALOG: Dict[str, ModelInfo] = {
+    info.name: info
+    for info in [
+        ModelInfo("gpt-4o", "openai", 128000, 16384, 5.0, 15.0),
+        ModelInfo("gpt-4o-mini", "openai", 128000, 16384, 0.15, 0.6),
+        ModelInfo("gpt-4-turbo", "openai", 128000, 4096, 10.0, 30.0),
+        ModelInfo("gpt-4", "openai", 8192, 8192, 30.0, 60.0),
+        ModelInfo("gpt-3.5-turbo", "openai", 16385, 4096, 0.5, 1.5),
+        ModelInfo("claude-3-5-sonnet-20240620", "anthropic", 200000, 8192, 3.0, 15.0),
+        ModelInfo("claude-3-opus-20240229", "anthropic", 200000, 4096, 15.0, 75.0),
+        ModelInfo("claude-3-sonnet-20240229", "anthropic", 200000, 4096, 3.0, 15.0),
+        ModelInfo("claude-3-haiku-20240307", "anthropic", 200000, 4096, 0.25, 1.25),
+        ModelInfo("gemini-pro", "gemini", 30720, 2048, 0.5, 1.5),
+        ModelInfo("gemini-1.5-pro", "gemini", 2097152, 8192, 3.5, 10.5),
+        ModelInfo("gemini-1.5-flash", "gemini", 1048576, 8192, 0.35, 1.05),
+        ModelInfo("fake", "fake", 128000, 4096),
+    ]
+}
+
+# Model used for each provider when a request does not name one of its models
+DEFAULT_MODELS: Dict[str, str] = {
+    "openai": "gpt-4o",
+    "anthropic": "claude-3-5-sonnet-20240620",
+    "gemini": "gemini-pro",
+    "fake": "fake",
+}
+
+# Price of prompt tokens read from the provider's prompt cache, relative to the input price
+CACHED_INPUT_PRICE_RATIO: Dict[str, float] = {
+    "openai": 0.5,
+    "anthropic": 0.1,
+    "gemini": 0.25,
+}
+
+# Conservative budget for models missing from the catalog
+UNKNOWN_MODEL = ModelInfo("unknown", "unknown", 8192, 4096)
+
+
+def get_model_info(model: Optional[str]) -> ModelInfo:
+    """Look up a model, matching dated or suffixed variants by prefix."""
+    if not model:
+        return UNKNOWN_MODEL
+    info = MODEL_CATALOG.get(model)
+    if info is not None:
+        return info
+    # e.g. "gpt-4o-2024-08-06" -> "gpt-4o"; prefer the longest matching name
+    for name in sorted(MODEL_CATALOG, key=len, reverse=True):
+        if model.startswith(name):
+            return MODEL_CATALOG[name]
+    return UNKNOWN_MODEL
+
+
+def model_label(provider: str, model: Optional[str]) -> str:
+    """Catalog name of a provider's model for metric labels; "other" for anything else.
+
+    Keeps label cardinality bounded whatever model strings clients send.
+    """
+    info = get_model_info(model)
+    return info.name if info.provider == provider else "other"
+
+
+def cached_input_cost(info: ModelInfo) -> float:
+    """USD per million prompt tokens served from the provider's prompt cache."""
+    return info.input_cost_per_mtok * CACHED_INPUT_PRICE_RATIO.get(info.provider, 1.0)
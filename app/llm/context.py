@@ -0,0 +1,238 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+import logging
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from .adapter import LLMProvider
+from .catalog import get_model_info
+from .messages import ChatMessage, prefix_hashes
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Per-message framing tokens (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class TokenCounter:
+    """Fast local token estimate with a per-message cache.
+
+    Uses roughly four UTF-8 bytes per token, which slightly over-counts
+    English and is close for CJK text. Counts are cached by message digest,
+    the hash the encoders and the prefix tracker already compute, so a
+    growing conversation only counts its new messages.
+    """
+
+    def __init__(self, max_entries: int = 50000):
+        """Initialize the counter.
+
+        Args:
+            max_entries: Number of cached message counts to keep
+        """
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[int, int]" = OrderedDict()
+
+    def estimate(self, text: str) -> int:
+        """Estimate the token count of raw text."""
+        size = len(text) if text.isascii() else len(text.encode("utf-8"))
+        return (size + 3) // 4
+
+    def count_message(self, message: ChatMessage) -> int:
+        """Token count of a single message, including framing overhead."""
+        key = message.digest
+        count = self._cache.get(key)
+        if count is None:
+            count = self._cache[key] = self.estimate(message.content) + MESSAGE_OVERHEAD_TOKENS
+            if len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return count
+
+    def count(self, messages: Sequence[ChatMessage]) -> int:
+        """Token count of a conversation."""
+        return sum(self.count_message(message) for message in messages)
+
+
+class TruncationStrategy(ABC):
+    """Reduces a conversation to fit a token budget."""
+
+    @abstractmethod
+    async def apply(
+        self,
+        messages: List[ChatMessage],
+        budget: int,
+        counter: TokenCounter,
+        provider: LLMProvider,
+        model_params: Dict[str, Any],
+    ) -> List[ChatMessage]:
+        """Return a conversation that fits the budget where possible."""
+
+
+def drop_oldest(messages: List[ChatMessage], budget: int, counter: TokenCounter) -> List[ChatMessage]:
+    """Keep system messages and the newest turns that fit the budget.
+
+    The latest message is always kept, even if it alone exceeds the budget.
+    """
+    system = [message for message in messages if message.role == "system"]
+    turns = [message for message in messages if message.role != "system"]
+    remaining = budget - counter.count(system)
+    kept: List[ChatMessage] = []
+    for message in reversed(turns):
+        cost = counter.count_message(message)
+        if kept and cost > remaining:
+            break
+        kept.append(message)
+        remaining -= cost
+    kept.reverse()
+    return system + kept
+
+
+class DropOldestStrategy(TruncationStrategy):
+    """Drop the oldest non-system turns until the conversation fits."""
+
+    async def apply(self, messages, budget, counter, provider, model_params):
+        return drop_oldest(messages, budget, counter)
+
+
+class KeepSystemAndLastNStrategy(TruncationStrategy):
+    """Keep system messages and at most the last N turns."""
+
+    def __init__(self, keep_last: int):
+        self.keep_last = keep_last
+
+    async def apply(self, messages, budget, counter, provider, model_params):
+        system = [message for message in messages if message.role == "system"]
+        turns = [message for message in messages if message.role != "system"]
+        return drop_oldest(system + turns[-self.keep_last:], budget, counter)
+
+
+class SummarizeOlderStrategy(TruncationStrategy):
+    """Replace older turns with a model-written summary.
+
+    The summarized part ends on a multiple of chunk_turns, so it only moves
+    once every chunk_turns messages and between moves requests reuse the
+    same cached summary. At least the last keep_last turns are kept
+    verbatim. When the boundary moves, the summary of the previous boundary
+    is extended with the turns since, instead of summarizing the whole
+    history again.
+    """
+
+    def __init__(self, keep_last: int, chunk_turns: int, summary_max_tokens: int = 512):
+        self.keep_last = keep_last
+        self.chunk_turns = max(chunk_turns, 1)
+        self.summary_max_tokens = summary_max_tokens
+        self._summaries: TTLCache[str] = TTLCache(maxsize=1024, ttl=3600)
+
+    async def apply(self, messages, budget, counter, provider, model_params):
+        system = [message for message in messages if message.role == "system"]
+        turns = [message for message in messages if message.role != "system"]
+        end = (len(turns) - self.keep_last) // self.chunk_turns * self.chunk_turns
+        if end <= 0:
+            return drop_oldest(messages, budget, counter)
+
+        try:
+            summary = await self._summary(turns[:end], budget, counter, provider, model_params)
+        except Exception as e:
+            logger.warning("Failed to summarize conversation, dropping oldest turns instead: %s", e)
+            return drop_oldest(messages, budget, counter)
+
+        summary_message = ChatMessage("system", f"Summary of the earlier conversation:\n{summary}")
+        return drop_oldest(system + [summary_message] + turns[end:], budget, counter)
+
+    async def _summary(self, older, budget, counter, provider, model_params) -> str:
+        """Summary of the older turns, extending the latest cached summary of a shorter prefix."""
+        model = model_params.get("model")
+        hashes = prefix_hashes(older)
+        start = len(older)
+        previous = None
+        while start > 0:
+            previous = self._summaries.get((model, hashes[start - 1]))
+            if previous is not None:
+                break
+            start -= self.chunk_turns
+        if start == len(older):
+            return previous
+        summary = await self._summarize(previous, older[start:], budget, counter, provider, model_params)
+        self._summaries.set((model, hashes[-1]), summary)
+        return summary
+
+    async def _summarize(self, previous, turns, budget, counter, provider, model_params) -> str:
+        # The transcript itself has to fit the model, so trim it from the front
+        available = budget - self.summary_max_tokens - (counter.estimate(previous) if previous else 0)
+        transcript = drop_oldest(turns, available, counter)
+        prompt = "\n".join(f"{message.role}: {message.content}" for message in transcript)
+        if previous:
+            instruction = (
+                "Update the summary of a conversation with its newer messages. Keep it concise, "
+                "keeping facts, decisions and open questions."
+            )
+            prompt = f"Summary so far:\n{previous}\n\nNewer messages:\n{prompt}"
+        else:
+            instruction = "Summarize the following conversation concisely, keeping facts, decisions and open questions."
+        params = {**model_params, "max_tokens": self.summary_max_tokens, "temperature": 0}
+        return await provider.generate_response(
+            [ChatMessage("system", instruction), ChatMessage("user", prompt)],
+            params,
+        )
+
+
+class ContextWindowManager:
+    """Fits conversations into the context window of the target model."""
+
+    def __init__(self, default_strategy: str, strategies: Dict[str, TruncationStrategy], reserve_tokens: int = 0):
+        """Initialize the manager.
+
+        Args:
+            default_strategy: Strategy used when a request does not name one
+            strategies: Available strategies by name
+            reserve_tokens: Safety margin kept free below the context window
+        """
+        self.default_strategy = default_strategy
+        self.strategies = strategies
+        self.reserve_tokens = reserve_tokens
+        self.counter = TokenCounter(settings.TOKEN_COUNT_CACHE_SIZE)
+
+    def budget(self, model_params: Dict[str, Any]) -> int:
+        """Prompt token budget for the requested model and output length."""
+        info = get_model_info(model_params.get("model"))
+        max_output = model_params.get("max_tokens") or min(info.max_output_tokens, info.context_window // 4)
+        return info.context_window - max_output - self.reserve_tokens
+
+    async def fit(
+        self,
+        messages: List[ChatMessage],
+        model_params: Dict[str, Any],
+        provider: LLMProvider,
+        strategy: Optional[str] = None,
+    ) -> List[ChatMessage]:
+        """Return the conversation, truncated if it exceeds the model's budget.
+
+        Raises:
+            ValueError: If the strategy name is unknown
+        """
+        name = strategy or self.default_strategy
+        if name not in self.strategies:
+            raise ValueError(f"Unknown context strategy: {name}")
+        budget = self.budget(model_params)
+        if self.counter.count(messages) <= budget:
+            return messages
+        fitted = await self.strategies[name].apply(messages, budget, self.counter, provider, model_params)
+        logger.info("Context strategy %s reduced %d messages to %d", name, len(messages), len(fitted))
+        return fitted
+
+
+context_manager = ContextWindowManager(
+    default_strategy=settings.CONTEXT_STRATEGY,
+    strategies={
+        "drop_oldest": DropOldestStrategy(),
+        "keep_last": KeepSystemAndLastNStrategy(settings.CONTEXT_KEEP_LAST_MESSAGES),
+        "summarize": SummarizeOlderStrategy(
+            settings.CONTEXT_KEEP_LAST_MESSAGES, settings.CONTEXT_SUMMARY_CHUNK_MESSAGES
+        ),
+    },
+    reserve_tokens=settings.CONTEXT_RESERVE_TOKENS,
+)
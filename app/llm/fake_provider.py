@@ -0,0 +1,84 @@
+from typing import List, Dict, Any, AsyncGenerator
+import asyncio
+from .adapter import LLMProvider
+from .context import context_manager
+from .messages import ChatMessage
+from .usage import report_usage
+
+class FakeProvider(LLMProvider):
+    """Local provider that echoes the last message after a simulated delay.
+
+    Makes no network calls; used to benchmark the server without spending
+    on a real API.
+    """
+
+    def __init__(self, latency_seconds: float = 0.2, tokens_per_second: float = 0.0):
+        """Initialize the fake provider.
+
+        Args:
+            latency_seconds: Delay before the first token
+            tokens_per_second: Output speed after the first token (0 for no delay)
+        """
+        self.latency_seconds = latency_seconds
+        self.tokens_per_second = tokens_per_second
+
+    @staticmethod
+    def _reply(messages: List[ChatMessage], model_params: Dict[str, Any]) -> List[str]:
+        words = (messages[-1].content if messages else "").split() or ["ok"]
+        max_tokens = int(model_params.get("max_tokens") or len(words))
+        return [f"{word} " for word in words[:max_tokens]]
+
+    def _report(self, messages: List[ChatMessage], reply: List[str]) -> None:
+        report_usage(context_manager.counter.count(messages), len(reply))
+
+    async def generate_response(
+        self,
+        messages: List[ChatMessage],
+        model_params: Dict[str, Any]
+    ) -> str:
+        """Generate a single response.
+
+        Args:
+            messages: Conversation messages
+            model_params: Dictionary of model-specific parameters
+
+        Returns:
+            Generated response as a string
+        """
+        reply = self._reply(messages, model_params)
+        delay = self.latency_seconds
+        if self.tokens_per_second:
+            delay += len(reply) / self.tokens_per_second
+        await asyncio.sleep(delay)
+        self._report(messages, reply)
+        return "".join(reply)
+
+    async def stream_response(
+        self,
+        messages: List[ChatMessage],
+        model_params: Dict[str, Any]
+    ) -> AsyncGenerator[str, None]:
+        """Stream a response one word at a time.
+
+        Args:
+            messages: Conversation messages
+            model_params: Dictionary of model-specific parameters
+
+        Yields:
+            Generated response chunks as strings
+        """
+        reply = self._reply(messages, model_params)
+        await asyncio.sleep(self.latency_seconds)
+        for index, word in enumerate(reply):
+            if index and self.tokens_per_second:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield word
+        self._report(messages, reply)
+
+    async def validate_credentials(self) -> bool:
+        """The fake provider has no credentials.
+
+        Returns:
+            Always True
+        """
+        return True
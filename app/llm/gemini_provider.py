@@ -1,109 +1,134 @@
 from typing import List, Dict, Any, AsyncGenerator
+import asyncio
 import google.generativeai as genai
-from .adapter import LLMProvider
+from google.api_core import exceptions as google_exceptions
+from .adapter import LLMProvider, ProviderError, ProviderTimeoutError, error_from_status
+from .messages import ChatMessage, gemini_encoder
+from .usage import report_usage
+
+DEFAULT_MODEL = "gemini-pro"
+
+# model_params keys translated to Gemini generation config fields
+GENERATION_CONFIG_KEYS = {
+    "temperature": "temperature",
+    "max_tokens": "max_output_tokens",
+    "top_p": "top_p",
+    "top_k": "top_k",
+    "stop": "stop_sequences",
+}
+
+def to_provider_error(e: Exception) -> ProviderError:
+    """Translate a Google API exception into a typed provider error."""
+    if isinstance(e, ProviderError):
+        return e
+    if isinstance(e, google_exceptions.GoogleAPICallError):
+        return error_from_status("Gemini", e.code if isinstance(e.code, int) else None, str(e))
+    if isinstance(e, (asyncio.TimeoutError, ConnectionError)):
+        return ProviderTimeoutError("Gemini", str(e))
+    return ProviderError("Gemini", str(e))
+
+def report_gemini_usage(response: Any) -> None:
+    """Report usage metadata if the SDK version exposes it."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        report_usage(
+            usage.prompt_token_count,
+            usage.candidates_token_count,
+            getattr(usage, "cached_content_token_count", None)
+        )
 
 class GeminiProvider(LLMProvider):
     """Google Gemini provider implementation."""
-    
+
     def __init__(self, api_key: str):
         """Initialize Gemini provider.
-        
+
         Args:
             api_key: Google API key
         """
         genai.configure(api_key=api_key)
-        self.client = genai.GenerativeModel('gemini-pro')
-    
+        self._models: Dict[str, genai.GenerativeModel] = {}
+        self.client = self._get_model(DEFAULT_MODEL)
+
+    def _get_model(self, model_name: str) -> genai.GenerativeModel:
+        model = self._models.get(model_name)
+        if model is None:
+            model = self._models[model_name] = genai.GenerativeModel(model_name)
+        return model
+
+    @staticmethod
+    def _build_generation_config(model_params: Dict[str, Any]) -> Dict[str, Any]:
+        config = {}
+        for key, gemini_key in GENERATION_CONFIG_KEYS.items():
+            if model_params.get(key) is not None:
+                config[gemini_key] = model_params[key]
+        if isinstance(config.get("stop_sequences"), str):
+            config["stop_sequences"] = [config["stop_sequences"]]
+        return config
+
     async def generate_response(
-        self, 
-        messages: List[Dict[str, str]], 
+        self,
+        messages: List[ChatMessage],
         model_params: Dict[str, Any]
     ) -> str:
         """Generate a single response from Gemini.
-        
+
         Args:
-            messages: List of message dictionaries with 'role' and 'content' keys
+            messages: Conversation messages (ChatMessages or dicts with 'role' and 'content' keys)
             model_params: Dictionary of model-specific parameters
-            
+
         Returns:
             Generated response as a string
         """
         try:
-            # Convert messages to Gemini format
-            chat = self.client.start_chat(history=[])
-            for msg in messages:
-                if msg["role"] == "user":
-                    chat.send_message(msg["content"])
-                elif msg["role"] == "assistant":
-                    # Add assistant message to history
-                    chat.history.append({
-                        "role": "model",
-                        "parts": [msg["content"]]
-                    })
-                elif msg["role"] == "system":
-                    # Handle system message by prepending to the first user message
-                    if not chat.history:
-                        chat.send_message(f"{msg['content']}\n\n")
-            
-            response = await chat.send_message_async(
-                messages[-1]["content"],
-                **model_params
+            model = self._get_model(model_params.get("model") or DEFAULT_MODEL)
+            response = await model.generate_content_async(
+                gemini_encoder.encode(messages),
+                generation_config=self._build_generation_config(model_params)
             )
+            report_gemini_usage(response)
             return response.text
         except Exception as e:
-            raise Exception(f"Gemini API error: {str(e)}")
-    
+            raise to_provider_error(e) from e
+
     async def stream_response(
-        self, 
-        messages: List[Dict[str, str]], 
+        self,
+        messages: List[ChatMessage],
         model_params: Dict[str, Any]
     ) -> AsyncGenerator[str, None]:
         """Stream responses from Gemini.
-        
+
         Args:
-            messages: List of message dictionaries with 'role' and 'content' keys
+            messages: Conversation messages (ChatMessages or dicts with 'role' and 'content' keys)
             model_params: Dictionary of model-specific parameters
-            
+
         Yields:
             Generated response chunks as strings
         """
         try:
-            # Convert messages to Gemini format
-            chat = self.client.start_chat(history=[])
-            for msg in messages:
-                if msg["role"] == "user":
-                    chat.send_message(msg["content"])
-                elif msg["role"] == "assistant":
-                    # Add assistant message to history
-                    chat.history.append({
-                        "role": "model",
-                        "parts": [msg["content"]]
-                    })
-                elif msg["role"] == "system":
-                    # Handle system message by prepending to the first user message
-                    if not chat.history:
-                        chat.send_message(f"{msg['content']}\n\n")
-            
-            response = await chat.send_message_async(
-                messages[-1]["content"],
-                stream=True,
-                **model_params
+            model = self._get_model(model_params.get("model") or DEFAULT_MODEL)
+            response = await model.generate_content_async(
+                gemini_encoder.encode(messages),
+                generation_config=self._build_generation_config(model_params),
+                stream=True
             )
             async for chunk in response:
+                # Each chunk carries the running totals
+                report_gemini_usage(chunk)
                 if chunk.text:
                     yield chunk.text
         except Exception as e:
-            raise Exception(f"Gemini API error: {str(e)}")
-    
+            raise to_provider_error(e) from e
+
     async def validate_credentials(self) -> bool:
         """Validate Gemini credentials.
-        
+
         Returns:
             True if credentials are valid, False otherwise
         """
         try:
-            model = genai.GenerativeModel('gemini-pro')
-            response = await model.generate_content_async("Hello")
-            return bool(response.text)
+            # Listing models is free, unlike a generation request
+            models = await asyncio.to_thread(lambda: list(genai.list_models()))
+            return bool(models)
         except Exception:
-            return False 
\ No newline at end of file
+            return False
@@ -0,0 +1,106 @@
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Any, Dict, Optional
+import asyncio
+import logging
+import random
+import time
+
+from app.core.config import Settings
+
+if TYPE_CHECKING:
+    from .registry import ProviderRegistry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProviderHealth:
+    """Result of the most recent credential probe for a provider."""
+
+    healthy: Optional[bool] = None
+    checked_at: Optional[float] = None
+    latency_ms: Optional[float] = None
+    error: Optional[str] = None
+
+
+class HealthMonitor:
+    """Probes providers in the background and serves cached results."""
+
+    def __init__(self, registry: "ProviderRegistry", settings: Settings):
+        """Initialize the monitor.
+
+        Args:
+            registry: Registry whose configured providers are probed
+            settings: Application settings
+        """
+        self.registry = registry
+        self.interval = settings.PROVIDER_HEALTH_INTERVAL_SECONDS
+        self.jitter = settings.PROVIDER_HEALTH_JITTER_SECONDS
+        self.ttl = settings.PROVIDER_HEALTH_TTL_SECONDS
+        self.timeout = settings.PROVIDER_HEALTH_TIMEOUT_SECONDS
+        self._results: Dict[str, ProviderHealth] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the background probe loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background probe loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        # Spread the first probe so workers started together don't probe in lockstep
+        await asyncio.sleep(random.uniform(0, self.jitter))
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(self.interval + random.uniform(0, self.jitter))
+
+    async def probe_all(self) -> None:
+        """Probe all configured providers concurrently."""
+        names = [name for name in self.registry.names if self.registry.is_configured(name)]
+        await asyncio.gather(*(self.probe(name) for name in names))
+
+    async def probe(self, name: str) -> ProviderHealth:
+        """Probe a single provider and cache the result."""
+        started = time.monotonic()
+        try:
+            provider = self.registry.get(name)
+            healthy = await asyncio.wait_for(provider.validate_credentials(), self.timeout)
+            error = None if healthy else "Invalid credentials"
+        except Exception as e:
+            healthy, error = False, str(e) or type(e).__name__
+        result = self._results[name] = ProviderHealth(
+            healthy=healthy,
+            checked_at=time.time(),
+            latency_ms=(time.monotonic() - started) * 1000,
+            error=error,
+        )
+        if not healthy:
+            logger.warning("Provider %s health probe failed: %s", name, error)
+        return result
+
+    def get(self, name: str) -> ProviderHealth:
+        """Cached health of a provider; unknown if never probed or expired."""
+        result = self._results.get(name)
+        if result is None or result.checked_at is None or time.time() - result.checked_at > self.ttl:
+            return ProviderHealth()
+        return result
+
+    def is_available(self, name: str) -> bool:
+        """Whether requests should be routed to the provider.
+
+        Providers that have not been probed yet are assumed to be available.
+        """
+        return self.registry.is_configured(name) and self.get(name).healthy is not False
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Cached health of every known provider."""
+        return {name: asdict(self.get(name)) for name in self.registry.names}
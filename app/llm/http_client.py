@@ -0,0 +1,62 @@
+from typing import Any, Dict
+import logging
+
+import httpx
+
+from app.core.config import Settings
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_http_client(settings: Settings) -> httpx.AsyncClient:
+    """Create the connection pool shared by all LLM provider SDK clients.
+
+    Args:
+        settings: Application settings
+
+    Returns:
+        A tuned httpx.AsyncClient
+    """
+    http2 = settings.LLM_HTTP2 and _http2_available()
+    if settings.LLM_HTTP2 and not http2:
+        logger.warning("HTTP/2 requested for LLM providers but the 'h2' package is not installed")
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            settings.LLM_HTTP_READ_TIMEOUT,
+            connect=settings.LLM_HTTP_CONNECT_TIMEOUT,
+            pool=settings.LLM_HTTP_POOL_TIMEOUT,
+        ),
+    )
+
+
+def pool_stats(client: httpx.AsyncClient) -> Dict[str, Any]:
+    """Report connection pool occupancy for an httpx.AsyncClient.
+
+    Reads httpcore pool internals, so missing attributes are tolerated.
+    """
+    pool = getattr(client._transport, "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    requests = list(getattr(pool, "_requests", []))
+    queued = sum(1 for request in requests if request.is_queued())
+    return {
+        "max_connections": getattr(pool, "_max_connections", None),
+        "connections": len(connections),
+        "idle_connections": sum(1 for conn in connections if conn.is_idle()),
+        "active_requests": len(requests) - queued,
+        "queued_requests": queued,
+        "saturated": queued > 0,
+    }
@@ -0,0 +1,243 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Generic, Hashable, Iterable, List, Optional, Sequence, Tuple, TypeVar, Union
+
+S = TypeVar("S")
+
+
+class ChatMessage:
+    """Canonical, provider-independent chat message."""
+
+    __slots__ = ("role", "content", "_digest")
+
+    def __init__(self, role: str, content: str):
+        self.role = role
+        self.content = content
+        self._digest: Optional[int] = None
+
+    @property
+    def digest(self) -> int:
+        """Hash of the role and content, computed once per message."""
+        if self._digest is None:
+            self._digest = hash((self.role, self.content))
+        return self._digest
+
+    @classmethod
+    def coerce(cls, message: Any) -> "ChatMessage":
+        """Build a ChatMessage from a dict or any object with role/content attributes."""
+        if isinstance(message, cls):
+            return message
+        if isinstance(message, dict):
+            return cls(message["role"], message["content"])
+        return cls(message.role, message.content)
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"role": self.role, "content": self.content}
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, ChatMessage) and self.role == other.role and self.content == other.content
+
+    def __hash__(self) -> int:
+        return self.digest
+
+    def __repr__(self) -> str:
+        return f"ChatMessage(role={self.role!r}, content={self.content[:40]!r})"
+
+
+MessageLike = Union[ChatMessage, Dict[str, str], Any]
+
+
+def to_chat_messages(messages: Iterable[MessageLike]) -> List[ChatMessage]:
+    """Convert dicts or API models into ChatMessages."""
+    return [ChatMessage.coerce(message) for message in messages]
+
+
+def prefix_hashes(messages: Sequence[ChatMessage]) -> List[int]:
+    """Chained hashes identifying every prefix of a conversation.
+
+    Element i identifies messages[:i + 1]. Message contents are hashed
+    once per message, so the repeated calls made for one request only
+    chain integers.
+    """
+    hashes = []
+    current = 0
+    for message in messages:
+        digest = message._digest
+        if digest is None:
+            digest = message.digest
+        current = hash((current, digest))
+        hashes.append(current)
+    return hashes
+
+
+def _append(items: List[Any], length: int, item: Any) -> List[Any]:
+    """Append to a list shared by encoder states.
+
+    A state owns the first `length` items of its list, so the list is
+    extended in place unless another state already appended to it.
+    """
+    if len(items) != length:
+        items = items[:length]
+    items.append(item)
+    return items
+
+
+class MessageEncoder(ABC, Generic[S]):
+    """Converts ChatMessages into a provider's wire format.
+
+    Encoding is incremental: the encoder state after each conversation is
+    memoized by prefix hash, so a conversation that grows by one turn only
+    converts the new tail. States hold append-only lists shared with the
+    states they were extended from, so extending one is O(1) rather than
+    a copy of the conversation; they must be treated as immutable.
+    """
+
+    def __init__(self, max_prefixes: int = 2048):
+        """Initialize the encoder.
+
+        Args:
+            max_prefixes: Number of memoized conversation prefixes to keep
+        """
+        self.max_prefixes = max_prefixes
+        self._prefixes: "OrderedDict[Hashable, S]" = OrderedDict()
+
+    @abstractmethod
+    def initial_state(self) -> S:
+        """State for an empty conversation."""
+
+    @abstractmethod
+    def extend(self, state: S, message: ChatMessage) -> S:
+        """Return a new state with the message appended."""
+
+    @abstractmethod
+    def finalize(self, state: S) -> Any:
+        """Build the provider payload from a state."""
+
+    def encode(self, messages: Iterable[MessageLike]) -> Any:
+        """Encode a conversation, reusing the longest memoized prefix."""
+        messages = to_chat_messages(messages)
+        if not messages:
+            return self.finalize(self.initial_state())
+        hashes = prefix_hashes(messages)
+
+        state: Optional[S] = None
+        start = 0
+        for i in range(len(messages), 0, -1):
+            key = (i, hashes[i - 1])
+            state = self._prefixes.get(key)
+            if state is not None:
+                self._prefixes.move_to_end(key)
+                start = i
+                break
+        if state is None:
+            state = self.initial_state()
+
+        for message in messages[start:]:
+            state = self.extend(state, message)
+
+        if start < len(messages):
+            self._prefixes[(len(messages), hashes[-1])] = state
+            if len(self._prefixes) > self.max_prefixes:
+                self._prefixes.popitem(last=False)
+        return self.finalize(state)
+
+
+OpenAIState = Tuple[List[Dict[str, str]], int]
+
+
+class OpenAIEncoder(MessageEncoder[OpenAIState]):
+    """Encodes messages for the OpenAI chat completions API."""
+
+    def initial_state(self) -> OpenAIState:
+        return [], 0
+
+    def extend(self, state, message):
+        items, length = state
+        return _append(items, length, message.to_dict()), length + 1
+
+    def finalize(self, state) -> List[Dict[str, str]]:
+        items, length = state
+        return items[:length]
+
+
+# System texts, then closed turns with their count and the last turn,
+# which stays open so a following turn from the same role can merge into it
+AnthropicState = Tuple[Tuple[str, ...], List[Dict[str, str]], int, Optional[Dict[str, str]]]
+
+
+class AnthropicEncoder(MessageEncoder[AnthropicState]):
+    """Encodes messages for the Anthropic messages API.
+
+    System messages are collected into the native ``system`` parameter and
+    consecutive turns from the same role are merged, since the API requires
+    alternating user/assistant turns.
+    """
+
+    def initial_state(self) -> AnthropicState:
+        return (), [], 0, None
+
+    def extend(self, state, message):
+        system, turns, length, last = state
+        if message.role == "system":
+            return system + (message.content,), turns, length, last
+        role = "assistant" if message.role == "assistant" else "user"
+        if last is not None and last["role"] == role:
+            merged = {"role": role, "content": f"{last['content']}\n\n{message.content}"}
+            return system, turns, length, merged
+        if last is not None:
+            turns, length = _append(turns, length, last), length + 1
+        return system, turns, length, {"role": role, "content": message.content}
+
+    def finalize(self, state) -> Tuple[Optional[str], List[Dict[str, str]]]:
+        system, turns, length, last = state
+        turns = turns[:length]
+        if last is not None:
+            turns.append(last)
+        return ("\n\n".join(system) if system else None), turns
+
+
+# Closed contents with their count, the open last turn, and system texts
+# waiting for the next user turn
+GeminiState = Tuple[List[Dict[str, Any]], int, Optional[Dict[str, Any]], Tuple[str, ...]]
+
+
+class GeminiEncoder(MessageEncoder[GeminiState]):
+    """Encodes messages into Gemini contents.
+
+    Gemini has no system role and expects alternating user/model turns,
+    so system messages are folded into the following user turn and
+    consecutive turns from the same role are merged.
+    """
+
+    def initial_state(self) -> GeminiState:
+        return [], 0, None, ()
+
+    def extend(self, state, message):
+        contents, length, last, pending_system = state
+        if message.role == "system":
+            return contents, length, last, pending_system + (message.content,)
+        role = "model" if message.role == "assistant" else "user"
+        text = message.content
+        if role == "user" and pending_system:
+            text = "\n\n".join(pending_system + (text,))
+            pending_system = ()
+        if last is not None and last["role"] == role:
+            merged = {"role": role, "parts": last["parts"] + [text]}
+            return contents, length, merged, pending_system
+        if last is not None:
+            contents, length = _append(contents, length, last), length + 1
+        return contents, length, {"role": role, "parts": [text]}, pending_system
+
+    def finalize(self, state) -> List[Dict[str, Any]]:
+        contents, length, last, pending_system = state
+        contents = contents[:length]
+        if last is not None:
+            contents.append(last)
+        if pending_system:
+            contents.append({"role": "user", "parts": ["\n\n".join(pending_system)]})
+        return contents
+
+
+openai_encoder = OpenAIEncoder()
+anthropic_encoder = AnthropicEncoder()
+gemini_encoder = GeminiEncoder()
@@ -1,31 +1,65 @@
-from typing import List, Dict, Any, AsyncGenerator
+from typing import List, Dict, Any, AsyncGenerator, Optional
+import httpx
 import openai
-from .adapter import LLMProvider
+from .adapter import LLMProvider, ProviderError, ProviderTimeoutError, error_from_status, parse_retry_after
+from .messages import ChatMessage, openai_encoder
+from .usage import report_usage
+
+def to_provider_error(e: Exception) -> ProviderError:
+    """Translate an OpenAI SDK exception into a typed provider error."""
+    if isinstance(e, ProviderError):
+        return e
+    if isinstance(e, openai.APIStatusError):
+        return error_from_status("OpenAI", e.status_code, str(e), parse_retry_after(e.response.headers))
+    if isinstance(e, openai.APIConnectionError):
+        return ProviderTimeoutError("OpenAI", str(e))
+    return ProviderError("OpenAI", str(e))
+
+def report_openai_usage(usage: Any) -> None:
+    """Report an OpenAI usage object; stream chunks from older SDKs carry it as a dict.
+
+    OpenAI caches long prompt prefixes automatically; the cached part is
+    reported in prompt_tokens_details by API versions that support it.
+    """
+    if not isinstance(usage, dict):
+        usage = usage.model_dump()
+    details = usage.get("prompt_tokens_details") or {}
+    report_usage(usage.get("prompt_tokens"), usage.get("completion_tokens"), details.get("cached_tokens"))
 
 class OpenAIProvider(LLMProvider):
     """OpenAI provider implementation."""
     
-    def __init__(self, api_key: str, organization: str = None):
+    def __init__(
+        self,
+        api_key: str,
+        organization: str = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
         """Initialize OpenAI provider.
         
         Args:
             api_key: OpenAI API key
             organization: OpenAI organization ID (optional)
+            http_client: Shared HTTP connection pool (optional)
         """
+        self.http_client = http_client
         self.client = openai.AsyncOpenAI(
             api_key=api_key,
             organization=organization,
+            http_client=http_client,
+            # Retries are handled by ResilientProvider
+            max_retries=0,
         )
     
     async def generate_response(
         self, 
-        messages: List[Dict[str, str]], 
+        messages: List[ChatMessage], 
         model_params: Dict[str, Any]
     ) -> str:
         """Generate a single response from OpenAI.
         
         Args:
-            messages: List of message dictionaries with 'role' and 'content' keys
+            messages: Conversation messages (ChatMessages or dicts with 'role' and 'content' keys)
             model_params: Dictionary of model-specific parameters
             
         Returns:
@@ -33,22 +67,24 @@ class OpenAIProvider(LLMProvider):
         """
         try:
             response = await self.client.chat.completions.create(
-                messages=messages,
+                messages=openai_encoder.encode(messages),
                 **model_params
             )
+            if response.usage is not None:
+                report_openai_usage(response.usage)
             return response.choices[0].message.content
         except Exception as e:
-            raise Exception(f"OpenAI API error: {str(e)}")
+            raise to_provider_error(e) from e
     
     async def stream_response(
         self, 
-        messages: List[Dict[str, str]], 
+        messages: List[ChatMessage], 
         model_params: Dict[str, Any]
     ) -> AsyncGenerator[str, None]:
         """Stream responses from OpenAI.
         
         Args:
-            messages: List of message dictionaries with 'role' and 'content' keys
+            messages: Conversation messages (ChatMessages or dicts with 'role' and 'content' keys)
             model_params: Dictionary of model-specific parameters
             
         Yields:
@@ -56,15 +92,24 @@ class OpenAIProvider(LLMProvider):
         """
         try:
             stream = await self.client.chat.completions.create(
-                messages=messages,
+                messages=openai_encoder.encode(messages),
                 stream=True,
+                # Ask for a final chunk with token usage; it has no choices
+                extra_body={"stream_options": {"include_usage": True}},
                 **model_params
             )
-            async for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
+            try:
+                async for chunk in stream:
+                    usage = getattr(chunk, "usage", None)
+                    if usage:
+                        report_openai_usage(usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                # Release the upstream connection when the consumer stops early
+                await stream.close()
         except Exception as e:
-            raise Exception(f"OpenAI API error: {str(e)}")
+            raise to_provider_error(e) from e
     
     async def validate_credentials(self) -> bool:
         """Validate OpenAI credentials.
@@ -76,4 +121,9 @@ class OpenAIProvider(LLMProvider):
             await self.client.models.list()
             return True
         except Exception:
-            return False 
\ No newline at end of file
+            return False
+
+    async def warmup(self) -> None:
+        """Open a connection to the API host ahead of the first request."""
+        if self.http_client is not None:
+            await self.http_client.head(str(self.client.base_url))
@@ -0,0 +1,106 @@
+from typing import Any, Dict, Iterable, List
+import logging
+
+from app.core.cache import TTLCache
+from app.core.config import Settings, get_settings
+from .catalog import cached_input_cost, get_model_info
+from .context import context_manager
+from .messages import ChatMessage, prefix_hashes
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+class PromptMessages(list):
+    """Messages of a request with the length of their stable prefix.
+
+    Provider adapters mark the first `cache_prefix` messages for the
+    provider's prompt cache; 0 leaves the request unmarked.
+    """
+
+    def __init__(self, messages: Iterable[ChatMessage] = (), cache_prefix: int = 0):
+        super().__init__(messages)
+        self.cache_prefix = cache_prefix
+
+
+def cache_prefix(messages: List[ChatMessage]) -> int:
+    """Number of leading messages marked as a stable prefix."""
+    return getattr(messages, "cache_prefix", 0)
+
+
+class PrefixTracker:
+    """Finds conversation prefixes that repeat across requests.
+
+    The context of every request (all messages but the last) is remembered
+    by prefix hash. A later request that starts with a remembered prefix,
+    such as a shared system prompt with few-shot examples or the earlier
+    turns of the same conversation, gets that prefix marked for caching.
+    A leading block of system messages is always treated as stable.
+    Prefixes below the provider's minimum cacheable size are not marked.
+    """
+
+    def __init__(self, settings: Settings):
+        """Initialize the tracker.
+
+        Args:
+            settings: Application settings
+        """
+        self.enabled = settings.PROMPT_CACHE_ENABLED
+        self.min_tokens = settings.PROMPT_CACHE_MIN_TOKENS
+        self._seen: TTLCache[bool] = TTLCache(
+            settings.PROMPT_CACHE_MAX_PREFIXES, settings.PROMPT_CACHE_PREFIX_TTL_SECONDS
+        )
+        self.requests = 0
+        self.marked = 0
+        self.cached_tokens: Dict[str, int] = {}
+        self.saved_usd: Dict[str, float] = {}
+
+    def mark(self, messages: List[ChatMessage]) -> List[ChatMessage]:
+        """Return the messages with their stable prefix marked.
+
+        Args:
+            messages: Conversation messages as sent upstream
+
+        Returns:
+            PromptMessages with the same messages
+        """
+        if not self.enabled or len(messages) < 2:
+            return messages
+        self.requests += 1
+        hashes = prefix_hashes(messages)
+        length = 0
+        for i in range(len(messages) - 1, 0, -1):
+            if self._seen.get((i, hashes[i - 1])):
+                length = i
+                break
+        if not length:
+            while length < len(messages) - 1 and messages[length].role == "system":
+                length += 1
+        self._seen.set((len(messages) - 1, hashes[-2]), True)
+
+        if length and context_manager.counter.count(messages[:length]) < self.min_tokens:
+            length = 0
+        if length:
+            self.marked += 1
+        return PromptMessages(messages, length)
+
+    def record(self, provider: str, model: str, cached_tokens: int) -> None:
+        """Account prompt tokens a provider served from its cache."""
+        info = get_model_info(model)
+        saved = cached_tokens * (info.input_cost_per_mtok - cached_input_cost(info)) / 1e6
+        self.cached_tokens[provider] = self.cached_tokens.get(provider, 0) + cached_tokens
+        self.saved_usd[provider] = self.saved_usd.get(provider, 0.0) + saved
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "requests": self.requests,
+            "marked": self.marked,
+            "tracked_prefixes": len(self._seen),
+            "cached_tokens": dict(self.cached_tokens),
+            "saved_usd": {provider: round(saved, 6) for provider, saved in self.saved_usd.items()},
+        }
+
+
+prompt_cache = PrefixTracker(settings)
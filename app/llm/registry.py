@@ -0,0 +1,161 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import logging
+
+import httpx
+
+from app.core.config import Settings
+from .adapter import LLMProvider
+from .admission import AdmissionController
+from .health import HealthMonitor
+from .http_client import create_http_client, pool_stats
+from .resilience import CircuitBreaker, ResilientProvider, RetryPolicy
+from .routing import LatencyTracker, ProviderRouter
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderUnavailable(Exception):
+    """Raised when a provider is unknown or not configured."""
+
+
+@dataclass(frozen=True)
+class ProviderSpec:
+    """How to build a provider from settings.
+
+    Factories import their provider module when called, so a vendor SDK
+    is only loaded once a provider with a configured key is first used.
+    """
+
+    label: str
+    api_key_setting: str
+    factory: Callable[[Settings, httpx.AsyncClient], LLMProvider]
+
+
+def _openai(s: Settings, http: httpx.AsyncClient) -> LLMProvider:
+    from .openai_provider import OpenAIProvider
+    return OpenAIProvider(api_key=s.OPENAI_API_KEY, organization=s.OPENAI_ORGANIZATION, http_client=http)
+
+
+def _anthropic(s: Settings, http: httpx.AsyncClient) -> LLMProvider:
+    from .anthropic_provider import AnthropicProvider
+    return AnthropicProvider(api_key=s.ANTHROPIC_API_KEY, http_client=http)
+
+
+def _gemini(s: Settings, http: httpx.AsyncClient) -> LLMProvider:
+    from .gemini_provider import GeminiProvider
+    return GeminiProvider(api_key=s.GOOGLE_API_KEY)
+
+
+def _fake(s: Settings, http: httpx.AsyncClient) -> LLMProvider:
+    from .fake_provider import FakeProvider
+    return FakeProvider(s.LLM_FAKE_LATENCY_SECONDS, s.LLM_FAKE_TOKENS_PER_SECOND)
+
+
+PROVIDER_SPECS: Dict[str, ProviderSpec] = {
+    "openai": ProviderSpec("OpenAI", "OPENAI_API_KEY", _openai),
+    "anthropic": ProviderSpec("Anthropic", "ANTHROPIC_API_KEY", _anthropic),
+    "gemini": ProviderSpec("Google", "GOOGLE_API_KEY", _gemini),
+    # Enabled by LLM_FAKE_PROVIDER rather than an API key
+    "fake": ProviderSpec("Fake", "LLM_FAKE_PROVIDER", _fake),
+}
+
+
+class ProviderRegistry:
+    """Owns LLM provider instances and the HTTP connection pool they share."""
+
+    def __init__(self, settings: Settings):
+        """Initialize the registry.
+
+        Args:
+            settings: Application settings
+        """
+        self.settings = settings
+        self.http_client: Optional[httpx.AsyncClient] = None
+        self._providers: Dict[str, LLMProvider] = {}
+        self.retry = RetryPolicy.from_settings(settings)
+        self.breakers: Dict[str, CircuitBreaker] = {
+            name: CircuitBreaker(spec.label, settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RECOVERY_SECONDS)
+            for name, spec in PROVIDER_SPECS.items()
+        }
+        self.health = HealthMonitor(self, settings)
+        self.latency = LatencyTracker(settings.ROUTER_LATENCY_WINDOW)
+        self.router = ProviderRouter(self, settings)
+        self.admission = AdmissionController(settings)
+
+    @property
+    def names(self) -> List[str]:
+        """Names of all known providers."""
+        return list(PROVIDER_SPECS)
+
+    def is_configured(self, name: str) -> bool:
+        """Whether the provider's API key is set."""
+        spec = PROVIDER_SPECS.get(name)
+        return spec is not None and bool(getattr(self.settings, spec.api_key_setting))
+
+    def get(self, name: str) -> LLMProvider:
+        """Get a provider instance, building it on first use.
+
+        Raises:
+            ProviderUnavailable: If the provider is unknown or has no API key
+        """
+        provider = self._providers.get(name)
+        if provider is not None:
+            return provider
+        spec = PROVIDER_SPECS.get(name)
+        if spec is None:
+            raise ProviderUnavailable(f"Unknown provider: {name}")
+        if not self.is_configured(name):
+            raise ProviderUnavailable(f"{spec.label} API key not configured")
+        if self.http_client is None:
+            self.http_client = create_http_client(self.settings)
+        provider = self._providers[name] = ResilientProvider(
+            spec.factory(self.settings, self.http_client), name, self.breakers[name], self.retry
+        )
+        return provider
+
+    def available(self) -> List[str]:
+        """Configured providers not known to be unhealthy and not short-circuited."""
+        return [
+            name for name in self.names
+            if self.health.is_available(name) and self.breakers[name].allows_requests
+        ]
+
+    async def start(self) -> None:
+        """Start health probes, and with LLM_PREWARM build configured providers and pre-warm their connections.
+
+        Without pre-warming, providers (and their SDKs) are loaded on first use.
+        """
+        if self.settings.LLM_PREWARM:
+            configured = [name for name in self.names if self.is_configured(name)]
+            for name in configured:
+                self.get(name)
+            await asyncio.gather(*(self._warmup(name) for name in configured))
+        self.health.start()
+
+    async def _warmup(self, name: str) -> None:
+        try:
+            await self._providers[name].warmup()
+        except Exception as e:
+            logger.warning("Failed to pre-warm provider %s: %s", name, e)
+
+    async def close(self) -> None:
+        """Close providers and the shared connection pool."""
+        await self.health.stop()
+        for provider in self._providers.values():
+            await provider.aclose()
+        self._providers.clear()
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+
+    def breaker_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Circuit breaker state of every known provider."""
+        return {name: breaker.snapshot() for name, breaker in self.breakers.items()}
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Connection pool occupancy of the shared HTTP client."""
+        if self.http_client is None:
+            return {}
+        return pool_stats(self.http_client)
@@ -0,0 +1,311 @@
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional, TypeVar
+import asyncio
+import logging
+import random
+import time
+
+from app.core.config import Settings
+from app.core.metrics import LLM_DURATION, LLM_FIRST_TOKEN, LLM_INTER_TOKEN, LLM_REQUESTS, LLM_RETRIES, LLM_TOKENS
+from .adapter import CircuitOpenError, LLMProvider, ProviderError
+from .catalog import model_label
+from .context import context_manager
+from .messages import ChatMessage
+from .prompt_cache import prompt_cache
+from .usage import Usage, reporting, usage_ledger
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CircuitBreaker:
+    """Stops calling a provider that keeps failing.
+
+    Closed: calls pass and retryable failures are counted. Open: calls
+    fail fast until the recovery time has passed. Half-open: a single
+    probe call is let through; its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, recovery_seconds: float):
+        """Initialize the breaker.
+
+        Args:
+            name: Provider label used in errors
+            failure_threshold: Consecutive failures that open the circuit
+            recovery_seconds: Time the circuit stays open before a probe is allowed
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self._probe_in_flight = False
+
+    def _remaining(self) -> float:
+        return self.opened_at + self.recovery_seconds - time.monotonic()
+
+    @property
+    def allows_requests(self) -> bool:
+        """Whether a call made now would be let through."""
+        if self.state == "open":
+            return self._remaining() <= 0
+        if self.state == "half_open":
+            return not self._probe_in_flight
+        return True
+
+    def before_call(self) -> None:
+        """Admit a call or fail fast.
+
+        Raises:
+            CircuitOpenError: If the circuit is open or its probe is in flight
+        """
+        if self.state == "open":
+            remaining = self._remaining()
+            if remaining > 0:
+                raise CircuitOpenError(self.name, "circuit open", retry_after=remaining)
+            self.state = "half_open"
+            logger.info("Circuit for %s is half-open, sending a probe", self.name)
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                raise CircuitOpenError(self.name, "circuit half-open", retry_after=self.recovery_seconds)
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info("Circuit for %s closed", self.name)
+        self.state = "closed"
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._probe_in_flight = False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                logger.warning("Circuit for %s opened after %d failures", self.name, self.failures)
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def record_abandoned(self) -> None:
+        """The call ended without telling us anything about the provider."""
+        self._probe_in_flight = False
+
+    def record(self, error: Optional[BaseException]) -> None:
+        """Record a call outcome; only retryable provider errors count as failures."""
+        if error is None or (isinstance(error, ProviderError) and not error.retryable):
+            # Any answer, even a 4xx, shows the provider is reachable
+            self.record_success()
+        elif isinstance(error, ProviderError):
+            self.record_failure()
+        else:
+            self.record_abandoned()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "times_opened": self.times_opened,
+            "retry_in_seconds": max(0.0, self._remaining()) if self.state == "open" else None,
+        }
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter that honors retry-after."""
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float, max_retry_after: float):
+        """Initialize the policy.
+
+        Args:
+            max_attempts: Total attempts including the first call
+            base_delay: Backoff before the first retry
+            max_delay: Upper bound on computed backoff
+            max_retry_after: Longest provider-requested wait we are willing to honor
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "RetryPolicy":
+        return cls(
+            max_attempts=settings.LLM_RETRY_MAX_ATTEMPTS,
+            base_delay=settings.LLM_RETRY_BASE_DELAY_SECONDS,
+            max_delay=settings.LLM_RETRY_MAX_DELAY_SECONDS,
+            max_retry_after=settings.LLM_RETRY_MAX_RETRY_AFTER_SECONDS,
+        )
+
+    def delay(self, attempt: int, error: BaseException) -> Optional[float]:
+        """Seconds to wait before retrying after a failed attempt, or None to give up.
+
+        Args:
+            attempt: Number of the attempt that failed, starting at 1
+            error: The error it failed with
+        """
+        if attempt >= self.max_attempts or not isinstance(error, ProviderError) or not error.retryable:
+            return None
+        if error.retry_after is not None:
+            if error.retry_after > self.max_retry_after:
+                return None
+            return error.retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class ResilientProvider(LLMProvider):
+    """Wraps a provider with retries, a circuit breaker and call metrics.
+
+    Streams are only retried until their first chunk arrives; after that,
+    errors are passed to the caller because output has already been sent.
+    """
+
+    def __init__(self, provider: LLMProvider, name: str, breaker: CircuitBreaker, retry: RetryPolicy):
+        """Initialize the wrapper.
+
+        Args:
+            provider: Provider to wrap
+            name: Registry name of the provider, used as the metrics label
+            breaker: Circuit breaker shared by all calls to the provider
+            retry: Retry policy
+        """
+        self.provider = provider
+        self.name = name
+        self.breaker = breaker
+        self.retry = retry
+
+    async def _attempt(self, func: Callable[[], Awaitable[T]]) -> T:
+        self.breaker.before_call()
+        try:
+            result = await func()
+        except BaseException as e:
+            self.breaker.record(e)
+            raise
+        self.breaker.record(None)
+        return result
+
+    async def _with_retries(self, func: Callable[[], Awaitable[T]]) -> T:
+        attempt = 1
+        while True:
+            try:
+                return await self._attempt(func)
+            except ProviderError as e:
+                delay = self.retry.delay(attempt, e)
+                if delay is None:
+                    raise
+                LLM_RETRIES.inc(self.name)
+                logger.warning("%s (attempt %d), retrying in %.2fs", e, attempt, delay)
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def _record_usage(self, model: str, messages: List[ChatMessage], usage: Usage, completion: str) -> None:
+        # Estimate whatever the provider did not report, e.g. for streams cut short
+        counter = context_manager.counter
+        prompt_tokens = usage.prompt_tokens if usage.prompt_tokens is not None else counter.count(messages)
+        completion_tokens = (
+            usage.completion_tokens if usage.completion_tokens is not None else counter.estimate(completion)
+        )
+        cached_tokens = usage.cached_tokens or 0
+        label = model_label(self.name, model)
+        LLM_TOKENS.inc(self.name, label, "prompt", amount=prompt_tokens)
+        LLM_TOKENS.inc(self.name, label, "completion", amount=completion_tokens)
+        if cached_tokens:
+            LLM_TOKENS.inc(self.name, label, "cached_prompt", amount=cached_tokens)
+            prompt_cache.record(self.name, model, cached_tokens)
+        usage_ledger.record(self.name, model, prompt_tokens, completion_tokens, cached_tokens)
+
+    async def generate_response(self, messages: List[ChatMessage], model_params: Dict[str, Any]) -> str:
+        model = str(model_params.get("model") or "default")
+        label = model_label(self.name, model)
+        started = time.perf_counter()
+        usage = Usage()
+        outcome = "error"
+        try:
+            with reporting(usage):
+                response = await self._with_retries(lambda: self.provider.generate_response(messages, model_params))
+            outcome = "success"
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            LLM_REQUESTS.inc(self.name, label, outcome)
+        LLM_DURATION.observe(time.perf_counter() - started, self.name, label)
+        self._record_usage(model, messages, usage, response)
+        return response
+
+    async def stream_response(
+        self, messages: List[ChatMessage], model_params: Dict[str, Any]
+    ) -> AsyncGenerator[str, None]:
+        model = str(model_params.get("model") or "default")
+        label = model_label(self.name, model)
+        started = time.perf_counter()
+        usage = Usage()
+        source: Optional[AsyncGenerator[str, None]] = None
+
+        async def first_chunk() -> Optional[str]:
+            nonlocal source
+            source = self.provider.stream_response(messages, model_params)
+            try:
+                return await source.__anext__()
+            except StopAsyncIteration:
+                return None
+            except BaseException:
+                await source.aclose()
+                raise
+
+        try:
+            with reporting(usage):
+                first = await self._with_retries(first_chunk)
+        except asyncio.CancelledError:
+            LLM_REQUESTS.inc(self.name, label, "cancelled")
+            raise
+        except Exception:
+            LLM_REQUESTS.inc(self.name, label, "error")
+            raise
+
+        last = time.perf_counter()
+        LLM_FIRST_TOKEN.observe(last - started, self.name, label)
+        parts: List[str] = []
+        outcome = "error"
+        try:
+            if first is not None:
+                parts.append(first)
+                yield first
+                while True:
+                    # Providers report usage from stream events, so collect it around each step
+                    with reporting(usage):
+                        try:
+                            chunk = await source.__anext__()
+                        except StopAsyncIteration:
+                            break
+                    now = time.perf_counter()
+                    LLM_INTER_TOKEN.observe(now - last, self.name, label)
+                    last = now
+                    parts.append(chunk)
+                    yield chunk
+            outcome = "success"
+        except ProviderError as e:
+            self.breaker.record(e)
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = "cancelled"
+            raise
+        finally:
+            await source.aclose()
+            LLM_REQUESTS.inc(self.name, label, outcome)
+            LLM_DURATION.observe(time.perf_counter() - started, self.name, label)
+            self._record_usage(model, messages, usage, "".join(parts))
+
+    async def validate_credentials(self) -> bool:
+        return await self.provider.validate_credentials()
+
+    async def warmup(self) -> None:
+        await self.provider.warmup()
+
+    async def aclose(self) -> None:
+        await self.provider.aclose()
+
+    def __getattr__(self, name: str) -> Any:
+        # Expose attributes of the wrapped provider (client, http_client, ...)
+        return getattr(self.provider, name)
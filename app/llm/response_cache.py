@@ -0,0 +1,144 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+import hashlib
+import json
+import logging
+
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.core.metrics import CACHE_LOOKUPS
+from .messages import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+def request_fingerprint(provider: str, messages: List[ChatMessage], model_params: Dict[str, Any]) -> str:
+    """Canonical hash of a completion request.
+
+    Parameter order and JSON formatting do not affect the result.
+    """
+    payload = json.dumps(
+        {
+            "provider": provider,
+            "messages": [[message.role, message.content] for message in messages],
+            "params": model_params,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheDirectives:
+    """Client cache preferences parsed from a Cache-Control header."""
+
+    lookup: bool = True
+    store: bool = True
+    ttl: Optional[float] = None
+
+    @classmethod
+    def parse(cls, header: Optional[str]) -> "CacheDirectives":
+        directives = cls()
+        for part in (header or "").lower().split(","):
+            part = part.strip()
+            if part == "no-cache":
+                directives.lookup = False
+            elif part == "no-store":
+                directives.lookup = directives.store = False
+            elif part.startswith("max-age="):
+                try:
+                    directives.ttl = max(0.0, float(part[len("max-age="):]))
+                except ValueError:
+                    pass
+        return directives
+
+
+def iter_replay_chunks(text: str, size: int) -> Iterator[str]:
+    """Split a cached response into chunks for SSE replay."""
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+class ResponseCache:
+    """Two-tier cache of deterministic completions.
+
+    An in-process LRU tier answers repeated requests without I/O; an
+    optional Redis tier shares entries between workers.
+    """
+
+    def __init__(self, redis: Optional[aioredis.Redis] = None):
+        """Initialize the cache.
+
+        Args:
+            redis: Async Redis client for the shared tier (optional)
+        """
+        self.local: TTLCache[str] = TTLCache(
+            maxsize=settings.RESPONSE_CACHE_MAX_ENTRIES,
+            ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+        )
+        self.redis = redis
+        self.redis_hits = 0
+        self.redis_errors = 0
+
+    @staticmethod
+    def is_cacheable(model_params: Dict[str, Any]) -> bool:
+        """Only deterministic (temperature 0) requests are cached."""
+        return settings.RESPONSE_CACHE_ENABLED and model_params.get("temperature") == 0
+
+    async def get(self, key: str) -> Optional[str]:
+        """Look up a response in the local tier, then the Redis tier."""
+        value = self.local.get(key)
+        if value is not None or self.redis is None:
+            CACHE_LOOKUPS.inc("responses", "miss" if value is None else "hit")
+            return value
+        try:
+            raw = await self.redis.get(f"response_cache:{key}")
+        except (RedisError, OSError) as e:
+            self.redis_errors += 1
+            logger.warning("Response cache Redis lookup failed: %s", e)
+            CACHE_LOOKUPS.inc("responses", "miss")
+            return None
+        if raw is None:
+            CACHE_LOOKUPS.inc("responses", "miss")
+            return None
+        CACHE_LOOKUPS.inc("responses", "hit")
+        self.redis_hits += 1
+        value = raw.decode("utf-8")
+        self.local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """Store a response in both tiers; oversized responses are skipped."""
+        if len(value) > settings.RESPONSE_CACHE_MAX_ENTRY_CHARS:
+            return
+        ttl = settings.RESPONSE_CACHE_TTL_SECONDS if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self.local.set(key, value, ttl)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(f"response_cache:{key}", value.encode("utf-8"), ex=max(1, int(ttl)))
+        except (RedisError, OSError) as e:
+            self.redis_errors += 1
+            logger.warning("Response cache Redis store failed: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.local.stats(), "redis_hits": self.redis_hits, "redis_errors": self.redis_errors}
+
+
+response_cache = ResponseCache(
+    redis=aioredis.Redis.from_url(
+        settings.REDIS_URL,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    ) if settings.RESPONSE_CACHE_REDIS else None
+)
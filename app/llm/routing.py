@@ -0,0 +1,333 @@
+from collections import deque
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+import asyncio
+import logging
+import random
+import time
+
+from app.core.config import Settings
+from .adapter import LLMProvider
+from .catalog import DEFAULT_MODELS, get_model_info
+from .messages import ChatMessage
+
+if TYPE_CHECKING:
+    from .registry import ProviderRegistry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Builds the call for one provider: (provider, fitted messages, model params)
+PrepareCall = Callable[[str], Awaitable[Tuple[LLMProvider, List[ChatMessage], Dict[str, Any]]]]
+
+
+def percentile(samples: Deque[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of the samples, or None if there are none."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LatencyWindow:
+    """Recent latency samples of one provider."""
+
+    def __init__(self, size: int):
+        self.first_token: Deque[float] = deque(maxlen=size)
+        self.total: Deque[float] = deque(maxlen=size)
+        self.outcomes: Deque[bool] = deque(maxlen=size)
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+
+class LatencyTracker:
+    """Live per-provider latency distributions fed by real traffic.
+
+    Time to first token is what users feel, so routing decisions use it;
+    for non-streaming calls it equals the total latency.
+    """
+
+    def __init__(self, window_size: int):
+        """Initialize the tracker.
+
+        Args:
+            window_size: Number of recent samples kept per provider
+        """
+        self.window_size = window_size
+        self._windows: Dict[str, LatencyWindow] = {}
+
+    def _window(self, name: str) -> LatencyWindow:
+        window = self._windows.get(name)
+        if window is None:
+            window = self._windows[name] = LatencyWindow(self.window_size)
+        return window
+
+    def record(self, name: str, first_token_ms: Optional[float] = None, total_ms: Optional[float] = None) -> None:
+        """Record a successful call."""
+        window = self._window(name)
+        if first_token_ms is not None:
+            window.first_token.append(first_token_ms)
+        if total_ms is not None:
+            window.total.append(total_ms)
+            window.outcomes.append(True)
+
+    def record_error(self, name: str) -> None:
+        """Record a failed call."""
+        self._window(name).outcomes.append(False)
+
+    def p50(self, name: str) -> Optional[float]:
+        """Median time to first token, or None if the provider has no samples."""
+        window = self._windows.get(name)
+        return None if window is None else percentile(window.first_token, 0.5)
+
+    def error_rate(self, name: str) -> float:
+        """Share of recent calls to the provider that failed."""
+        window = self._windows.get(name)
+        return 0.0 if window is None else window.error_rate
+
+    async def track_call(self, name: str, func: Callable[[], Awaitable[T]]) -> T:
+        """Await func() and record its latency against the provider."""
+        started = time.monotonic()
+        try:
+            result = await func()
+        except Exception:
+            self.record_error(name)
+            raise
+        elapsed = (time.monotonic() - started) * 1000
+        self.record(name, elapsed, elapsed)
+        return result
+
+    async def track_stream(self, name: str, func: Callable[[], AsyncGenerator[str, None]]) -> AsyncGenerator[str, None]:
+        """Iterate func() and record time to first chunk and total latency."""
+        started = time.monotonic()
+        first_token_ms = None
+        source = func()
+        try:
+            async for chunk in source:
+                if first_token_ms is None:
+                    first_token_ms = (time.monotonic() - started) * 1000
+                yield chunk
+        except Exception:
+            self.record_error(name)
+            raise
+        finally:
+            await source.aclose()
+        self.record(name, first_token_ms, (time.monotonic() - started) * 1000)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                "samples": len(window.first_token),
+                "first_token_p50_ms": percentile(window.first_token, 0.5),
+                "first_token_p95_ms": percentile(window.first_token, 0.95),
+                "total_p50_ms": percentile(window.total, 0.5),
+                "total_p95_ms": percentile(window.total, 0.95),
+                "error_rate": window.error_rate,
+            }
+            for name, window in self._windows.items()
+        }
+
+
+def model_for(name: str, model_params: Dict[str, Any]) -> str:
+    """Model to request from a provider: the requested one if it belongs to it, else its default."""
+    requested = model_params.get("model")
+    if requested and get_model_info(requested).provider == name:
+        return requested
+    return DEFAULT_MODELS[name]
+
+
+def parse_weights(value: str) -> Dict[str, float]:
+    """Parse weights given as "openai=3,anthropic=1"."""
+    weights = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() and weight.strip():
+            weights[name.strip()] = float(weight)
+    return weights
+
+
+class ProviderRouter:
+    """Chooses among the available providers by policy.
+
+    The first choice is hedged: if it has not produced its first token
+    within the hedge delay, the next provider is started as well and the
+    slower one is cancelled. Providers that fail before producing output
+    are replaced by the next candidate.
+    """
+
+    def __init__(self, registry: "ProviderRegistry", settings: Settings):
+        """Initialize the router.
+
+        Args:
+            registry: Registry providing instances, health and latency data
+            settings: Application settings
+        """
+        self.registry = registry
+        self.default_policy = settings.ROUTER_POLICY
+        self.hedge_delay = settings.ROUTER_HEDGE_MS / 1000
+        self.max_attempts = settings.ROUTER_MAX_ATTEMPTS
+        self.weights = parse_weights(settings.ROUTER_WEIGHTS)
+        self.routed: Dict[str, int] = {}
+        self.hedges = 0
+        self.failovers = 0
+
+    def candidates(self, model_params: Dict[str, Any], policy: Optional[str] = None) -> List[str]:
+        """Available providers in the order the policy prefers them.
+
+        Raises:
+            ValueError: If the policy is unknown
+        """
+        policy = policy or self.default_policy
+        names = self.registry.available()
+        if policy == "latency":
+            # Mostly failing providers go last; ones without samples go first so they get measured
+            latency = self.registry.latency
+            return sorted(
+                names,
+                key=lambda name: (latency.error_rate(name) >= 0.5, latency.p50(name) is not None, latency.p50(name) or 0.0),
+            )
+        if policy == "cost":
+            def cost(name: str) -> float:
+                info = get_model_info(model_for(name, model_params))
+                return info.input_cost_per_mtok + info.output_cost_per_mtok
+            return sorted(names, key=cost)
+        if policy == "weighted":
+            # Weighted shuffle: exponential keys give a weight-proportional first pick
+            weighted = [(name, self.weights.get(name, 1.0)) for name in names]
+            return [
+                name for name, weight in sorted(
+                    (item for item in weighted if item[1] > 0),
+                    key=lambda item: random.expovariate(item[1]),
+                )
+            ]
+        raise ValueError(f"Unknown routing policy: {policy}")
+
+    async def generate(
+        self, names: List[str], prepare: PrepareCall, priority: str = "interactive"
+    ) -> Tuple[str, str]:
+        """Generate a response, hedging and failing over across providers.
+
+        A provider whose admission lane is saturated counts as a failure,
+        so the request moves on to the next candidate.
+
+        Returns:
+            Name of the provider that answered and its response
+        """
+        async def call(name: str) -> str:
+            provider, messages, model_params = await prepare(name)
+            lease = await self.registry.admission.acquire(name, messages, model_params, priority)
+            try:
+                return await self.registry.latency.track_call(
+                    name, lambda: provider.generate_response(messages, model_params)
+                )
+            finally:
+                lease.release()
+
+        return await self._race(names, call, on_loser=None)
+
+    async def stream(
+        self, names: List[str], prepare: PrepareCall, priority: str = "interactive"
+    ) -> AsyncGenerator[str, None]:
+        """Stream a response from the first provider to produce a token.
+
+        Failover only happens before the first token; later errors are raised.
+        """
+        async def first_chunk(name: str) -> Tuple[AsyncGenerator[str, None], Optional[str], float]:
+            provider, messages, model_params = await prepare(name)
+            lease = await self.registry.admission.acquire(name, messages, model_params, priority)
+            started = time.monotonic()
+            source = lease.hold(provider.stream_response(messages, model_params))
+            try:
+                first = await source.__anext__()
+            except StopAsyncIteration:
+                first = None
+            except asyncio.CancelledError:
+                # Lost the race; not a provider error
+                await source.aclose()
+                raise
+            except Exception:
+                self.registry.latency.record_error(name)
+                await source.aclose()
+                raise
+            return source, first, started
+
+        async def close_loser(result: Tuple[AsyncGenerator[str, None], Optional[str], float]) -> None:
+            await result[0].aclose()
+
+        name, (source, first, started) = await self._race(names, first_chunk, on_loser=close_loser)
+        first_token_ms = (time.monotonic() - started) * 1000
+        try:
+            if first is not None:
+                yield first
+                async for chunk in source:
+                    yield chunk
+        except Exception:
+            self.registry.latency.record_error(name)
+            raise
+        finally:
+            await source.aclose()
+        self.registry.latency.record(name, first_token_ms, (time.monotonic() - started) * 1000)
+
+    async def _race(self, names: List[str], attempt: Callable[[str], Awaitable[T]], on_loser) -> Tuple[str, T]:
+        queue = list(names[:self.max_attempts])
+        if not queue:
+            raise RuntimeError("No LLM providers are available")
+        pending: Dict[asyncio.Task, str] = {}
+        winner: Optional[Tuple[str, T]] = None
+        last_error: Optional[BaseException] = None
+
+        def launch() -> None:
+            name = queue.pop(0)
+            pending[asyncio.create_task(attempt(name))] = name
+
+        launch()
+        try:
+            while pending and winner is None:
+                timeout = self.hedge_delay if queue and self.hedge_delay > 0 else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.hedges += 1
+                    logger.info("Hedging request: no first token after %.0f ms", self.hedge_delay * 1000)
+                    launch()
+                    continue
+                for task in done:
+                    name = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        last_error = e
+                        logger.warning("Provider %s failed, failing over: %s", name, e)
+                        continue
+                    if winner is None:
+                        winner = (name, result)
+                    elif on_loser is not None:
+                        await on_loser(result)
+                if winner is None and queue and not pending:
+                    self.failovers += 1
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+            results = await asyncio.gather(*pending, return_exceptions=True)
+            if on_loser is not None:
+                for result in results:
+                    if not isinstance(result, BaseException):
+                        await on_loser(result)
+
+        if winner is None:
+            raise last_error
+        self.routed[winner[0]] = self.routed.get(winner[0], 0) + 1
+        return winner
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "policy": self.default_policy,
+            "routed": dict(self.routed),
+            "hedges": self.hedges,
+            "failovers": self.failovers,
+            "latency": self.registry.latency.snapshot(),
+        }
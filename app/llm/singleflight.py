@@ -0,0 +1,136 @@
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _StreamFlight:
+    """One upstream stream fanned out to any number of subscribers."""
+
+    def __init__(self, source: AsyncIterator[str]):
+        self.source = source
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.create_task(self._pump())
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def _pump(self) -> None:
+        try:
+            async for chunk in self.source:
+                self.chunks.append(chunk)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            aclose = getattr(self.source, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            self.done = True
+            self._notify()
+
+    async def subscribe(self) -> AsyncGenerator[str, None]:
+        """Yield every chunk from the start, including ones already buffered."""
+        index = 0
+        while True:
+            changed = self._changed
+            if index < len(self.chunks):
+                chunk = self.chunks[index]
+                index += 1
+                yield chunk
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await changed.wait()
+
+
+class SingleFlight:
+    """Deduplicates identical concurrent upstream calls.
+
+    Callers presenting the same key while a call is in flight share its
+    result; streams are fanned out from a single upstream stream, and late
+    joiners first receive the chunks buffered so far.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._streams: Dict[str, _StreamFlight] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """Run func once for all concurrent callers with the same key."""
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            # Run as a task so a cancelled caller does not fail the others
+            task = self._calls[key] = asyncio.ensure_future(func())
+            task.add_done_callback(lambda t: self._forget(self._calls, key, t))
+        else:
+            self.followers += 1
+        return await asyncio.shield(task)
+
+    def stream(self, key: str, func: Callable[[], AsyncIterator[str]]) -> AsyncGenerator[str, None]:
+        """Subscribe to the in-flight stream for key, starting it if needed.
+
+        The upstream stream is cancelled once its last subscriber leaves.
+        """
+        return self.join(key) or self.lead(key, func())
+
+    def join(self, key: str) -> Optional[AsyncGenerator[str, None]]:
+        """Subscribe to the in-flight stream for key, or return None if there is none."""
+        flight = self._streams.get(key)
+        if flight is None or flight.done:
+            return None
+        self.followers += 1
+        return self._subscribe(key, flight)
+
+    def lead(self, key: str, source: AsyncIterator[str]) -> AsyncGenerator[str, None]:
+        """Start fanning out source as the in-flight stream for key and subscribe to it."""
+        self.leaders += 1
+        flight = self._streams[key] = _StreamFlight(source)
+        flight.task.add_done_callback(lambda t: self._forget(self._streams, key, flight))
+        return self._subscribe(key, flight)
+
+    async def _subscribe(self, key: str, flight: _StreamFlight) -> AsyncGenerator[str, None]:
+        flight.subscribers += 1
+        try:
+            async for chunk in flight.subscribe():
+                yield chunk
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                self._forget(self._streams, key, flight)
+                flight.task.cancel()
+
+    @staticmethod
+    def _forget(table: Dict[str, Any], key: str, value: Any) -> None:
+        if table.get(key) is value:
+            del table[key]
+        if isinstance(value, asyncio.Task) and not value.cancelled():
+            # Mark the exception as retrieved; waiters re-raise it themselves
+            value.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight_calls": len(self._calls),
+            "in_flight_streams": len(self._streams),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
+
+
+singleflight = SingleFlight()
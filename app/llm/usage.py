@@ -0,0 +1,348 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+import asyncio
+import logging
+
+from sqlalchemy import func, insert, select
+
+from app.core.cache import TTLCache
+from app.core.config import Settings, get_settings
+from app.db import models
+from app.db.session import AsyncSessionLocal
+from .catalog import cached_input_cost, get_model_info
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+@dataclass
+class Usage:
+    """Token counts of one upstream call; None until the provider reports them.
+
+    prompt_tokens includes cached_tokens, the part of the prompt read from
+    the provider's prompt cache.
+    """
+
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+
+
+# Usage of the provider call in progress, filled in by the provider adapters
+_call_usage: ContextVar[Optional[Usage]] = ContextVar("call_usage", default=None)
+# Usage of all upstream calls made for the current request
+_request_usage: ContextVar[Optional[Usage]] = ContextVar("request_usage", default=None)
+# User that upstream calls made in this context are billed to
+_billed_user: ContextVar[Optional[int]] = ContextVar("billed_user", default=None)
+
+
+def report_usage(
+    prompt_tokens: Optional[int] = None,
+    completion_tokens: Optional[int] = None,
+    cached_tokens: Optional[int] = None,
+) -> None:
+    """Report token counts returned by the provider for the current call.
+
+    Counts that are None are left unchanged, so prompt and completion
+    tokens can be reported by separate stream events.
+    """
+    usage = _call_usage.get()
+    if usage is None:
+        return
+    if prompt_tokens is not None:
+        usage.prompt_tokens = prompt_tokens
+    if completion_tokens is not None:
+        usage.completion_tokens = completion_tokens
+    if cached_tokens is not None:
+        usage.cached_tokens = cached_tokens
+
+
+@contextmanager
+def reporting(usage: Usage) -> Iterator[Usage]:
+    """Collect usage reported by provider code run inside the block."""
+    token = _call_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _call_usage.reset(token)
+
+
+def track_request_usage() -> Usage:
+    """Start summing the usage of upstream calls made from the current context (and tasks it starts)."""
+    usage = Usage(0, 0, 0)
+    _request_usage.set(usage)
+    return usage
+
+
+def request_usage() -> Optional[Usage]:
+    """Usage summed since track_request_usage() was called, or None if it was not."""
+    return _request_usage.get()
+
+
+def bill_to(user_id: Optional[int]) -> None:
+    """Attribute upstream calls made from the current context (and tasks it starts) to a user."""
+    _billed_user.set(user_id)
+
+
+def billed_user() -> Optional[int]:
+    """User that upstream calls from the current context are billed to."""
+    return _billed_user.get()
+
+
+class QuotaExceeded(Exception):
+    """Raised when a user has used up a token quota."""
+
+    def __init__(self, period: str, limit: int, retry_after: int):
+        super().__init__(f"{period.capitalize()} token quota of {limit} exceeded")
+        self.period = period
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+def _period_starts(now: datetime) -> Tuple[datetime, datetime]:
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return day, day.replace(day=1)
+
+
+def _next_period(start: datetime, period: str) -> datetime:
+    if period == "daily":
+        return start + timedelta(days=1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+class _UserTotals:
+    """Tokens a user has used in the current day and month."""
+
+    __slots__ = ("day", "month", "daily", "monthly")
+
+    def __init__(self, day: datetime, month: datetime, daily: int = 0, monthly: int = 0):
+        self.day = day
+        self.month = month
+        self.daily = daily
+        self.monthly = monthly
+
+    def roll(self, day: datetime, month: datetime) -> None:
+        if day != self.day:
+            self.day, self.daily = day, 0
+        if month != self.month:
+            self.month, self.monthly = month, 0
+
+
+class UsageLedger:
+    """Buffers usage records and writes them to the database in batches.
+
+    Quotas are enforced from in-memory per-user totals. A user's totals
+    are loaded from the database the first time they are seen, and are
+    re-read for recently active users after every flush, so limits hold
+    across workers within one flush interval. Totals are kept for at most
+    USAGE_TOTALS_MAX_USERS users and USAGE_TOTALS_TTL_SECONDS; evicted
+    users are loaded again on their next request.
+    """
+
+    def __init__(self, settings: Settings):
+        """Initialize the ledger.
+
+        Args:
+            settings: Application settings
+        """
+        self.flush_interval = settings.USAGE_FLUSH_SECONDS
+        self.flush_max_records = settings.USAGE_FLUSH_MAX_RECORDS
+        self.buffer_max_records = settings.USAGE_BUFFER_MAX_RECORDS
+        self.limits = {"daily": settings.USAGE_DAILY_TOKEN_LIMIT, "monthly": settings.USAGE_MONTHLY_TOKEN_LIMIT}
+        self._buffer: List[Dict[str, Any]] = []
+        self._flushing: List[Dict[str, Any]] = []
+        self._totals: TTLCache[_UserTotals] = TTLCache(
+            settings.USAGE_TOTALS_MAX_USERS, settings.USAGE_TOTALS_TTL_SECONDS
+        )
+        self._active: Set[int] = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.flush_failures = 0
+
+    def record(
+        self, provider: str, model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0
+    ) -> None:
+        """Buffer the usage of one upstream call for the billed user and the current request."""
+        request_usage = _request_usage.get()
+        if request_usage is not None:
+            request_usage.prompt_tokens += prompt_tokens
+            request_usage.completion_tokens += completion_tokens
+            request_usage.cached_tokens += cached_tokens
+        user_id = _billed_user.get()
+        info = get_model_info(model)
+        cost = (
+            (prompt_tokens - cached_tokens) * info.input_cost_per_mtok
+            + cached_tokens * cached_input_cost(info)
+            + completion_tokens * info.output_cost_per_mtok
+        ) / 1e6
+        self._buffer.append({
+            "user_id": user_id,
+            "provider": provider,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens,
+            "cost": cost,
+            "created_at": datetime.now(timezone.utc),
+        })
+        self.recorded += 1
+        if user_id is not None:
+            totals = self._totals.get(user_id)
+            if totals is not None:
+                totals.roll(*_period_starts(datetime.now(timezone.utc)))
+                totals.daily += prompt_tokens + completion_tokens
+                totals.monthly += prompt_tokens + completion_tokens
+            self._active.add(user_id)
+        if len(self._buffer) > self.buffer_max_records:
+            # The database has been unreachable for a while; keep memory bounded
+            del self._buffer[0]
+            self.dropped += 1
+        if len(self._buffer) >= self.flush_max_records:
+            self._wakeup.set()
+
+    async def check_quota(self, user_id: int) -> None:
+        """Fail if the user has used up a quota.
+
+        Raises:
+            QuotaExceeded: If the daily or monthly token limit is reached
+        """
+        if not any(self.limits.values()):
+            return
+        now = datetime.now(timezone.utc)
+        day, month = _period_starts(now)
+        totals = self._totals.get(user_id)
+        if totals is None:
+            totals = (await self._load_totals({user_id}))[user_id]
+        totals.roll(day, month)
+        self._active.add(user_id)
+        for period, used, start in (("daily", totals.daily, day), ("monthly", totals.monthly, month)):
+            limit = self.limits[period]
+            if limit and used >= limit:
+                retry_after = int((_next_period(start, period) - now).total_seconds()) + 1
+                raise QuotaExceeded(period, limit, retry_after)
+
+    async def summary(self, user_id: int) -> Dict[str, Any]:
+        """Tokens the user has used today and this month, with the limits."""
+        totals = self._totals.get(user_id)
+        if totals is None:
+            totals = (await self._load_totals({user_id}))[user_id]
+        totals.roll(*_period_starts(datetime.now(timezone.utc)))
+        return {
+            "daily_tokens": totals.daily,
+            "daily_limit": self.limits["daily"] or None,
+            "monthly_tokens": totals.monthly,
+            "monthly_limit": self.limits["monthly"] or None,
+        }
+
+    def _pending_tokens(self, user_ids: Set[int], since: datetime) -> Dict[int, int]:
+        pending: Dict[int, int] = {}
+        for row in (*self._flushing, *self._buffer):
+            if row["user_id"] in user_ids and row["created_at"] >= since:
+                pending[row["user_id"]] = pending.get(row["user_id"], 0) + row["prompt_tokens"] + row["completion_tokens"]
+        return pending
+
+    async def _sum_since(self, user_ids: Set[int], since: datetime) -> Dict[int, int]:
+        tokens = func.sum(models.UsageRecord.prompt_tokens + models.UsageRecord.completion_tokens)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(models.UsageRecord.user_id, tokens)
+                .where(models.UsageRecord.user_id.in_(user_ids), models.UsageRecord.created_at >= since)
+                .group_by(models.UsageRecord.user_id)
+            )
+            return {user_id: int(total or 0) for user_id, total in result}
+
+    async def _load_totals(self, user_ids: Set[int]) -> Dict[int, _UserTotals]:
+        """Set totals from flushed records plus records not yet written, and return them."""
+        day, month = _period_starts(datetime.now(timezone.utc))
+        monthly = await self._sum_since(user_ids, month)
+        daily = await self._sum_since(user_ids, day)
+        pending_daily = self._pending_tokens(user_ids, day)
+        pending_monthly = self._pending_tokens(user_ids, month)
+        loaded = {}
+        for user_id in user_ids:
+            loaded[user_id] = _UserTotals(
+                day,
+                month,
+                daily.get(user_id, 0) + pending_daily.get(user_id, 0),
+                monthly.get(user_id, 0) + pending_monthly.get(user_id, 0),
+            )
+            self._totals.set(user_id, loaded[user_id])
+        return loaded
+
+    async def flush(self) -> None:
+        """Write buffered records in one batched insert."""
+        if not self._buffer:
+            return
+        self._flushing, self._buffer = self._buffer, []
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(insert(models.UsageRecord), self._flushing)
+                await db.commit()
+        except Exception:
+            # Keep the records for the next attempt
+            self.flush_failures += 1
+            self._buffer[:0] = self._flushing
+            raise
+        else:
+            self.flushed += len(self._flushing)
+        finally:
+            self._flushing = []
+
+    def start(self) -> None:
+        """Start flushing in the background."""
+        if self._task is None:
+            # Bound to the running loop on first use, so create it per start
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and write what is left."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error("Failed to write %d usage records on shutdown: %s", len(self._buffer), e)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                if any(self.limits.values()) and self._active:
+                    # Pick up usage recorded by other workers
+                    active, self._active = self._active, set()
+                    await self._load_totals(active)
+            except Exception as e:
+                logger.warning("Failed to flush usage records: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "flush_failures": self.flush_failures,
+            "tracked_users": len(self._totals),
+        }
+
+
+usage_ledger = UsageLedger(settings)
@@ -1,26 +1,62 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.core.config import get_settings
+from app.core.logs import RequestIdMiddleware, setup_logging
+from app.core.metrics import MetricsMiddleware, metrics
 from app.core.rate_limit import rate_limit_middleware
-from app.api.v1.routes import auth, chat, conversations, admin
-from app.db.session import Base, engine
+from app.api.v1.routes import auth, batch, chat, conversations, admin
+from app.api.v1.routes.batch import run_chat_item
+from app.api.v1.routes.chat import provider_error_status
+from app.db.session import create_tables, warm_up_pool
+from app.llm.adapter import ProviderError
+from app.llm.batch import BatchJobManager
+from app.llm.broker import StreamPublisher, create_broker
+from app.llm.registry import ProviderRegistry
+from app.llm.usage import usage_ledger
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Optional
 import logging
+import math
+import secrets
 import traceback
 
+settings = get_settings()
+
 # Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+setup_logging(settings)
 logger = logging.getLogger(__name__)
 
-settings = get_settings()
-
-# Initialize database
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared resources on startup and release them on shutdown."""
+    if settings.DATABASE_CREATE_TABLES:
+        await create_tables()
+    app.state.providers = ProviderRegistry(settings)
+    app.state.streams = StreamPublisher(
+        create_broker(),
+        disconnect_grace=settings.STREAM_DISCONNECT_GRACE_SECONDS if settings.STREAM_CANCEL_ON_DISCONNECT else None
+    )
+    app.state.batch_jobs = BatchJobManager(settings, partial(run_chat_item, app.state.providers))
+    # Warm-up runs before the server starts accepting connections
+    await warm_up_pool(settings.DATABASE_WARMUP_CONNECTIONS)
+    await app.state.providers.start()
+    metrics.start()
+    usage_ledger.start()
+    app.state.batch_jobs.start()
+    try:
+        yield
+    finally:
+        await app.state.batch_jobs.stop()
+        await metrics.stop()
+        await app.state.streams.aclose()
+        await app.state.providers.close()
+        # After the streams, so usage of cancelled generations is written too
+        await usage_ledger.stop()
 
 app = FastAPI(
+    lifespan=lifespan,
     title="AI Chat Hub API",
     description="AI Chat Hub Backend API",
     version="1.0.0",
@@ -44,11 +80,16 @@ app.add_middleware(
 # Add rate limiting middleware
 app.middleware("http")(rate_limit_middleware)
 
+# Outermost, so rate-limited and failed requests are counted too
+app.add_middleware(MetricsMiddleware)
+
+# Outside everything else, so all log records of a request carry its id
+app.add_middleware(RequestIdMiddleware)
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Global exception handler caught: {str(exc)}")
-    logger.error(f"Traceback: {traceback.format_exc()}")
+    logger.error("Global exception handler caught: %s", exc, exc_info=exc)
     return JSONResponse(
         status_code=500,
         content={
@@ -58,9 +99,22 @@ async def global_exception_handler(request: Request, exc: Exception):
         }
     )
 
+@app.exception_handler(ProviderError)
+async def provider_exception_handler(request: Request, exc: ProviderError):
+    status_code = provider_error_status(exc)
+    headers = None
+    if exc.retry_after is not None:
+        headers = {"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": str(exc), "type": type(exc).__name__},
+        headers=headers
+    )
+
 # Include routers
 app.include_router(auth.router, prefix=settings.API_V1_STR, tags=["auth"])
 app.include_router(chat.router, prefix=settings.API_V1_STR, tags=["chat"])
+app.include_router(batch.router, prefix=settings.API_V1_STR, tags=["chat"])
 app.include_router(conversations.router, prefix=settings.API_V1_STR, tags=["conversations"])
 app.include_router(admin.router, prefix=settings.API_V1_STR, tags=["admin"])
 
@@ -71,4 +125,13 @@ async def root():
         "message": "Welcome to AI Chat Hub API",
         "version": "1.0.0",
         "docs_url": "/docs"
-    } 
\ No newline at end of file
+    } 
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus scrape endpoint; enabled by setting METRICS_TOKEN."""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(authorization or "", f"Bearer {settings.METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.to_prometheus(), media_type="text/plain; version=0.0.4")
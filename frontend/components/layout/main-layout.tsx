@@ -8,7 +8,7 @@ import { Search, MessageSquare, LayoutDashboard, Plus } from 'lucide-react';
 import Link from 'next/link';
 import { usePathname, useRouter } from 'next/navigation';
 import { ScrollArea } from '@/components/ui/scroll-area';
-import { Conversation } from '@/lib/api/types';
+import { Conversation, ConversationSummary } from '@/lib/api/types';
 import { apiClient } from '@/lib/api/client';
 
 interface ConversationContextType {
@@ -34,7 +34,7 @@ export function MainLayout({ children }: MainLayoutProps) {
   const pathname = usePathname();
   const router = useRouter();
   const isChatsPage = pathname === '/chats';
-  const [conversations, setConversations] = useState<Conversation[]>([]);
+  const [conversations, setConversations] = useState<ConversationSummary[]>([]);
   const [currentConversation, setCurrentConversation] = useState<Conversation | null>(null);
   const [isLoading, setIsLoading] = useState(false);
 
@@ -72,18 +72,9 @@ export function MainLayout({ children }: MainLayoutProps) {
       const data = await apiClient.listConversations();
       setConversations(data);
       
-      // If we're on the chats page, handle current conversation
-      if (isChatsPage) {
-        if (currentConversation) {
-          // Find and update the current conversation
-          const updatedConversation = data.find(c => c.id === currentConversation.id);
-          if (updatedConversation) {
-            setCurrentConversation(updatedConversation);
-          }
-        } else if (data.length > 0) {
-          // If no conversation is selected, select the first one
-          setCurrentConversation(data[0]);
-        }
+      // If we're on the chats page and no conversation is selected, select the first one
+      if (isChatsPage && !currentConversation && data.length > 0) {
+        setCurrentConversation(await apiClient.getConversation(data[0].id));
       }
     } catch (err) {
       console.error('Failed to load conversations:', err);
@@ -95,6 +86,18 @@ export function MainLayout({ children }: MainLayoutProps) {
     }
   };
 
+  // The list only has summaries; load the messages of the selected conversation
+  const selectConversation = async (conversationId: string) => {
+    try {
+      setIsLoading(true);
+      setCurrentConversation(await apiClient.getConversation(conversationId));
+    } catch (err) {
+      console.error('Failed to load conversation:', err);
+    } finally {
+      setIsLoading(false);
+    }
+  };
+
   const handleCreateConversation = async () => {
     try {
       setIsLoading(true);
@@ -159,7 +162,7 @@ export function MainLayout({ children }: MainLayoutProps) {
                     key={conv.id}
                     variant={currentConversation?.id === conv.id ? "secondary" : "ghost"}
                     className="w-full justify-start mb-2"
-                    onClick={() => setCurrentConversation(conv)}
+                    onClick={() => selectConversation(conv.id)}
                     disabled={isLoading}
                   >
                     {conv.title}
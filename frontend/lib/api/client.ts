@@ -1,4 +1,4 @@
-import { TokenResponse, User, Message, Conversation, ChatRequest, ChatResponse, SystemStatus } from './types';
+import { TokenResponse, User, Message, Conversation, ConversationSummary, ChatRequest, ChatResponse, SystemStatus } from './types';
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/api/v1';
 
@@ -191,8 +191,8 @@ class ApiClient {
     });
   }
 
-  async listConversations(): Promise<Conversation[]> {
-    return this.request<Conversation[]>('/conversations');
+  async listConversations(): Promise<ConversationSummary[]> {
+    return this.request<ConversationSummary[]>('/conversations');
   }
 
   async getConversation(id: string): Promise<Conversation> {
@@ -13,11 +13,14 @@ export interface Message {
   timestamp?: string;
 }
 
-export interface Conversation {
+export interface ConversationSummary {
   id: string;
   title: string;
   created_at: string;
   updated_at: string;
+}
+
+export interface Conversation extends ConversationSummary {
   messages: Message[];
 }
 
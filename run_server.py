@@ -1,13 +1,56 @@
+import importlib.util
+import os
+import tempfile
 import uvicorn
 from app.core.config import get_settings
 
 settings = get_settings()
 
-if __name__ == "__main__":
+def worker_count() -> int:
+    """Configured WORKERS, or one worker per CPU available to this process."""
+    if settings.WORKERS > 0:
+        return settings.WORKERS
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+def run_development():
     uvicorn.run(
         "app.main:app",
         host=settings.HOST,
         port=settings.PORT,
         reload=True,  # 개발 환경에서 코드 변경 시 자동 재시작
         log_level="debug"
-    ) 
\ No newline at end of file
+    )
+
+def run_production():
+    """Serve with multiple workers, using uvloop and httptools when installed.
+
+    Each worker runs the application lifespan, including warm-up, before it
+    accepts connections. On SIGTERM workers stop accepting connections and
+    let in-flight requests and SSE streams finish for up to
+    GRACEFUL_SHUTDOWN_SECONDS before the rest are cancelled.
+    """
+    workers = worker_count()
+    if workers > 1 and not settings.METRICS_DIR:
+        # Aggregate metrics across workers; a fresh directory per launch has no stale snapshots
+        os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="ai-chat-hub-metrics-")
+    uvicorn.run(
+        "app.main:app",
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=workers,
+        loop="uvloop" if installed("uvloop") else "asyncio",
+        http="httptools" if installed("httptools") else "h11",
+        log_level=settings.LOG_LEVEL,
+        timeout_graceful_shutdown=settings.GRACEFUL_SHUTDOWN_SECONDS
+    )
+
+if __name__ == "__main__":
+    if settings.SERVER_MODE == "production":
+        run_production()
+    else:
+        run_development()
@@ -0,0 +1,75 @@
+"""Throughput benchmark for the batch chat endpoint.
+
+Runs batches against the local fake provider at increasing concurrency
+and reports requests/sec next to the ideal concurrency / latency. No
+external API is called; a throwaway SQLite database is used unless
+DATABASE_URL is set.
+
+    python scripts/bench_batch.py --requests 500 --latency 0.05 --concurrency 1 8 32 64
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def configure(args: argparse.Namespace) -> None:
+    os.environ["LLM_FAKE_PROVIDER"] = "true"
+    os.environ["LLM_FAKE_LATENCY_SECONDS"] = str(args.latency)
+    os.environ["LLM_PREWARM"] = "false"
+    os.environ["METRICS_ENABLED"] = "false"
+    # Measure the batch path itself, not the per-client rate limit
+    os.environ["RATE_LIMIT_PER_MINUTE"] = "1000000"
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+
+async def run(app, requests: int, concurrency: int) -> float:
+    import httpx
+
+    body = {
+        "concurrency": concurrency,
+        "requests": [
+            {"messages": [{"role": "user", "content": f"classify item {i}"}], "model_params": {"model": "fake"}}
+            for i in range(requests)
+        ],
+    }
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        started = time.perf_counter()
+        lines = 0
+        async with client.stream("POST", "/api/v1/chat/fake/batch", json=body, timeout=None) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line:
+                    lines += 1
+        elapsed = time.perf_counter() - started
+    assert lines == requests, f"expected {requests} results, got {lines}"
+    return elapsed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake provider latency in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    args = parser.parse_args()
+    configure(args)
+
+    from app.main import app  # noqa: E402 - settings are read at import
+
+    async with app.router.lifespan_context(app):
+        for concurrency in args.concurrency:
+            # Smaller runs at low concurrency keep the benchmark short
+            requests = min(args.requests, max(concurrency * 20, 20))
+            elapsed = await run(app, requests, concurrency)
+            print(
+                f"concurrency={concurrency:<4} requests={requests:<6} req/s={requests / elapsed:>9,.1f} "
+                f"ideal={concurrency / args.latency:>9,.1f} elapsed={elapsed:.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
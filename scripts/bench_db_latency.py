@@ -0,0 +1,174 @@
+"""Load test: streaming throughput while database queries are slow.
+
+Runs concurrent chat streams against the local fake provider and records
+the gap between chunks. Three scenarios run in turn:
+- quiet: no database load.
+- async: clients hammer a DB-backed endpoint whose queries are slowed by
+  --db-delay through the async engine.
+- sync: the same slow queries are run through the sync engine on the
+  event loop, as the routes did before the async engine.
+
+The server runs in-process on a local port, so the sync scenario blocks
+the loop that serves the streams. No external API is called. A throwaway
+SQLite database is used unless DATABASE_URL is set.
+
+    python scripts/bench_db_latency.py --streams 20 --db-delay 0.05 --db-clients 4
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def configure(args: argparse.Namespace) -> None:
+    os.environ["LLM_FAKE_PROVIDER"] = "true"
+    os.environ["LLM_FAKE_LATENCY_SECONDS"] = "0.01"
+    os.environ["LLM_FAKE_TOKENS_PER_SECOND"] = str(args.tokens_per_second)
+    os.environ["LLM_PREWARM"] = "false"
+    os.environ["SSE_COALESCE_MS"] = "0"
+    os.environ["RATE_LIMIT_PER_MINUTE"] = "1000000"
+    os.environ["LOG_LEVEL"] = "error"
+    # Nothing listens there, so the rate limiter falls back to its local window at once
+    os.environ.setdefault("REDIS_URL", "redis://127.0.0.1:1")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+
+def slow_down_sync(engine, delay: float) -> None:
+    """Sleep before every statement of the sync engine, on the calling thread."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def delay_query(*_):
+        time.sleep(delay)
+
+
+def slow_down_async(delay: float) -> None:
+    """Sleep before every aiosqlite statement, on the driver's worker thread.
+
+    SQLAlchemy engine events run on the event loop for async engines, so
+    the delay is injected into the driver instead.
+    """
+    import aiosqlite.core
+
+    execute = aiosqlite.core.Connection._execute
+
+    async def slow_execute(self, fn, *args, **kwargs):
+        if getattr(fn, "__name__", "") not in ("execute", "executemany"):
+            return await execute(self, fn, *args, **kwargs)
+
+        def slow(*fn_args, **fn_kwargs):
+            time.sleep(delay)
+            return fn(*fn_args, **fn_kwargs)
+        return await execute(self, slow, *args, **kwargs)
+
+    aiosqlite.core.Connection._execute = slow_execute
+
+
+async def stream(client, words: int) -> List[float]:
+    """Gaps between received chunks of one stream, in seconds."""
+    body = {"messages": [{"role": "user", "content": " ".join(["word"] * words)}], "model_params": {"model": "fake"}}
+    gaps, last = [], None
+    async with client.stream("POST", "/api/v1/chat/fake/stream", json=body, timeout=None) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("data:") and '"chunk"' in line:
+                now = time.perf_counter()
+                if last is not None:
+                    gaps.append(now - last)
+                last = now
+    return gaps
+
+
+async def async_db_load(client, headers, stop: asyncio.Event) -> int:
+    requests = 0
+    while not stop.is_set():
+        response = await client.get("/api/v1/conversations", headers=headers)
+        response.raise_for_status()
+        requests += 1
+    return requests
+
+
+async def sync_db_load(stop: asyncio.Event) -> int:
+    from sqlalchemy import text
+    from app.db.session import SessionLocal
+
+    requests = 0
+    while not stop.is_set():
+        with SessionLocal() as db:
+            db.execute(text("SELECT 1"))
+        requests += 1
+        await asyncio.sleep(0)
+    return requests
+
+
+async def scenario(label: str, client, args, load=None) -> None:
+    stop = asyncio.Event()
+    loaders = [asyncio.create_task(load(stop)) for _ in range(args.db_clients)] if load else []
+    started = time.perf_counter()
+    results = await asyncio.gather(*(stream(client, args.words) for _ in range(args.streams)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    queries = sum(await asyncio.gather(*loaders))
+
+    gaps = sorted(gap for result in results for gap in result)
+    p99 = gaps[int(len(gaps) * 0.99) - 1]
+    chunks = sum(len(result) + 1 for result in results)
+    print(
+        f"{label:<6} chunks/s={chunks / elapsed:>8,.0f} gap p50={statistics.median(gaps) * 1000:>6.1f} ms "
+        f"p99={p99 * 1000:>7.1f} ms max={gaps[-1] * 1000:>7.1f} ms db_requests={queries:<5} elapsed={elapsed:.2f}s"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=20)
+    parser.add_argument("--words", type=int, default=50, help="Chunks per stream")
+    parser.add_argument("--tokens-per-second", type=float, default=100.0, help="Fake provider output speed")
+    parser.add_argument("--db-delay", type=float, default=0.05, help="Seconds added to every query")
+    parser.add_argument("--db-clients", type=int, default=4)
+    args = parser.parse_args()
+    configure(args)
+
+    import httpx
+    import uvicorn
+    from app.db.session import engine
+    from app.main import app  # noqa: E402 - settings are read at import
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    # Streaming responses are buffered by in-process transports, so serve over a real socket
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    try:
+        limits = httpx.Limits(max_connections=args.streams + args.db_clients + 4)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+            email = f"{uuid.uuid4().hex}@example.com"
+            await client.post("/api/v1/auth/register", json={"email": email, "password": "bench-password"})
+            token = (await client.post(
+                "/api/v1/auth/token", data={"username": email, "password": "bench-password"}
+            )).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+
+            slow_down_async(args.db_delay)
+            slow_down_sync(engine, args.db_delay)
+            await scenario("quiet", client, args)
+            await scenario("async", client, args, lambda stop: async_db_load(client, headers, stop))
+            await scenario("sync", client, args, sync_db_load)
+    finally:
+        server.should_exit = True
+        await serving
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
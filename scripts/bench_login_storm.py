@@ -0,0 +1,162 @@
+"""Load test: stream latency and login latency during a login storm.
+
+Runs concurrent chat streams against the local fake provider and records
+the gap between chunks while clients log in back to back. Three
+scenarios run in turn:
+- quiet: no logins.
+- pool: logins verify passwords on the bounded hashing pool.
+- inline: bcrypt runs on the event loop, as login did before the pool.
+
+Login latency is reported per scenario, with the number of requests
+turned away with 503 when the hashing queue is full. The server runs
+in-process on a local port; no external API is called. A throwaway
+SQLite database is used unless DATABASE_URL is set. Hashing threads
+compete with the event loop for CPU, so on small machines compare
+--hash-workers values below the core count.
+
+    python scripts/bench_login_storm.py --streams 20 --login-clients 16
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def configure(args: argparse.Namespace) -> None:
+    os.environ["LLM_FAKE_PROVIDER"] = "true"
+    os.environ["LLM_FAKE_LATENCY_SECONDS"] = "0.01"
+    os.environ["LLM_FAKE_TOKENS_PER_SECOND"] = str(args.tokens_per_second)
+    os.environ["LLM_PREWARM"] = "false"
+    os.environ["SSE_COALESCE_MS"] = "0"
+    os.environ["RATE_LIMIT_PER_MINUTE"] = "1000000"
+    os.environ["LOG_LEVEL"] = "error"
+    if args.hash_workers:
+        os.environ["PASSWORD_HASH_WORKERS"] = str(args.hash_workers)
+    # Nothing listens there, so the rate limiter falls back to its local window at once
+    os.environ.setdefault("REDIS_URL", "redis://127.0.0.1:1")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+
+def percentile(samples: List[float], share: float) -> float:
+    ordered = sorted(samples)
+    return ordered[max(int(len(ordered) * share) - 1, 0)]
+
+
+async def stream(client, words: int) -> List[float]:
+    """Gaps between received chunks of one stream, in seconds."""
+    body = {"messages": [{"role": "user", "content": " ".join(["word"] * words)}], "model_params": {"model": "fake"}}
+    gaps, last = [], None
+    async with client.stream("POST", "/api/v1/chat/fake/stream", json=body, timeout=None) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("data:") and '"chunk"' in line:
+                now = time.perf_counter()
+                if last is not None:
+                    gaps.append(now - last)
+                last = now
+    return gaps
+
+
+async def login_load(client, email: str, stop: asyncio.Event) -> Tuple[List[float], int]:
+    """Log in until stopped; returns the latency of successful logins and the 503 count."""
+    latencies, busy = [], 0
+    form = {"username": email, "password": "bench-password"}
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.post("/api/v1/auth/token", data=form, timeout=None)
+        if response.status_code == 503:
+            busy += 1
+            await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+            continue
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+    return latencies, busy
+
+
+async def scenario(label: str, client, args, email: str = None) -> None:
+    stop = asyncio.Event()
+    clients = args.login_clients if email else 0
+    loaders = [asyncio.create_task(login_load(client, email, stop)) for _ in range(clients)]
+    started = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(stream(client, args.words) for _ in range(args.streams)))
+    finally:
+        stop.set()
+        logins = await asyncio.gather(*loaders)
+    elapsed = time.perf_counter() - started
+
+    gaps = [gap for result in results for gap in result]
+    line = (
+        f"{label:<6} stream gap p50={statistics.median(gaps) * 1000:>6.1f} ms "
+        f"p99={percentile(gaps, 0.99) * 1000:>7.1f} ms max={max(gaps) * 1000:>7.1f} ms"
+    )
+    latencies = [latency for result, _ in logins for latency in result]
+    if latencies:
+        line += (
+            f" | logins={len(latencies):<4} ({len(latencies) / elapsed:>5.1f}/s) "
+            f"p50={statistics.median(latencies) * 1000:>6.0f} ms p99={percentile(latencies, 0.99) * 1000:>6.0f} ms "
+            f"503s={sum(busy for _, busy in logins)}"
+        )
+    print(f"{line} elapsed={elapsed:.2f}s")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=20)
+    parser.add_argument("--words", type=int, default=100, help="Chunks per stream")
+    parser.add_argument("--tokens-per-second", type=float, default=100.0, help="Fake provider output speed")
+    parser.add_argument("--login-clients", type=int, default=16, help="Clients logging in back to back")
+    parser.add_argument("--hash-workers", type=int, default=0, help="Hashing pool size; 0 keeps PASSWORD_HASH_WORKERS")
+    args = parser.parse_args()
+    configure(args)
+
+    import httpx
+    import uvicorn
+    from app.api.v1.routes import auth
+    from app.core.security import password_hasher_stats, verify_password
+    from app.main import app  # noqa: E402 - settings are read at import
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    # Streaming responses are buffered by in-process transports, so serve over a real socket
+    # The inline scenario blocks the loop for seconds; keep idle connections open through it
+    server = uvicorn.Server(uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning", timeout_keep_alive=120,
+    ))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    try:
+        limits = httpx.Limits(max_connections=args.streams + args.login_clients + 4)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+            email = f"{uuid.uuid4().hex}@example.com"
+            response = await client.post("/api/v1/auth/register", json={"email": email, "password": "bench-password"})
+            response.raise_for_status()
+            print(f"hashing pool: {password_hasher_stats()}")
+
+            await scenario("quiet", client, args)
+            await scenario("pool", client, args, email)
+
+            async def verify_inline(plain_password: str, hashed_password: str) -> bool:
+                return verify_password(plain_password, hashed_password)
+            pooled, auth.verify_password_async = auth.verify_password_async, verify_inline
+            try:
+                await scenario("inline", client, args, email)
+            finally:
+                auth.verify_password_async = pooled
+    finally:
+        server.should_exit = True
+        await serving
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+"""Microbenchmark for the SSE writer.
+
+Feeds synthetic token deltas through SSEWriter with and without
+coalescing and reports frames/sec and bytes/sec.
+
+    python scripts/bench_sse.py --events 200000 --delta-chars 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.sse import SSEWriter  # noqa: E402
+
+
+async def deltas(count: int, text: str, interval: float):
+    for seq in range(1, count + 1):
+        yield f"bench:{seq}", {"chunk": text}
+        if interval:
+            await asyncio.sleep(interval)
+        elif seq % 64 == 0:
+            # Let the writer's queue consumer run, as a real network source would
+            await asyncio.sleep(0)
+
+
+async def run(label: str, writer: SSEWriter, count: int, text: str, interval: float) -> None:
+    started = time.perf_counter()
+    async for _ in writer.stream(deltas(count, text, interval)):
+        pass
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label:<22} events={writer.events:<8} frames={writer.frames:<8} "
+        f"frames/s={writer.frames / elapsed:>12,.0f} bytes/s={writer.bytes / elapsed:>14,.0f} "
+        f"elapsed={elapsed:.3f}s"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--delta-chars", type=int, default=4)
+    parser.add_argument("--interval", type=float, default=0.0, help="Seconds between deltas")
+    args = parser.parse_args()
+
+    text = "x" * args.delta_chars
+    await run("no coalescing", SSEWriter(0, 0, 0), args.events, text, args.interval)
+    await run("15ms / 512B window", SSEWriter(0.015, 512, 0), args.events, text, args.interval)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
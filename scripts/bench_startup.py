@@ -0,0 +1,107 @@
+"""Startup benchmark: import time of the application and time to first request.
+
+Runs `python -X importtime -c "import app.main"` and reports the total
+import time with the packages that contribute most, then starts uvicorn
+repeatedly and measures the time from spawning the process until the
+first request succeeds. A throwaway SQLite database is used unless
+DATABASE_URL is set.
+
+    python scripts/bench_startup.py --runs 5 --env LLM_PREWARM=false
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def environment(args: argparse.Namespace) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    for assignment in args.env:
+        key, _, value = assignment.partition("=")
+        env[key] = value
+    return env
+
+
+def import_times(env: Dict[str, str]) -> Tuple[float, List[Tuple[str, float]]]:
+    """Total import time of app.main and self time per top-level package, in milliseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    total = 0.0
+    packages: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + int(self_us) / 1000
+        if name == "app.main":
+            total = int(cumulative_us) / 1000
+    return total, sorted(packages.items(), key=lambda item: item[1], reverse=True)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_request(env: Dict[str, str], timeout: float) -> float:
+    """Seconds from spawning uvicorn until GET / succeeds."""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with status {server.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"server did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Packages to list by import time")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the server, e.g. OPENAI_API_KEY=sk-test")
+    args = parser.parse_args()
+    env = environment(args)
+
+    total, packages = import_times(env)
+    print(f"import app.main: {total:,.1f} ms")
+    for package, self_ms in packages[:args.top]:
+        print(f"  {package:<24} {self_ms:>9,.1f} ms")
+
+    samples = [time_to_first_request(env, args.timeout) for _ in range(args.runs)]
+    print(
+        f"time to first request: median={statistics.median(samples) * 1000:,.0f} ms "
+        f"min={min(samples) * 1000:,.0f} ms max={max(samples) * 1000:,.0f} ms runs={args.runs}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import tempfile
+import uuid
+
+# Settings are read at import time, so configure the environment before importing the app
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test.db"
+os.environ["LLM_PREWARM"] = "false"
+os.environ["LLM_FAKE_PROVIDER"] = "true"
+os.environ["LLM_FAKE_LATENCY_SECONDS"] = "0.01"
+os.environ["RATE_LIMIT_PER_MINUTE"] = "1000000"
+os.environ["LOG_LEVEL"] = "warning"
+# Nothing listens there, so Redis-backed features fall back to their local versions at once
+os.environ["REDIS_URL"] = "redis://127.0.0.1:1"
+for key in ("OPENAI_API_KEY", "ANTHROPIC_API_KEY", "GOOGLE_API_KEY"):
+    os.environ[key] = ""
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def client():
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def auth_headers(client):
+    """Authorization header of a freshly registered user."""
+    email = f"{uuid.uuid4().hex}@example.com"
+    response = client.post("/api/v1/auth/register", json={"email": email, "password": "secret-password"})
+    assert response.status_code == 200, response.text
+    response = client.post("/api/v1/auth/token", data={"username": email, "password": "secret-password"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class RecordingProvider:
+    """Fake provider that counts upstream calls and records cancellations."""
+
+    def __init__(self, latency_seconds: float = 0.05, tokens_per_second: float = 0.0, error: Exception = None):
+        from app.llm.fake_provider import FakeProvider
+
+        self.fake = FakeProvider(latency_seconds, tokens_per_second)
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate_response(self, messages, model_params):
+        self.calls += 1
+        try:
+            reply = await self.fake.generate_response(messages, model_params)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return reply
+
+    async def stream_response(self, messages, model_params):
+        self.calls += 1
+        try:
+            async for chunk in self.fake.stream_response(messages, model_params):
+                yield chunk
+        except (asyncio.CancelledError, GeneratorExit):
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+
+
+@pytest.fixture
+def recording_provider():
+    """Factory of fake providers that count their upstream calls."""
+    return RecordingProvider
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from app.core.config import Settings
+from app.llm.admission import PRIORITIES, AdmissionController, AdmissionLane, AdmissionRejected
+from app.llm.messages import ChatMessage
+
+MESSAGES = [ChatMessage("user", "hi")]
+
+
+def controller(**overrides) -> AdmissionController:
+    return AdmissionController(Settings(ADMISSION_QUEUE_TIMEOUT_SECONDS=0.05, **overrides))
+
+
+def test_models_map_to_catalog_lanes():
+    admission = controller(ADMISSION_LIMITS={"openai:ft-custom": {"concurrency": 2}})
+
+    assert admission.lane("openai", "gpt-4o-2024-08-06") is admission.lane("openai", "gpt-4o")
+    assert admission.lane("openai", "gpt-4o").name == "openai:gpt-4o"
+    assert admission.lane("openai", "ft-custom").concurrency == 2
+    # A model of another provider, or none at all, falls back to the provider's shared lane
+    assert admission.lane("openai", "claude-3-haiku-20240307").name == "openai:other"
+    assert admission.lane("openai", None).name == "openai:other"
+
+
+@pytest.mark.anyio
+async def test_arbitrary_model_names_do_not_grow_the_lanes():
+    admission = controller()
+
+    for i in range(100):
+        lease = await admission.acquire("openai", MESSAGES, {"model": f"made-up-{i}"})
+        lease.release()
+
+    assert set(admission.stats()) == {"openai", "openai:other"}
+
+
+@pytest.mark.anyio
+async def test_provider_cap_applies_across_models():
+    admission = controller(ADMISSION_PROVIDER_LIMITS={"openai": {"concurrency": 1}})
+
+    first = await admission.acquire("openai", MESSAGES, {"model": "gpt-4o"})
+    with pytest.raises(AdmissionRejected) as rejected:
+        await admission.acquire("openai", MESSAGES, {"model": "gpt-4o-mini"})
+    assert rejected.value.lane == "openai"
+    # The rejected request gave its model slot back
+    assert admission.lane("openai", "gpt-4o-mini").in_flight == 0
+
+    waiting = asyncio.ensure_future(admission.acquire("openai", MESSAGES, {"model": "gpt-4o-mini"}))
+    await asyncio.sleep(0.01)
+    first.release()
+    second = await waiting
+    assert admission.provider_lane("openai").in_flight == 1
+    second.release()
+    assert admission.provider_lane("openai").in_flight == 0
+
+
+@pytest.mark.anyio
+async def test_waiters_move_up_when_the_blocked_head_leaves():
+    lane = AdmissionLane("test", concurrency=10, rpm=0, tpm=600, max_queue=10)
+    await lane.acquire(600, PRIORITIES["interactive"], 1)  # empties the token bucket
+
+    # The head needs a full minute of tokens; the request behind it only needs one
+    head = asyncio.ensure_future(lane.acquire(600, PRIORITIES["interactive"], 0.05))
+    await asyncio.sleep(0)
+    behind = asyncio.ensure_future(lane.acquire(1, PRIORITIES["batch"], 5))
+
+    with pytest.raises(AdmissionRejected):
+        await head
+    await asyncio.wait_for(behind, 1)
+    assert lane.in_flight == 2
+
+
+@pytest.mark.anyio
+async def test_provider_rejection_returns_the_model_lane_tokens():
+    admission = controller(
+        ADMISSION_TOKENS_PER_MINUTE=100000,
+        ADMISSION_REQUESTS_PER_MINUTE=100,
+        ADMISSION_PROVIDER_LIMITS={"openai": {"concurrency": 1}},
+    )
+    first = await admission.acquire("openai", MESSAGES, {"model": "gpt-4o", "max_tokens": 1000})
+    lane = admission.lane("openai", "gpt-4o-mini")
+    tokens, requests = lane.tokens.tokens, lane.requests.tokens
+
+    with pytest.raises(AdmissionRejected):
+        await admission.acquire("openai", MESSAGES, {"model": "gpt-4o-mini", "max_tokens": 1000})
+
+    assert lane.tokens.tokens == pytest.approx(tokens, abs=5)
+    assert lane.requests.tokens == pytest.approx(requests, abs=0.1)
+    assert lane.in_flight == 0 and lane.admitted == 0
+    first.release()
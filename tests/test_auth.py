@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import uuid
+
+import pytest
+from jose import jwt
+
+from app.core import security
+from app.core.config import get_settings
+from app.core.user_cache import user_cache
+from app.db import models
+from app.db.repositories import UserRepository
+
+settings = get_settings()
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    """Records the emails looked up in the database."""
+    lookups = []
+    get_by_email = UserRepository.get_by_email
+
+    async def recording_get_by_email(self, email):
+        lookups.append(email)
+        return await get_by_email(self, email)
+
+    monkeypatch.setattr(UserRepository, "get_by_email", recording_get_by_email)
+    return lookups
+
+
+def register(client, name=None):
+    email = f"{uuid.uuid4().hex}@example.com"
+    body = {"email": email, "password": "secret-password", "name": name}
+    assert client.post("/api/v1/auth/register", json=body).status_code == 200
+    token = client.post("/api/v1/auth/token", data={"username": email, "password": "secret-password"}).json()
+    return email, {"Authorization": f"Bearer {token['access_token']}"}
+
+
+def test_tokens_embed_identity_claims(client):
+    _, headers = register(client)
+    payload = jwt.decode(headers["Authorization"].split()[1], settings.SECRET_KEY, algorithms=["HS256"])
+
+    assert isinstance(payload["uid"], int)
+    assert payload["role"] == models.UserRole.USER.value
+
+
+def test_claims_skip_the_user_lookup(client, lookups):
+    _, headers = register(client)
+    lookups.clear()
+
+    assert client.post("/api/v1/conversations?title=t", headers=headers).status_code == 200
+    assert client.get("/api/v1/auth/me/usage", headers=headers).status_code == 200
+    assert lookups == []
+
+
+def test_profile_is_served_from_the_user_cache(client, lookups):
+    email, headers = register(client, name="Before")
+    user_cache.pop(email)
+    lookups.clear()
+
+    assert client.get("/api/v1/auth/me", headers=headers).json()["name"] == "Before"
+    assert client.get("/api/v1/auth/me", headers=headers).json()["name"] == "Before"
+    assert lookups == [email]
+
+
+def test_user_updates_invalidate_the_cache(client):
+    from app.db.session import AsyncSessionLocal
+
+    email, headers = register(client, name="Before")
+    assert client.get("/api/v1/auth/me", headers=headers).json()["name"] == "Before"
+
+    async def rename():
+        async with AsyncSessionLocal() as db:
+            user = await UserRepository(db).get_by_email(email)
+            user.name = "After"
+            await db.commit()
+    client.portal.call(rename)
+
+    assert client.get("/api/v1/auth/me", headers=headers).json()["name"] == "After"
+
+
+def test_claims_with_an_unknown_role_are_rejected(client):
+    token = jwt.encode({"sub": "x@example.com", "uid": 1, "role": "root"}, settings.SECRET_KEY, algorithm="HS256")
+    response = client.get("/api/v1/auth/me/usage", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+
+def test_login_returns_503_when_the_hashing_queue_is_full(client, monkeypatch):
+    email, _ = register(client)
+    monkeypatch.setattr(security, "_hash_pending", settings.PASSWORD_HASH_MAX_PENDING)
+
+    response = client.post("/api/v1/auth/token", data={"username": email, "password": "secret-password"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(settings.PASSWORD_HASH_RETRY_AFTER)
+
+
+@pytest.mark.anyio
+async def test_passwords_are_verified_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def verify(plain_password, hashed_password):
+        threads.append(threading.current_thread())
+        return True
+
+    monkeypatch.setattr(security, "verify_password", verify)
+
+    assert await security.verify_password_async("secret", "hash")
+    assert threads and threads[0] is not threading.current_thread()
+    assert security.password_hasher_stats()["pending"] == 0
+
+
+@pytest.mark.anyio
+async def test_cancelled_callers_keep_counting_until_the_hash_ends(monkeypatch):
+    started, finish = threading.Event(), threading.Event()
+
+    def verify(plain_password, hashed_password):
+        started.set()
+        finish.wait(5)
+        return True
+
+    monkeypatch.setattr(security, "verify_password", verify)
+    caller = asyncio.ensure_future(security.verify_password_async("secret", "hash"))
+    while not started.is_set():
+        await asyncio.sleep(0.01)
+    caller.cancel()
+    await asyncio.sleep(0.01)
+
+    # The caller is gone, but bcrypt still occupies a pool thread
+    assert security.password_hasher_stats()["pending"] == 1
+    finish.set()
+    for _ in range(100):
+        if security.password_hasher_stats()["pending"] == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert security.password_hasher_stats()["pending"] == 0
@@ -0,0 +1,107 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select, update
+
+from app.core.config import Settings
+from app.db import models
+from app.db.session import AsyncSessionLocal
+from app.llm.batch import BatchJobManager
+
+REQUESTS = [{"messages": [{"role": "user", "content": f"request {i}"}]} for i in range(4)]
+
+
+class Runner:
+    """Answers each request after a delay and records which ones ran."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.ran = []
+
+    async def __call__(self, provider, request, priority):
+        await asyncio.sleep(self.delay)
+        self.ran.append(request["messages"][0]["content"])
+        return {"status": 200, "message": "ok"}
+
+
+def manager(runner, flush_seconds=0.05, lease_seconds=60.0) -> BatchJobManager:
+    settings = Settings(BATCH_JOB_FLUSH_SECONDS=flush_seconds, BATCH_JOB_LEASE_SECONDS=lease_seconds)
+    return BatchJobManager(settings, runner)
+
+
+async def wait_until_finished(jobs: BatchJobManager, job_id: str, timeout: float = 5.0) -> models.BatchJob:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        job = await jobs.get(job_id)
+        if job.status != "running" or asyncio.get_running_loop().time() > deadline:
+            return job
+        await asyncio.sleep(0.02)
+
+
+async def stored_indexes(jobs: BatchJobManager, job_id: str):
+    return sorted(result.index for result in await jobs.results(job_id))
+
+
+@pytest.mark.anyio
+async def test_job_completes_with_every_result(client):
+    jobs = manager(Runner(0.01))
+
+    job = await jobs.submit("fake", REQUESTS, concurrency=2)
+    job = await wait_until_finished(jobs, job.id)
+
+    assert job.status == "completed"
+    assert job.completed == len(REQUESTS) and job.failed == 0
+    assert await stored_indexes(jobs, job.id) == [0, 1, 2, 3]
+
+
+@pytest.mark.anyio
+async def test_results_finishing_during_a_write_are_kept(client):
+    runner = Runner(0.08)
+    jobs = manager(runner, flush_seconds=0.1)
+    write = jobs._write
+
+    async def slow_write(*args, **kwargs):
+        # The last result arrives while the first progress write is in flight
+        await asyncio.sleep(0.1)
+        return await write(*args, **kwargs)
+
+    jobs._write = slow_write
+    job = await jobs.submit("fake", REQUESTS[:2], concurrency=1)
+    job = await wait_until_finished(jobs, job.id)
+
+    assert job.status == "completed"
+    assert job.completed == 2
+    assert await stored_indexes(jobs, job.id) == [0, 1]
+
+
+@pytest.mark.anyio
+async def test_job_resumes_on_another_worker_after_a_lost_lease(client):
+    stalled = Runner(10)
+    first = manager(stalled, flush_seconds=0.3, lease_seconds=0.2)
+    job = await first.submit("fake", REQUESTS, concurrency=1)
+
+    # The first worker stalls; one result was stored before it did
+    async with AsyncSessionLocal() as db:
+        db.add(models.BatchResult(job_id=job.id, index=0, status=200, message="ok"))
+        await db.execute(
+            update(models.BatchJob)
+            .where(models.BatchJob.id == job.id)
+            .values(completed=1, updated_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+        )
+        await db.commit()
+
+    second_runner = Runner(0.01)
+    second = manager(second_runner, lease_seconds=0.2)
+    await second._claim_abandoned()
+    job = await wait_until_finished(second, job.id)
+
+    assert job.status == "completed" and job.worker_id == second.worker_id
+    assert job.completed == len(REQUESTS)
+    assert sorted(second_runner.ran) == ["request 1", "request 2", "request 3"]
+    assert await stored_indexes(second, job.id) == [0, 1, 2, 3]
+    # The first worker's next progress write finds the job taken over, so it stops
+    await asyncio.sleep(0.4)
+    assert job.id not in first._jobs
+    await first.stop()
@@ -0,0 +1,199 @@
+import asyncio
+import json
+
+import fakeredis
+import pytest
+
+from app.llm.broker import InProcessBroker, RedisStreamBroker, StreamPublisher
+from app.llm.messages import ChatMessage
+
+
+@pytest.fixture
+def redis_broker():
+    return RedisStreamBroker(fakeredis.FakeAsyncRedis(), retention=60, block_ms=50)
+
+
+async def collect(broker, stream_id, after=0):
+    return [(event.seq, event.payload) async for event in broker.subscribe(stream_id, after)]
+
+
+@pytest.mark.anyio
+async def test_redis_subscriber_reads_until_the_stream_completes(redis_broker):
+    await redis_broker.open("s1")
+    subscriber = asyncio.ensure_future(collect(redis_broker, "s1"))
+    await asyncio.sleep(0.1)
+    await redis_broker.publish("s1", {"chunk": "a"})
+    await redis_broker.publish("s1", {"chunk": "b"})
+    await redis_broker.close("s1")
+
+    assert await asyncio.wait_for(subscriber, 1) == [(1, {"chunk": "a"}), (2, {"chunk": "b"})]
+    assert await collect(redis_broker, "s1", after=1) == [(2, {"chunk": "b"})]
+
+
+@pytest.mark.anyio
+async def test_redis_subscriber_ends_when_the_stream_is_gone(redis_broker):
+    events = await asyncio.wait_for(collect(redis_broker, "missing"), 1)
+
+    assert events == [(1, {"error": RedisStreamBroker.EXPIRED})]
+
+
+@pytest.mark.anyio
+async def test_redis_subscriber_ends_when_the_stream_expires_mid_generation(redis_broker):
+    await redis_broker.open("s2")
+    await redis_broker.publish("s2", {"chunk": "a"})
+    subscriber = asyncio.ensure_future(collect(redis_broker, "s2"))
+    await asyncio.sleep(0.1)
+    # The producer died and retention ran out
+    await redis_broker.redis.delete(redis_broker._key("s2"), redis_broker._producer_key("s2"))
+
+    assert await asyncio.wait_for(subscriber, 1) == [
+        (1, {"chunk": "a"}),
+        (2, {"error": RedisStreamBroker.EXPIRED}),
+    ]
+
+
+@pytest.mark.anyio
+async def test_redis_subscriber_waits_for_a_slow_first_event(redis_broker):
+    await redis_broker.open("s3")
+    subscriber = asyncio.ensure_future(collect(redis_broker, "s3"))
+    # Several XREAD timeouts pass before the producer publishes
+    await asyncio.sleep(0.2)
+    await redis_broker.publish("s3", {"chunk": "late"})
+    await redis_broker.close("s3")
+
+    assert await asyncio.wait_for(subscriber, 1) == [(1, {"chunk": "late"})]
+
+
+@pytest.mark.anyio
+async def test_in_process_subscriber_ends_when_the_stream_is_unknown():
+    broker = InProcessBroker(retention=60)
+
+    events = await asyncio.wait_for(collect(broker, "missing", after=3), 1)
+
+    assert events == [(4, {"error": InProcessBroker.EXPIRED})]
+    assert not await broker.exists("missing")
+
+
+@pytest.mark.anyio
+async def test_in_process_subscriber_ends_when_the_stream_expires_before_it_subscribes():
+    broker = InProcessBroker(retention=0)
+    await broker.open("s4")
+    await broker.publish("s4", {"chunk": "a"})
+    assert await broker.exists("s4")
+    await broker.close("s4")
+    # Retention runs out between the route's exists() check and subscribe()
+    await asyncio.sleep(0.01)
+
+    events = await asyncio.wait_for(collect(broker, "s4", after=1), 1)
+
+    assert events == [(2, {"error": InProcessBroker.EXPIRED})]
+    assert not await broker.exists("s4")
+
+
+MESSAGES = [ChatMessage("user", " ".join(f"word{i}" for i in range(50)))]
+
+
+async def read_one_and_leave(publisher, stream_id, after=0):
+    subscription = publisher.subscribe(stream_id, after)
+    event = await subscription.__anext__()
+    await subscription.aclose()
+    return event
+
+
+@pytest.mark.anyio
+async def test_disconnected_generation_is_cancelled_after_the_grace_period(recording_provider):
+    provider = recording_provider(latency_seconds=0, tokens_per_second=20)
+    publisher = StreamPublisher(InProcessBroker(retention=60), disconnect_grace=0.05)
+
+    stream_id = publisher.start(provider.stream_response(MESSAGES, {"model": "fake"}))
+    await read_one_and_leave(publisher, stream_id)
+    await asyncio.sleep(0.3)
+
+    assert provider.cancelled == 1
+    assert publisher.cancelled == 1 and publisher.active == 0
+
+
+@pytest.mark.anyio
+async def test_subscriber_before_the_generation_starts_reads_it(recording_provider):
+    provider = recording_provider(latency_seconds=0)
+    publisher = StreamPublisher(InProcessBroker(retention=60))
+
+    stream_id = publisher.start(provider.stream_response([ChatMessage("user", "a b")], {"model": "fake"}))
+    # Subscribe in this task, before the generation task has had a chance to run
+    events = await collect(publisher, stream_id)
+
+    assert [event[1] for event in events] == [{"chunk": "a "}, {"chunk": "b "}]
+
+
+@pytest.mark.anyio
+async def test_resume_on_another_worker_keeps_the_generation_running(recording_provider):
+    server = fakeredis.FakeServer()
+    producer = StreamPublisher(
+        RedisStreamBroker(fakeredis.FakeAsyncRedis(server=server), retention=60, block_ms=50),
+        disconnect_grace=0.1,
+    )
+    other_worker = StreamPublisher(
+        RedisStreamBroker(fakeredis.FakeAsyncRedis(server=server), retention=60, block_ms=50),
+        disconnect_grace=0.1,
+    )
+    provider = recording_provider(latency_seconds=0, tokens_per_second=20)
+
+    stream_id = producer.start(provider.stream_response(MESSAGES, {"model": "fake"}))
+    first = await read_one_and_leave(producer, stream_id)
+    resumed = other_worker.subscribe(stream_id, first.seq)
+    # Read on the other worker for several grace periods
+    for _ in range(10):
+        await resumed.__anext__()
+    assert provider.cancelled == 0 and producer.active == 1
+
+    await resumed.aclose()
+    await asyncio.sleep(0.5)
+    assert provider.cancelled == 1 and producer.active == 0
+    await producer.aclose()
+    await other_worker.aclose()
+
+
+def test_client_disconnect_cancels_the_upstream_call(client, recording_provider, monkeypatch):
+    provider = recording_provider(latency_seconds=0, tokens_per_second=20)
+    monkeypatch.setattr(client.app.state.providers.get("fake"), "provider", provider)
+    monkeypatch.setattr(client.app.state.streams, "disconnect_grace", 0.05)
+    body = json.dumps({"messages": [message.to_dict() for message in MESSAGES], "model_params": {"model": "fake"}})
+
+    async def request_and_disconnect():
+        received_chunk = asyncio.Event()
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body.encode(), "more_body": False}
+            await received_chunk.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and b'"chunk"' in message.get("body", b""):
+                received_chunk.set()
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/api/v1/chat/fake/stream",
+            "raw_path": b"/api/v1/chat/fake/stream",
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"host", b"testserver"), (b"content-type", b"application/json")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        await client.app(scope, receive, send)
+        await asyncio.sleep(0.3)
+
+    client.portal.call(request_and_disconnect)
+
+    assert provider.calls == 1
+    assert provider.cancelled == 1
+    assert client.app.state.streams.active == 0
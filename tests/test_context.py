@@ -0,0 +1,77 @@
+from typing import Any, Dict, List
+
+import pytest
+
+from app.llm.context import SummarizeOlderStrategy, TokenCounter
+from app.llm.messages import ChatMessage
+
+
+class SummaryProvider:
+    """Records summarization requests and answers with a numbered summary."""
+
+    def __init__(self):
+        self.prompts: List[str] = []
+
+    async def generate_response(self, messages: List[ChatMessage], model_params: Dict[str, Any]) -> str:
+        self.prompts.append(messages[-1].content)
+        return f"summary {len(self.prompts)}"
+
+
+def turns(count: int) -> List[ChatMessage]:
+    return [ChatMessage("user" if i % 2 == 0 else "assistant", f"turn {i}") for i in range(count)]
+
+
+@pytest.mark.anyio
+async def test_summary_is_reused_until_the_next_chunk():
+    strategy = SummarizeOlderStrategy(keep_last=4, chunk_turns=5)
+    provider = SummaryProvider()
+    counter = TokenCounter()
+    params = {"model": "gpt-4o"}
+
+    for count in range(1, 20):
+        fitted = await strategy.apply(turns(count), 100000, counter, provider, params)
+        if count >= 9:
+            assert fitted[0].content.startswith("Summary of the earlier conversation")
+
+    # Summarized boundaries moved to 5, 10 and 15 turns
+    assert len(provider.prompts) == 3
+    # Each later summary only sends the turns since the previous boundary
+    assert "turn 4" not in provider.prompts[1] and "turn 5" in provider.prompts[1]
+    assert "Summary so far:\nsummary 1" in provider.prompts[1]
+
+
+@pytest.mark.anyio
+async def test_recent_turns_are_kept_verbatim():
+    strategy = SummarizeOlderStrategy(keep_last=4, chunk_turns=5)
+    messages = [ChatMessage("system", "Be brief.")] + turns(13)
+
+    fitted = await strategy.apply(messages, 100000, TokenCounter(), SummaryProvider(), {"model": "gpt-4o"})
+
+    # 9 turns are older than the last 4; the first 5 of them fill a chunk
+    assert fitted[0].content == "Be brief."
+    assert fitted[2:] == messages[6:]
+
+
+def test_token_estimate_counts_utf8_bytes():
+    counter = TokenCounter()
+
+    assert counter.estimate("abcd" * 10) == 10
+    assert counter.estimate("안녕") == 2
+    assert counter.count([ChatMessage("user", "abcd")]) == 5
+
+
+def test_message_counts_are_cached_by_digest(monkeypatch):
+    counter = TokenCounter(max_entries=2)
+    estimated = []
+    estimate = counter.estimate
+    monkeypatch.setattr(counter, "estimate", lambda text: estimated.append(text) or estimate(text))
+
+    # Each request rebuilds its messages; an unchanged history is not counted again
+    for _ in range(3):
+        counter.count([ChatMessage("user", "안녕하세요"), ChatMessage("assistant", "hello")])
+    assert estimated == ["안녕하세요", "hello"]
+
+    counter.count_message(ChatMessage("user", "new"))
+    assert len(counter._cache) == 2
+    counter.count_message(ChatMessage("user", "안녕하세요"))
+    assert estimated[-1] == "안녕하세요"
@@ -0,0 +1,74 @@
+import uuid
+
+from sqlalchemy import func, select
+
+from app.db import models
+from app.db.session import AsyncSessionLocal
+
+
+def test_list_omits_messages_by_default(client, auth_headers):
+    conversation = client.post("/api/v1/conversations?title=First", headers=auth_headers).json()
+    client.post(
+        f"/api/v1/conversations/{conversation['id']}/messages",
+        json={"role": "user", "content": "hello"},
+        headers=auth_headers,
+    )
+
+    listed = client.get("/api/v1/conversations", headers=auth_headers).json()
+    assert [item["id"] for item in listed] == [conversation["id"]]
+    assert "messages" not in listed[0]
+
+    full = client.get("/api/v1/conversations?include_messages=true", headers=auth_headers).json()
+    assert [message["content"] for message in full[0]["messages"]] == ["hello"]
+
+    single = client.get(f"/api/v1/conversations/{conversation['id']}", headers=auth_headers).json()
+    assert [message["content"] for message in single["messages"]] == ["hello"]
+
+
+def test_list_pages_with_cursor(client, auth_headers):
+    ids = [
+        client.post(f"/api/v1/conversations?title=c{i}", headers=auth_headers).json()["id"]
+        for i in range(3)
+    ]
+    first = client.get("/api/v1/conversations?limit=2", headers=auth_headers)
+    cursor = first.headers["X-Next-Cursor"]
+    second = client.get(f"/api/v1/conversations?limit=2&cursor={cursor}", headers=auth_headers)
+    listed = [item["id"] for item in first.json() + second.json()]
+    assert sorted(listed) == sorted(ids)
+    assert "X-Next-Cursor" not in second.headers
+
+
+def register(client):
+    email = f"{uuid.uuid4().hex}@example.com"
+    client.post("/api/v1/auth/register", json={"email": email, "password": "secret-password"})
+    token = client.post("/api/v1/auth/token", data={"username": email, "password": "secret-password"}).json()
+    return {"Authorization": f"Bearer {token['access_token']}"}
+
+
+def test_conversations_are_private_to_their_owner(client, auth_headers):
+    conversation = client.post("/api/v1/conversations?title=Mine", headers=auth_headers).json()
+    other = register(client)
+
+    assert client.get(f"/api/v1/conversations/{conversation['id']}", headers=other).status_code == 403
+    assert client.delete(f"/api/v1/conversations/{conversation['id']}", headers=other).status_code == 403
+    assert client.get("/api/v1/conversations", headers=other).json() == []
+
+
+def test_deleting_a_conversation_removes_its_messages(client, auth_headers):
+    conversation = client.post("/api/v1/conversations?title=Gone", headers=auth_headers).json()
+    client.post(
+        f"/api/v1/conversations/{conversation['id']}/messages",
+        json={"role": "user", "content": "hello"},
+        headers=auth_headers,
+    )
+
+    assert client.delete(f"/api/v1/conversations/{conversation['id']}", headers=auth_headers).status_code == 200
+    assert client.get(f"/api/v1/conversations/{conversation['id']}", headers=auth_headers).status_code == 404
+
+    async def count_messages():
+        async with AsyncSessionLocal() as db:
+            query = select(func.count()).select_from(models.Message).where(
+                models.Message.conversation_id == conversation["id"]
+            )
+            return await db.scalar(query)
+    assert client.portal.call(count_messages) == 0
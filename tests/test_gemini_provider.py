@@ -0,0 +1,111 @@
+from types import SimpleNamespace
+
+import google.generativeai as genai
+import pytest
+
+from app.llm.gemini_provider import GeminiProvider
+from app.llm.messages import ChatMessage, gemini_encoder
+from app.llm.prompt_cache import PromptMessages
+
+
+class FakeStream:
+    def __init__(self, texts):
+        self.texts = texts
+
+    async def __aiter__(self):
+        usage = SimpleNamespace(prompt_token_count=3, candidates_token_count=2)
+        for text in self.texts:
+            yield SimpleNamespace(text=text, usage_metadata=usage)
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Records generate_content_async calls instead of calling the API."""
+    calls = []
+
+    async def generate_content_async(self, contents, generation_config=None, stream=False):
+        calls.append({"model": self.model_name, "contents": contents, "generation_config": generation_config})
+        if stream:
+            return FakeStream(["hel", "lo"])
+        usage = SimpleNamespace(prompt_token_count=3, candidates_token_count=2)
+        return SimpleNamespace(text="hello", usage_metadata=usage)
+
+    monkeypatch.setattr(genai.GenerativeModel, "generate_content_async", generate_content_async)
+    return calls
+
+
+def history(turns):
+    """A system prompt followed by alternating user/assistant turns, ending with a user turn."""
+    messages = [{"role": "system", "content": "Be brief."}]
+    for i in range(turns):
+        messages.append({"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i}"})
+    if messages[-1]["role"] != "user":
+        messages.append({"role": "user", "content": "last"})
+    return messages
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("turns", [1, 5, 50])
+async def test_generate_response_calls_the_api_once(calls, turns):
+    provider = GeminiProvider(api_key="test")
+
+    assert await provider.generate_response(history(turns), {"model": "gemini-1.5-flash"}) == "hello"
+
+    assert len(calls) == 1
+    assert calls[0]["model"] == "models/gemini-1.5-flash"
+    # The whole history goes in that one call, system prompt folded into the first user turn
+    assert calls[0]["contents"][0]["parts"][0].startswith("Be brief.")
+    assert calls[0]["contents"][-1]["role"] == "user"
+    assert [content["role"] for content in calls[0]["contents"]] == [
+        "user" if i % 2 == 0 else "model" for i in range(len(calls[0]["contents"]))
+    ]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("turns", [1, 5, 50])
+async def test_stream_response_calls_the_api_once(calls, turns):
+    provider = GeminiProvider(api_key="test")
+
+    chunks = [chunk async for chunk in provider.stream_response(history(turns), {"model": "gemini-1.5-flash"})]
+
+    assert chunks == ["hel", "lo"]
+    assert len(calls) == 1
+    assert calls[0]["contents"][-1]["role"] == "user"
+
+
+@pytest.mark.anyio
+async def test_generation_config_maps_model_params(calls):
+    provider = GeminiProvider(api_key="test")
+    model_params = {
+        "temperature": 0.2,
+        "max_tokens": 64,
+        "top_p": 0.9,
+        "top_k": 40,
+        "stop": "END",
+        "presence_penalty": 1.0,
+    }
+
+    await provider.generate_response([{"role": "user", "content": "Hi"}], model_params)
+
+    assert calls[0]["generation_config"] == {
+        "temperature": 0.2,
+        "max_output_tokens": 64,
+        "top_p": 0.9,
+        "top_k": 40,
+        "stop_sequences": ["END"],
+    }
+
+
+def test_generation_config_skips_unset_params():
+    assert GeminiProvider._build_generation_config({"temperature": None, "stop": ["a", "b"]}) == {
+        "stop_sequences": ["a", "b"],
+    }
+
+
+@pytest.mark.anyio
+async def test_marked_prefix_is_sent_with_the_conversation(calls):
+    messages = PromptMessages([ChatMessage(**message) for message in history(5)], cache_prefix=3)
+
+    await GeminiProvider(api_key="test").generate_response(messages, {"model": "gemini-1.5-flash"})
+
+    assert calls[0]["contents"] == gemini_encoder.encode(messages)
@@ -0,0 +1,65 @@
+import pytest
+
+from app.core.config import Settings
+from app.llm.registry import ProviderRegistry
+
+
+@pytest.fixture
+def registry():
+    return ProviderRegistry(Settings(LLM_FAKE_PROVIDER=True, PROVIDER_HEALTH_TTL_SECONDS=60))
+
+
+@pytest.mark.anyio
+async def test_probe_results_are_cached(registry, monkeypatch):
+    probes = []
+
+    async def validate_credentials():
+        probes.append(1)
+        return False
+
+    monkeypatch.setattr(registry.get("fake"), "validate_credentials", validate_credentials)
+    assert registry.health.is_available("fake")
+
+    await registry.health.probe("fake")
+
+    assert registry.health.get("fake").healthy is False
+    assert registry.health.get("fake").error == "Invalid credentials"
+    assert not registry.health.is_available("fake")
+    assert probes == [1]
+
+
+@pytest.mark.anyio
+async def test_expired_results_are_unknown(registry):
+    await registry.health.probe("fake")
+    assert registry.health.get("fake").healthy is True
+
+    registry.health.ttl = 0
+    assert registry.health.get("fake").healthy is None
+    assert registry.health.is_available("fake")
+
+
+@pytest.mark.anyio
+async def test_probe_errors_mark_the_provider_unhealthy(registry, monkeypatch):
+    async def validate_credentials():
+        raise ConnectionError("unreachable")
+
+    monkeypatch.setattr(registry.get("fake"), "validate_credentials", validate_credentials)
+
+    result = await registry.health.probe("fake")
+
+    assert result.healthy is False
+    assert result.error == "unreachable"
+
+
+def test_providers_endpoint_does_not_probe(client, monkeypatch):
+    registry = client.app.state.providers
+
+    async def validate_credentials():
+        raise AssertionError("the endpoint must serve cached health")
+
+    monkeypatch.setattr(registry.get("fake"), "validate_credentials", validate_credentials)
+
+    response = client.get("/api/v1/providers")
+
+    assert response.status_code == 200
+    assert response.json()["fake"]["available"] is True
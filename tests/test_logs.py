@@ -0,0 +1,25 @@
+import pytest
+
+
+def test_request_id_is_echoed(client):
+    response = client.get("/", headers={"X-Request-ID": "abc-123"})
+
+    assert response.headers["X-Request-ID"] == "abc-123"
+
+
+@pytest.mark.parametrize("request_id", [
+    "abc\r\n2024-01-01 - app - INFO - forged",
+    "id with spaces",
+    "a" * 65,
+    "",
+])
+def test_invalid_request_id_is_replaced(client, request_id):
+    response = client.get("/", headers={"X-Request-ID": request_id})
+
+    echoed = response.headers["X-Request-ID"]
+    assert echoed != request_id
+    assert len(echoed) == 32 and echoed.isalnum()
+
+
+def test_request_id_is_generated_when_missing(client):
+    assert len(client.get("/").headers["X-Request-ID"]) == 32
@@ -0,0 +1,72 @@
+from app.llm.messages import AnthropicEncoder, ChatMessage, GeminiEncoder, OpenAIEncoder, prefix_hashes
+
+
+def conversation(turns):
+    return [ChatMessage(role, content) for role, content in turns]
+
+
+BASE = [
+    ("system", "Be brief."),
+    ("user", "Hi"),
+    ("assistant", "Hello"),
+    ("user", "How are you?"),
+]
+
+
+def test_memoized_encoding_matches_fresh_encoding():
+    messages = conversation(BASE + [("user", "Still there?"), ("assistant", "Yes")])
+    for encoder_class in (OpenAIEncoder, AnthropicEncoder, GeminiEncoder):
+        warm = encoder_class()
+        for end in range(1, len(messages) + 1):
+            warm.encode(messages[:end])
+        assert warm.encode(messages) == encoder_class().encode(messages)
+
+
+def test_branches_from_a_shared_prefix_do_not_interfere():
+    encoder = OpenAIEncoder()
+    prefix = conversation(BASE)
+    encoder.encode(prefix)
+
+    left = encoder.encode(prefix + conversation([("assistant", "Left")]))
+    right = encoder.encode(prefix + conversation([("assistant", "Right")]))
+
+    assert left[-1]["content"] == "Left"
+    assert right[-1]["content"] == "Right"
+    assert len(left) == len(right) == len(prefix) + 1
+    assert encoder.encode(prefix) == [message.to_dict() for message in prefix]
+
+
+def test_anthropic_merges_same_role_turns_across_requests():
+    encoder = AnthropicEncoder()
+    messages = conversation(BASE)
+    encoder.encode(messages)
+
+    system, turns = encoder.encode(messages + conversation([("user", "Hello?")]))
+
+    assert system == "Be brief."
+    assert turns[-1] == {"role": "user", "content": "How are you?\n\nHello?"}
+    # The memoized prefix still ends with the unmerged turn
+    assert encoder.encode(messages)[1][-1] == {"role": "user", "content": "How are you?"}
+
+
+def test_gemini_folds_system_into_the_next_user_turn():
+    contents = GeminiEncoder().encode(conversation(BASE))
+
+    assert contents[0] == {"role": "user", "parts": ["Be brief.\n\nHi"]}
+    assert [content["role"] for content in contents] == ["user", "model", "user"]
+
+
+def test_message_contents_are_hashed_once():
+    hashed = []
+
+    class Content(str):
+        def __hash__(self):
+            hashed.append(self)
+            return super().__hash__()
+
+    messages = [ChatMessage("user", Content(f"message {i}")) for i in range(5)]
+    first = prefix_hashes(messages)
+    OpenAIEncoder().encode(messages)
+
+    assert prefix_hashes(messages) == first
+    assert len(hashed) == len(messages)
@@ -0,0 +1,51 @@
+import pytest
+
+from app.core.metrics import LLM_DURATION, LLM_REQUESTS, LLM_TOKENS
+from app.llm.messages import ChatMessage
+from app.llm.resilience import CircuitBreaker, ResilientProvider, RetryPolicy
+
+MESSAGES = [ChatMessage("user", "one two")]
+
+
+def model_labels(metric_labels):
+    return {labels[1] for labels in metric_labels if labels[0] == "openai"}
+
+
+@pytest.mark.anyio
+async def test_model_labels_are_catalog_names(recording_provider):
+    provider = ResilientProvider(
+        recording_provider(latency_seconds=0),
+        "openai",
+        CircuitBreaker("openai", failure_threshold=5, recovery_seconds=30),
+        RetryPolicy(max_attempts=1, base_delay=0, max_delay=0, max_retry_after=0),
+    )
+
+    for model in ("gpt-4o-2024-08-06", "gpt-4o", "my-fine-tune-1", "claude-3-haiku-20240307", None):
+        await provider.generate_response(MESSAGES, {"model": model})
+        async for _ in provider.stream_response(MESSAGES, {"model": model}):
+            pass
+
+    assert model_labels(LLM_REQUESTS._values) == {"gpt-4o", "other"}
+    assert model_labels(LLM_TOKENS._values) == {"gpt-4o", "other"}
+    assert model_labels(LLM_DURATION._series) == {"gpt-4o", "other"}
+
+
+def test_admin_metrics_cache_database_counts(client, auth_headers, monkeypatch):
+    from app.api.v1.routes import admin
+    from app.core.user_cache import CurrentUser
+    from app.db import models
+
+    admin_user = CurrentUser(id=0, email="admin@example.com", role=models.UserRole.ADMIN, name=None, photo=None)
+    client.app.dependency_overrides[admin.get_admin_user] = lambda: admin_user
+    admin._db_counts.clear()
+    try:
+        first = client.get("/api/v1/admin/metrics", headers=auth_headers).json()
+        client.post("/api/v1/conversations", params={"title": "new"}, headers=auth_headers)
+        second = client.get("/api/v1/admin/metrics", headers=auth_headers).json()
+        assert second["total_conversations"] == first["total_conversations"]
+
+        admin._db_counts.clear()
+        third = client.get("/api/v1/admin/metrics", headers=auth_headers).json()
+        assert third["total_conversations"] == first["total_conversations"] + 1
+    finally:
+        client.app.dependency_overrides.clear()
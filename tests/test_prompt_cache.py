@@ -0,0 +1,60 @@
+from app.core.config import Settings
+from app.llm.anthropic_provider import encode_with_cache_control
+from app.llm.messages import ChatMessage
+from app.llm.prompt_cache import PrefixTracker, PromptMessages, cache_prefix
+
+
+def tracker(min_tokens=0):
+    return PrefixTracker(Settings(PROMPT_CACHE_ENABLED=True, PROMPT_CACHE_MIN_TOKENS=min_tokens))
+
+
+def conversation(*turns):
+    return [ChatMessage(role, content) for role, content in turns]
+
+
+SYSTEM = ("system", "You are a helpful assistant.")
+
+
+def test_leading_system_messages_are_marked():
+    marked = tracker().mark(conversation(SYSTEM, ("user", "Hi")))
+
+    assert cache_prefix(marked) == 1
+
+
+def test_earlier_turns_of_a_conversation_are_marked():
+    prefixes = tracker()
+    first = conversation(SYSTEM, ("user", "Hi"), ("assistant", "Hello"), ("user", "How are you?"))
+    prefixes.mark(first)
+
+    second = first + conversation(("assistant", "Fine"), ("user", "Good"))
+
+    assert cache_prefix(prefixes.mark(second)) == len(first) - 1
+    assert prefixes.stats()["marked"] == 2
+
+
+def test_shared_few_shot_prefix_is_marked_across_conversations():
+    prefixes = tracker()
+    shots = conversation(("user", "2+2"), ("assistant", "4"))
+    prefixes.mark(shots + conversation(("user", "3+3")))
+
+    assert cache_prefix(prefixes.mark(shots + conversation(("user", "5+5")))) == len(shots)
+
+
+def test_short_prefixes_are_not_marked():
+    prefixes = tracker(min_tokens=1000)
+
+    assert cache_prefix(prefixes.mark(conversation(SYSTEM, ("user", "Hi")))) == 0
+    assert prefixes.stats()["marked"] == 0
+
+
+def test_anthropic_breakpoints_end_the_prefix():
+    messages = PromptMessages(
+        conversation(SYSTEM, ("user", "Hi"), ("assistant", "Hello"), ("user", "Again")), cache_prefix=3
+    )
+
+    system, turns = encode_with_cache_control(messages)
+
+    assert system[0]["cache_control"] == {"type": "ephemeral"}
+    assert turns[1]["content"][0]["cache_control"] == {"type": "ephemeral"}
+    assert turns[0]["content"] == "Hi"
+    assert turns[2]["content"] == "Again"
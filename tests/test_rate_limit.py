@@ -0,0 +1,40 @@
+import time
+
+import fakeredis
+import pytest
+from redis import asyncio as aioredis
+
+from app.core.rate_limit import LocalSlidingWindow, RateLimiter
+
+
+@pytest.mark.anyio
+async def test_redis_window_admits_up_to_the_limit():
+    limiter = RateLimiter(fakeredis.FakeAsyncRedis(), limit=3, window=60)
+
+    results = [await limiter.hit("rate_limit:1.2.3.4") for _ in range(4)]
+
+    assert [result.allowed for result in results] == [True, True, True, False]
+    assert [result.remaining for result in results[:3]] == [2, 1, 0]
+    assert 59 < results[-1].retry_after <= 60
+    assert (await limiter.hit("rate_limit:5.6.7.8")).allowed
+
+
+@pytest.mark.anyio
+async def test_unreachable_redis_falls_back_to_the_local_window():
+    limiter = RateLimiter(aioredis.Redis.from_url("redis://127.0.0.1:1"), limit=2, window=60)
+
+    results = [await limiter.hit("rate_limit:1.2.3.4") for _ in range(3)]
+
+    assert [result.allowed for result in results] == [True, True, False]
+    # Redis is not retried until the back-off passes
+    assert limiter._redis_down_until > time.monotonic()
+
+
+def test_local_window_evicts_the_least_recent_key():
+    window = LocalSlidingWindow(limit=1, window=60, max_keys=2)
+
+    for key in ("a", "b", "c"):
+        window.hit(key)
+
+    assert list(window._hits) == ["b", "c"]
+    assert window.hit("a").allowed
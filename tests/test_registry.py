@@ -0,0 +1,46 @@
+import pytest
+
+from app.core.config import Settings
+from app.llm.registry import ProviderRegistry, ProviderUnavailable
+
+
+def registry_settings(**overrides):
+    values = {"OPENAI_API_KEY": "sk-test", "ANTHROPIC_API_KEY": "sk-ant-test", "GOOGLE_API_KEY": ""}
+    values.update(overrides)
+    return Settings(**values)
+
+
+@pytest.mark.anyio
+async def test_providers_share_one_connection_pool():
+    registry = ProviderRegistry(registry_settings())
+    openai = registry.get("openai")
+    anthropic = registry.get("anthropic")
+
+    assert registry.get("openai") is openai
+    assert openai.provider.http_client is registry.http_client
+    assert anthropic.provider.http_client is registry.http_client
+    assert registry.pool_stats()["connections"] == 0
+
+    http_client = registry.http_client
+    await registry.close()
+    assert http_client.is_closed
+    assert registry.http_client is None
+
+
+def test_unconfigured_providers_are_not_built():
+    registry = ProviderRegistry(registry_settings())
+
+    with pytest.raises(ProviderUnavailable):
+        registry.get("gemini")
+    with pytest.raises(ProviderUnavailable):
+        registry.get("unknown")
+    assert registry.http_client is None
+
+
+@pytest.mark.anyio
+async def test_pool_limits_come_from_settings():
+    registry = ProviderRegistry(registry_settings(LLM_HTTP_MAX_CONNECTIONS=7))
+    registry.get("openai")
+
+    assert registry.pool_stats()["max_connections"] == 7
+    await registry.close()
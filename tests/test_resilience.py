@@ -0,0 +1,129 @@
+import pytest
+
+from app.llm.adapter import (
+    CircuitOpenError,
+    InvalidRequestError,
+    RateLimitError,
+    ServerError,
+    error_from_status,
+    parse_retry_after,
+)
+from app.llm.messages import ChatMessage
+from app.llm.resilience import CircuitBreaker, ResilientProvider, RetryPolicy
+
+MESSAGES = [ChatMessage("user", "Hi")]
+PARAMS = {"model": "fake"}
+
+
+class FlakyProvider:
+    """Fails with the given errors, in order, before answering."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def generate_response(self, messages, model_params):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+    async def stream_response(self, messages, model_params):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        yield "o"
+        yield "k"
+
+
+def resilient(provider, failure_threshold=5, max_attempts=3, max_retry_after=1.0):
+    return ResilientProvider(
+        provider,
+        "fake",
+        CircuitBreaker("Fake", failure_threshold, recovery_seconds=60),
+        RetryPolicy(max_attempts, base_delay=0, max_delay=0, max_retry_after=max_retry_after),
+    )
+
+
+@pytest.mark.anyio
+async def test_retryable_errors_are_retried():
+    provider = FlakyProvider(ServerError("Fake", "boom", 500), RateLimitError("Fake", "slow down", 429, retry_after=0))
+
+    assert await resilient(provider).generate_response(MESSAGES, PARAMS) == "ok"
+    assert provider.calls == 3
+
+
+@pytest.mark.anyio
+async def test_client_errors_are_not_retried():
+    provider = FlakyProvider(InvalidRequestError("Fake", "bad request", 400))
+
+    with pytest.raises(InvalidRequestError):
+        await resilient(provider).generate_response(MESSAGES, PARAMS)
+    assert provider.calls == 1
+
+
+@pytest.mark.anyio
+async def test_long_retry_after_gives_up_at_once():
+    provider = FlakyProvider(RateLimitError("Fake", "quota", 429, retry_after=120))
+
+    with pytest.raises(RateLimitError):
+        await resilient(provider, max_retry_after=30).generate_response(MESSAGES, PARAMS)
+    assert provider.calls == 1
+
+
+@pytest.mark.anyio
+async def test_streams_are_retried_before_the_first_chunk():
+    provider = FlakyProvider(ServerError("Fake", "boom", 502))
+
+    chunks = [chunk async for chunk in resilient(provider).stream_response(MESSAGES, PARAMS)]
+
+    assert chunks == ["o", "k"]
+    assert provider.calls == 2
+
+
+@pytest.mark.anyio
+async def test_circuit_opens_and_fails_fast():
+    provider = FlakyProvider(*[ServerError("Fake", "boom", 500)] * 2)
+    wrapped = resilient(provider, failure_threshold=2, max_attempts=1)
+    for _ in range(2):
+        with pytest.raises(ServerError):
+            await wrapped.generate_response(MESSAGES, PARAMS)
+
+    with pytest.raises(CircuitOpenError):
+        await wrapped.generate_response(MESSAGES, PARAMS)
+    assert provider.calls == 2
+    assert wrapped.breaker.snapshot()["state"] == "open"
+
+
+@pytest.mark.anyio
+async def test_half_open_probe_closes_the_circuit():
+    breaker = CircuitBreaker("Fake", failure_threshold=1, recovery_seconds=0)
+    breaker.record(ServerError("Fake", "boom", 500))
+    assert breaker.state == "open"
+
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record(None)
+    assert breaker.state == "closed" and breaker.allows_requests
+
+
+def test_client_errors_do_not_count_against_the_circuit():
+    breaker = CircuitBreaker("Fake", failure_threshold=1, recovery_seconds=60)
+
+    breaker.record(InvalidRequestError("Fake", "bad request", 400))
+    breaker.record(ValueError("not a provider error"))
+
+    assert breaker.state == "closed"
+
+
+def test_errors_are_typed_from_status_and_headers():
+    assert isinstance(error_from_status("Fake", 429, "slow down"), RateLimitError)
+    assert isinstance(error_from_status("Fake", 500, "boom"), ServerError)
+    assert not error_from_status("Fake", 404, "missing").retryable
+    assert parse_retry_after({"retry-after-ms": "1500"}) == 1.5
+    assert parse_retry_after({"retry-after": "3"}) == 3.0
+    assert parse_retry_after({}) is None
@@ -0,0 +1,87 @@
+import uuid
+
+import fakeredis
+import pytest
+
+from app.llm import response_cache as response_cache_module
+from app.llm.messages import ChatMessage
+from app.llm.response_cache import CacheDirectives, ResponseCache, iter_replay_chunks, request_fingerprint
+
+MESSAGES = [ChatMessage("user", "Hi")]
+
+
+def test_fingerprint_ignores_parameter_order():
+    first = request_fingerprint("openai", MESSAGES, {"model": "gpt-4o", "temperature": 0})
+    second = request_fingerprint("openai", MESSAGES, {"temperature": 0, "model": "gpt-4o"})
+
+    assert first == second
+    assert first != request_fingerprint("anthropic", MESSAGES, {"model": "gpt-4o", "temperature": 0})
+
+
+def test_cache_control_directives():
+    assert CacheDirectives.parse(None) == CacheDirectives()
+    assert CacheDirectives.parse("no-cache") == CacheDirectives(lookup=False, store=True)
+    assert CacheDirectives.parse("no-store") == CacheDirectives(lookup=False, store=False)
+    assert CacheDirectives.parse("max-age=30, bogus").ttl == 30
+    assert CacheDirectives.parse("max-age=soon").ttl is None
+
+
+def test_replay_chunks_rebuild_the_response():
+    assert list(iter_replay_chunks("abcdefg", 3)) == ["abc", "def", "g"]
+
+
+@pytest.mark.anyio
+async def test_redis_tier_is_shared_between_workers():
+    server = fakeredis.FakeServer()
+    first = ResponseCache(fakeredis.FakeAsyncRedis(server=server))
+    second = ResponseCache(fakeredis.FakeAsyncRedis(server=server))
+
+    await first.set("key", "cached reply")
+
+    assert await second.get("key") == "cached reply"
+    assert second.redis_hits == 1
+    # Promoted to the local tier; the next lookup skips Redis
+    assert await second.get("key") == "cached reply"
+    assert second.redis_hits == 1
+
+
+@pytest.mark.anyio
+async def test_oversized_and_zero_ttl_responses_are_not_stored(monkeypatch):
+    monkeypatch.setattr(response_cache_module.settings, "RESPONSE_CACHE_MAX_ENTRY_CHARS", 5)
+    cache = ResponseCache()
+
+    await cache.set("long", "too long")
+    await cache.set("expired", "ok", ttl=0)
+
+    assert await cache.get("long") is None
+    assert await cache.get("expired") is None
+
+
+def test_deterministic_requests_are_answered_from_the_cache(client, monkeypatch, recording_provider):
+    monkeypatch.setattr(response_cache_module.settings, "RESPONSE_CACHE_ENABLED", True)
+    provider = recording_provider(latency_seconds=0)
+    monkeypatch.setattr(client.app.state.providers.get("fake"), "provider", provider)
+    body = {"messages": [{"role": "user", "content": uuid.uuid4().hex}], "model_params": {"model": "fake", "temperature": 0}}
+
+    first = client.post("/api/v1/chat/fake", json=body)
+    second = client.post("/api/v1/chat/fake", json=body)
+    bypassed = client.post("/api/v1/chat/fake", json=body, headers={"Cache-Control": "no-cache"})
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json()["message"] == first.json()["message"]
+    assert bypassed.headers["X-Cache"] == "MISS"
+    assert provider.calls == 2
+
+
+def test_sampled_requests_are_not_cached(client, monkeypatch, recording_provider):
+    monkeypatch.setattr(response_cache_module.settings, "RESPONSE_CACHE_ENABLED", True)
+    provider = recording_provider(latency_seconds=0)
+    monkeypatch.setattr(client.app.state.providers.get("fake"), "provider", provider)
+    body = {"messages": [{"role": "user", "content": uuid.uuid4().hex}], "model_params": {"model": "fake", "temperature": 0.7}}
+
+    client.post("/api/v1/chat/fake", json=body)
+    response = client.post("/api/v1/chat/fake", json=body)
+
+    assert "X-Cache" not in response.headers
+    assert provider.calls == 2
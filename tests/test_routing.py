@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from app.core.config import Settings
+from app.llm.messages import ChatMessage
+from app.llm.registry import ProviderRegistry
+
+MESSAGES = [ChatMessage("user", "one two three")]
+
+
+@pytest.fixture
+def registry():
+    return ProviderRegistry(Settings(
+        OPENAI_API_KEY="sk-test",
+        ANTHROPIC_API_KEY="sk-ant-test",
+        GOOGLE_API_KEY="",
+        LLM_FAKE_PROVIDER=False,
+        ROUTER_HEDGE_MS=50,
+    ))
+
+
+def prepare_with(providers):
+    async def prepare(name):
+        return providers[name], MESSAGES, {"model": "fake"}
+    return prepare
+
+
+@pytest.mark.anyio
+async def test_failed_provider_fails_over_to_the_next(registry, recording_provider):
+    providers = {
+        "openai": recording_provider(latency_seconds=0, error=RuntimeError("down")),
+        "anthropic": recording_provider(latency_seconds=0),
+    }
+
+    name, message = await registry.router.generate(["openai", "anthropic"], prepare_with(providers))
+
+    assert (name, message) == ("anthropic", "one two three ")
+    assert registry.router.failovers == 1
+    assert registry.latency.error_rate("openai") == 1.0
+
+
+@pytest.mark.anyio
+async def test_slow_provider_is_hedged_and_cancelled(registry, recording_provider):
+    providers = {
+        "openai": recording_provider(latency_seconds=5),
+        "anthropic": recording_provider(latency_seconds=0),
+    }
+
+    name, _ = await registry.router.generate(["openai", "anthropic"], prepare_with(providers))
+
+    assert name == "anthropic"
+    assert registry.router.hedges == 1
+    assert providers["openai"].cancelled == 1
+
+
+@pytest.mark.anyio
+async def test_losing_stream_is_closed(registry, recording_provider):
+    providers = {
+        "openai": recording_provider(latency_seconds=5),
+        "anthropic": recording_provider(latency_seconds=0, tokens_per_second=100),
+    }
+
+    chunks = [chunk async for chunk in registry.router.stream(["openai", "anthropic"], prepare_with(providers))]
+
+    assert "".join(chunks) == "one two three "
+    assert providers["openai"].cancelled == 1
+    assert registry.router.routed == {"anthropic": 1}
+    assert all(lane["in_flight"] == 0 for lane in registry.admission.stats().values())
+
+
+@pytest.mark.anyio
+async def test_all_providers_failing_raises_the_last_error(registry, recording_provider):
+    providers = {
+        "openai": recording_provider(latency_seconds=0, error=RuntimeError("first")),
+        "anthropic": recording_provider(latency_seconds=0, error=RuntimeError("second")),
+    }
+
+    with pytest.raises(RuntimeError, match="second"):
+        await registry.router.generate(["openai", "anthropic"], prepare_with(providers))
+
+
+def test_latency_policy_measures_new_providers_and_demotes_failing_ones(registry):
+    registry.latency.record("openai", 100, 100)
+    registry.latency.record("anthropic", 50, 50)
+    for _ in range(3):
+        registry.latency.record_error("anthropic")
+
+    assert registry.router.candidates({}, "latency") == ["openai", "anthropic"]
+
+    # Providers without samples are tried first so they get measured
+    registry.latency._windows.clear()
+    registry.latency.record("anthropic", 50, 50)
+    assert registry.router.candidates({}, "latency") == ["openai", "anthropic"]
+
+
+def test_weighted_policy_skips_zero_weights(registry):
+    registry.router.weights = {"openai": 0}
+
+    assert registry.router.candidates({}, "weighted") == ["anthropic"]
+    with pytest.raises(ValueError):
+        registry.router.candidates({}, "fastest")
@@ -0,0 +1,28 @@
+import os
+
+import run_server
+
+
+def test_worker_count_defaults_to_available_cpus(monkeypatch):
+    monkeypatch.setattr(run_server.settings, "WORKERS", 0)
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: {0, 1, 2}, raising=False)
+
+    assert run_server.worker_count() == 3
+
+    monkeypatch.setattr(run_server.settings, "WORKERS", 5)
+    assert run_server.worker_count() == 5
+
+
+def test_production_mode_drains_and_shares_metrics(monkeypatch):
+    calls = []
+    monkeypatch.setattr(run_server.uvicorn, "run", lambda app, **kwargs: calls.append(kwargs))
+    monkeypatch.setattr(run_server.settings, "WORKERS", 2)
+    monkeypatch.setattr(run_server.settings, "METRICS_DIR", "")
+    monkeypatch.setattr(run_server.settings, "GRACEFUL_SHUTDOWN_SECONDS", 12.0)
+    monkeypatch.delenv("METRICS_DIR", raising=False)
+
+    run_server.run_production()
+
+    assert calls[0]["workers"] == 2
+    assert calls[0]["timeout_graceful_shutdown"] == 12.0
+    assert os.path.isdir(os.environ["METRICS_DIR"])
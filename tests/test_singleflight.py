@@ -0,0 +1,141 @@
+import asyncio
+import uuid
+
+import httpx
+import pytest
+
+from app.llm.messages import ChatMessage
+from app.llm.singleflight import SingleFlight
+
+MESSAGES = [ChatMessage("user", "one two three")]
+PARAMS = {"model": "fake"}
+
+
+@pytest.mark.anyio
+async def test_concurrent_identical_calls_share_one_upstream_call(recording_provider):
+    provider = recording_provider()
+    flights = SingleFlight()
+
+    results = await asyncio.gather(*(
+        flights.do("key", lambda: provider.generate_response(MESSAGES, PARAMS)) for _ in range(10)
+    ))
+
+    assert provider.calls == 1
+    assert results == ["one two three "] * 10
+    assert flights.stats()["followers"] == 9
+    assert flights.stats()["in_flight_calls"] == 0
+
+
+@pytest.mark.anyio
+async def test_followers_receive_the_leader_error(recording_provider):
+    provider = recording_provider(error=RuntimeError("upstream failed"))
+    flights = SingleFlight()
+
+    results = await asyncio.gather(
+        *(flights.do("key", lambda: provider.generate_response(MESSAGES, PARAMS)) for _ in range(5)),
+        return_exceptions=True,
+    )
+
+    assert provider.calls == 1
+    assert all(isinstance(result, RuntimeError) and str(result) == "upstream failed" for result in results)
+    # A failed call is not remembered; the next caller starts a new one
+    provider.error = None
+    assert await flights.do("key", lambda: provider.generate_response(MESSAGES, PARAMS)) == "one two three "
+    assert provider.calls == 2
+
+
+@pytest.mark.anyio
+async def test_cancelled_leader_does_not_fail_followers(recording_provider):
+    provider = recording_provider()
+    flights = SingleFlight()
+
+    leader = asyncio.ensure_future(flights.do("key", lambda: provider.generate_response(MESSAGES, PARAMS)))
+    await asyncio.sleep(0)
+    followers = [
+        asyncio.ensure_future(flights.do("key", lambda: provider.generate_response(MESSAGES, PARAMS)))
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await asyncio.gather(*followers) == ["one two three "] * 3
+    assert leader.cancelled()
+    assert provider.calls == 1 and provider.cancelled == 0
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+@pytest.mark.anyio
+async def test_concurrent_streams_share_one_upstream_stream(recording_provider):
+    provider = recording_provider(tokens_per_second=200)
+    flights = SingleFlight()
+
+    results = await asyncio.gather(*(
+        collect(flights.stream("key", lambda: provider.stream_response(MESSAGES, PARAMS))) for _ in range(5)
+    ))
+
+    assert provider.calls == 1
+    assert results == [["one ", "two ", "three "]] * 5
+
+
+@pytest.mark.anyio
+async def test_stream_survives_leader_leaving_and_stops_with_the_last_subscriber(recording_provider):
+    provider = recording_provider(tokens_per_second=50)
+    flights = SingleFlight()
+
+    leader = flights.stream("key", lambda: provider.stream_response(MESSAGES, PARAMS))
+    assert await leader.__anext__() == "one "
+    follower = asyncio.ensure_future(collect(flights.stream("key", lambda: provider.stream_response(MESSAGES, PARAMS))))
+    await asyncio.sleep(0)
+    await leader.aclose()
+
+    # The follower replays the buffered chunk and receives the rest
+    assert await follower == ["one ", "two ", "three "]
+    assert provider.calls == 1 and provider.cancelled == 0
+
+    abandoned = flights.stream("other", lambda: provider.stream_response(MESSAGES, PARAMS))
+    await abandoned.__anext__()
+    await abandoned.aclose()
+    await asyncio.sleep(0.01)
+    assert provider.cancelled == 1
+    assert flights.stats()["in_flight_streams"] == 0
+
+
+@pytest.fixture
+def admissions(client, monkeypatch, recording_provider):
+    """Counts admission leases taken by chat requests to a slow fake provider."""
+    registry = client.app.state.providers
+    monkeypatch.setattr(registry.get("fake"), "provider", recording_provider(latency_seconds=0.2, tokens_per_second=50))
+    acquired = []
+    acquire = registry.admission.acquire
+
+    async def counting_acquire(*args, **kwargs):
+        acquired.append(args[0])
+        return await acquire(*args, **kwargs)
+
+    monkeypatch.setattr(registry.admission, "acquire", counting_acquire)
+    return acquired
+
+
+def post_concurrently(client, path, body, count):
+    async def post_all():
+        transport = httpx.ASGITransport(app=client.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as http:
+            return await asyncio.gather(*(http.post(path, json=body) for _ in range(count)))
+    return client.portal.call(post_all)
+
+
+@pytest.mark.parametrize("path", ["/api/v1/chat/fake", "/api/v1/chat/fake/stream"])
+def test_only_the_upstream_call_is_admitted(client, admissions, path):
+    provider = client.app.state.providers.get("fake").provider
+    body = {"messages": [{"role": "user", "content": f"one two {uuid.uuid4().hex}"}], "model_params": {"model": "fake"}}
+
+    responses = post_concurrently(client, path, body, 5)
+
+    assert all(response.status_code == 200 for response in responses)
+    assert provider.calls == 1
+    assert admissions == ["fake"]
+    lanes = client.app.state.providers.admission.stats().values()
+    assert all(lane["in_flight"] == 0 for lane in lanes)
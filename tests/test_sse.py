@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core.sse import HEARTBEAT, SSEWriter, encode_event
+
+
+async def events(items, delay=0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+async def collect(writer, source):
+    return [frame async for frame in writer.stream(source)]
+
+
+def parse(frame):
+    fields = dict(line.split(": ", 1) for line in frame.decode("utf-8").strip().split("\n"))
+    return fields.get("id"), json.loads(fields["data"])
+
+
+def test_encode_event():
+    assert encode_event({"chunk": "é"}) == 'data: {"chunk":"é"}\n\n'.encode("utf-8")
+    assert encode_event({"done": True}, "7") == b'id: 7\ndata: {"done":true}\n\n'
+
+
+@pytest.mark.anyio
+async def test_burst_of_deltas_becomes_one_frame_with_the_last_id():
+    writer = SSEWriter(coalesce_seconds=0.05, coalesce_bytes=1024, heartbeat_seconds=0)
+    items = [(str(i), {"chunk": f"w{i} "}) for i in range(5)] + [("5", {"done": True})]
+
+    frames = [parse(frame) for frame in await collect(writer, events(items))]
+
+    assert frames == [("4", {"chunk": "w0 w1 w2 w3 w4 "}), ("5", {"done": True})]
+    assert writer.stats()["events"] == 6
+
+
+@pytest.mark.anyio
+async def test_batches_flush_at_the_size_limit():
+    writer = SSEWriter(coalesce_seconds=10, coalesce_bytes=4, heartbeat_seconds=0)
+    items = [(str(i), {"chunk": "ab"}) for i in range(4)]
+
+    frames = [parse(frame) for frame in await collect(writer, events(items))]
+
+    assert frames == [("1", {"chunk": "abab"}), ("3", {"chunk": "abab"})]
+
+
+@pytest.mark.anyio
+async def test_slow_deltas_are_sent_on_their_own():
+    writer = SSEWriter(coalesce_seconds=0.01, coalesce_bytes=1024, heartbeat_seconds=0)
+    items = [(str(i), {"chunk": str(i)}) for i in range(3)]
+
+    frames = [parse(frame) for frame in await collect(writer, events(items, delay=0.05))]
+
+    assert frames == [("0", {"chunk": "0"}), ("1", {"chunk": "1"}), ("2", {"chunk": "2"})]
+
+
+@pytest.mark.anyio
+async def test_idle_streams_get_heartbeats():
+    writer = SSEWriter(coalesce_seconds=0, coalesce_bytes=1024, heartbeat_seconds=0.02)
+
+    frames = await collect(writer, events([("0", {"done": True})], delay=0.1))
+
+    assert HEARTBEAT in frames
+    assert parse(frames[-1]) == ("0", {"done": True})
+
+
+@pytest.mark.anyio
+async def test_source_errors_reach_the_caller():
+    async def failing():
+        yield "0", {"chunk": "partial"}
+        raise RuntimeError("upstream failed")
+
+    writer = SSEWriter(coalesce_seconds=0.05, coalesce_bytes=1024, heartbeat_seconds=0)
+
+    with pytest.raises(RuntimeError, match="upstream failed"):
+        await collect(writer, failing())
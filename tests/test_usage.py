@@ -0,0 +1,44 @@
+import uuid
+
+import pytest
+
+from app.core.config import Settings
+from app.llm.usage import QuotaExceeded, UsageLedger, bill_to
+
+
+def ledger(**overrides) -> UsageLedger:
+    return UsageLedger(Settings(USAGE_DAILY_TOKEN_LIMIT=100, **overrides))
+
+
+def user_id() -> int:
+    # Fresh ids, so records written by other tests do not count
+    return uuid.uuid4().int % 2**31
+
+
+@pytest.mark.anyio
+async def test_tracked_users_are_bounded(client):
+    usage = ledger(USAGE_TOTALS_MAX_USERS=3)
+
+    for _ in range(10):
+        await usage.check_quota(user_id())
+
+    assert usage.stats()["tracked_users"] == 3
+
+
+@pytest.mark.anyio
+async def test_evicted_totals_are_reloaded_with_unwritten_records(client):
+    usage = ledger(USAGE_TOTALS_MAX_USERS=1)
+    first, second = user_id(), user_id()
+
+    await usage.check_quota(first)
+    bill_to(first)
+    usage.record("openai", "gpt-4o", 60, 40)
+    # Loading another user evicts the first one's totals
+    await usage.check_quota(second)
+
+    with pytest.raises(QuotaExceeded):
+        await usage.check_quota(first)
+    await usage.flush()
+    usage._totals.clear()
+    with pytest.raises(QuotaExceeded):
+        await usage.check_quota(first)